@@ -1,17 +1,20 @@
 import json
 import os
-from PIL import Image
 from rules import House_rules, Tree_rules, Person_rules
+from detections import read_label_file
 
 HOUSE_CLASS_NAMES = ["집전체", "지붕", "집벽", "문", "창문", "굴뚝", "연기", "울타리", "길", "연못", "산", "나무", "꽃", "잔디", "태양"]
 TREE_CLASS_NAMES = ["나무전체", "기둥", "수관", "가지", "뿌리", "나뭇잎", "꽃", "열매", "그네", "새", "다람쥐", "구름", "달", "별"]
 PERSON_CLASS_NAMES = ["사람전체", "머리", "얼굴", "눈", "코", "입", "귀", "머리카락", "목", "상체", "팔", "손", "다리", "발", "단추", "주머니", "운동화", "여자구두"]
 
-def get_analysis_result(user_choice, txt_file_path, image_path):
+# 이 confidence 이상인 검출만 규칙 판단에 사용
+RULE_CONF = 0.8
+
+def collect_features(user_choice, detections):
     """
-    사용자 선택, TXT 파일, 이미지 경로를 받아 분석 문장을 반환하는 함수
+    규칙 판단에 쓰는 특징 (크기/위치 구간, 창문/나무/사람별 크기 구간, 클래스별 개수)
+    반환: (analysis_results, house_counts, tree_counts, person_counts)
     """
-    
     analysis_results = {
         "house": {"size": None, "location": None, "box_area": 0},
         "windows": [], "trees": [], "persons": [] 
@@ -23,103 +26,99 @@ def get_analysis_result(user_choice, txt_file_path, image_path):
     
     all_model_results = {} 
 
-    try:
-        if os.path.exists(image_path):
-            original_pil_image = Image.open(image_path)
-            img_width, img_height = original_pil_image.size
-            img_area = img_width * img_height
-        else:
-            img_width, img_height = 1000, 1000
-            img_area = 1000000
-
-        raw_data = []
-        if not os.path.exists(txt_file_path):
-            return "오류: 분석 결과 파일(test_analysis.txt)을 찾을 수 없습니다."
-
-        with open(txt_file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+    raw_data = []
+    if user_choice == 0: current_class_names = HOUSE_CLASS_NAMES
+    elif user_choice == 1: current_class_names = TREE_CLASS_NAMES
+    else: current_class_names = PERSON_CLASS_NAMES
+
+    for cls_id, cx, cy, w, h, conf in detections:
+        if conf >= RULE_CONF:
+            if 0 <= cls_id < len(current_class_names):
+                name = current_class_names[cls_id]
+            else:
+                name = f"Unknown_{cls_id}"
             
-        if user_choice == 0: current_class_names = HOUSE_CLASS_NAMES
-        elif user_choice == 1: current_class_names = TREE_CLASS_NAMES
-        else: current_class_names = PERSON_CLASS_NAMES
-
-        for line in lines:
-            parts = line.strip().split()
-            if len(parts) >= 6:
-                cls_id = int(parts[0])
-                cx, cy, w, h = map(float, parts[1:5]) 
-                conf = float(parts[5])
+            obj = {
+                "name": name,
+                "confidence": conf,
+                "xmin": cx - (w/2), "ymin": cy - (h/2), 
+                "xmax": cx + (w/2), "ymax": cy + (h/2),
+                "w": w, "h": h
+            }
+            raw_data.append(obj)
+
+    target_key = ['house', 'tree', 'person'][user_choice]
+    all_model_results[target_key] = raw_data
+
+    if user_choice == 0 and 'house' in all_model_results:
+        for det in all_model_results['house']:
+            if det['name'] == '집전체':
+                ratio = det['w'] * det['h']
+                analysis_results['house']['box_area'] = ratio
+                if ratio >= (2/3): analysis_results['house']['size'] = '크다'
+                elif ratio <= (1/3): analysis_results['house']['size'] = '작다'
+                else: analysis_results['house']['size'] = '보통'
                 
-                if conf >= 0.8:
-                    if 0 <= cls_id < len(current_class_names):
-                        name = current_class_names[cls_id]
-                    else:
-                        name = f"Unknown_{cls_id}"
-                    
-                    obj = {
-                        "name": name,
-                        "confidence": conf,
-                        "xmin": cx - (w/2), "ymin": cy - (h/2), 
-                        "xmax": cx + (w/2), "ymax": cy + (h/2),
-                        "w": w, "h": h
-                    }
-                    raw_data.append(obj)
-
-        target_key = ['house', 'tree', 'person'][user_choice]
-        all_model_results[target_key] = raw_data
-
-        if user_choice == 0 and 'house' in all_model_results:
-            for det in all_model_results['house']:
-                if det['name'] == '집전체':
-                    ratio = det['w'] * det['h']
-                    analysis_results['house']['box_area'] = ratio
-                    if ratio >= (2/3): analysis_results['house']['size'] = '크다'
-                    elif ratio <= (1/3): analysis_results['house']['size'] = '작다'
-                    else: analysis_results['house']['size'] = '보통'
-                    
-                    if (det['xmin'] >= 0.25 and det['xmax'] <= 0.75 and
-                        det['ymin'] >= 0.25 and det['ymax'] <= 0.75):
-                        analysis_results['house']['location'] = '중앙'
-                    else:
-                        analysis_results['house']['location'] = '비중앙'
-                    break
-            
-            house_area_ratio = analysis_results['house']['box_area']
-            if house_area_ratio > 0:
-                for det in all_model_results['house']:
-                    if det['name'] == '창문':
-                        win_area = det['w'] * det['h']
-                        rel_ratio = win_area / house_area_ratio
-                        if rel_ratio >= (2/3): size = '크다'
-                        elif rel_ratio <= (1/3): size = '작다'
-                        else: size = '보통'
-                        analysis_results['windows'].append({"size": size})
-
+                if (det['xmin'] >= 0.25 and det['xmax'] <= 0.75 and
+                    det['ymin'] >= 0.25 and det['ymax'] <= 0.75):
+                    analysis_results['house']['location'] = '중앙'
+                else:
+                    analysis_results['house']['location'] = '비중앙'
+                break
+        
+        house_area_ratio = analysis_results['house']['box_area']
+        if house_area_ratio > 0:
             for det in all_model_results['house']:
-                if det['name'] in house_counts: house_counts[det['name']] += 1
-
-        if user_choice == 1 and 'tree' in all_model_results:
-            for det in all_model_results['tree']:
-                if det['name'] == '나무전체':
-                    ratio = det['w'] * det['h']
-                    if ratio > 0.5: size = '보통'
-                    else: size = '작다'
-                    analysis_results['trees'].append({"size": size})
-
-            for det in all_model_results['tree']:
-                if det['name'] in tree_counts: tree_counts[det['name']] += 1
-
-        if user_choice == 2 and 'person' in all_model_results:
-            for det in all_model_results['person']:
-                if det['name'] == '사람전체':
-                    h_ratio = det['h']
-                    if h_ratio >= (2/3): size = '크다'
-                    elif h_ratio <= (1/3): size = '작다'
+                if det['name'] == '창문':
+                    win_area = det['w'] * det['h']
+                    rel_ratio = win_area / house_area_ratio
+                    if rel_ratio >= (2/3): size = '크다'
+                    elif rel_ratio <= (1/3): size = '작다'
                     else: size = '보통'
-                    analysis_results['persons'].append({"size": size})
+                    analysis_results['windows'].append({"size": size})
+
+        for det in all_model_results['house']:
+            if det['name'] in house_counts: house_counts[det['name']] += 1
+
+    if user_choice == 1 and 'tree' in all_model_results:
+        for det in all_model_results['tree']:
+            if det['name'] == '나무전체':
+                ratio = det['w'] * det['h']
+                if ratio > 0.5: size = '보통'
+                else: size = '작다'
+                analysis_results['trees'].append({"size": size})
+
+        for det in all_model_results['tree']:
+            if det['name'] in tree_counts: tree_counts[det['name']] += 1
+
+    if user_choice == 2 and 'person' in all_model_results:
+        for det in all_model_results['person']:
+            if det['name'] == '사람전체':
+                h_ratio = det['h']
+                if h_ratio >= (2/3): size = '크다'
+                elif h_ratio <= (1/3): size = '작다'
+                else: size = '보통'
+                analysis_results['persons'].append({"size": size})
+
+        for det in all_model_results['person']:
+            if det['name'] in person_counts: person_counts[det['name']] += 1
+
+    return analysis_results, house_counts, tree_counts, person_counts
+
+def get_analysis_result(user_choice, txt_file_path=None, image_path=None, detections=None):
+    """
+    사용자 선택, TXT 파일, 이미지 경로를 받아 분석 문장을 반환하는 함수
+    detections(Detection 리스트)를 넘기면 라벨 파일을 읽지 않고 그대로 사용한다.
+    좌표는 모두 정규화 값이므로 이미지 자체는 열지 않는다. (image_path 는 호환용으로만 남겨 둠)
+    """
+    
+    try:
+        if detections is None:
+            if not txt_file_path or not os.path.exists(txt_file_path):
+                return "오류: 분석 결과 파일(test_analysis.txt)을 찾을 수 없습니다."
+            detections = read_label_file(txt_file_path)
 
-            for det in all_model_results['person']:
-                if det['name'] in person_counts: person_counts[det['name']] += 1
+        analysis_results, house_counts, tree_counts, person_counts = collect_features(user_choice, detections)
 
         final_sentence_string = ""
         
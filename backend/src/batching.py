@@ -0,0 +1,67 @@
+"""
+카테고리별 동적 마이크로 배칭 스케줄러
+
+같은 키(카테고리)로 짧은 시간 창(window_ms) 안에 들어온 요청을 최대 max_batch 개까지 모아
+한 번의 forward pass 로 실행하고, 대기 중이던 각 코루틴에 자기 결과를 돌려준다.
+"""
+import asyncio
+import time
+
+from metrics import metrics
+
+
+class MicroBatcher:
+    def __init__(self, run_batch, window_ms: float, max_batch: int, name: str = "yolo"):
+        # run_batch(key, items) -> items 와 같은 순서의 결과 리스트 (동기 함수, 스레드에서 실행)
+        self._run_batch = run_batch
+        self.window = max(window_ms, 0) / 1000.0
+        self.max_batch = max(max_batch, 1)
+        self.name = name
+        self._pending = {}
+        self._timers = {}
+        self._tasks = set()
+
+    async def submit(self, key, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        bucket = self._pending.setdefault(key, [])
+        bucket.append((item, future, time.perf_counter()))
+
+        if len(bucket) >= self.max_batch or self.window == 0:
+            self._flush(key)
+        elif len(bucket) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._execute(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, key, batch) -> None:
+        started = time.perf_counter()
+        label = str(key)
+        metrics.observe(f"{self.name}_batch_size", len(batch), key=label)
+        for _, _, enqueued in batch:
+            metrics.observe(f"{self.name}_queue_wait_seconds", started - enqueued, key=label)
+
+        items = [item for item, _, _ in batch]
+        try:
+            results = await asyncio.to_thread(self._run_batch, key, items)
+        except Exception as exc:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            metrics.observe(f"{self.name}_batch_seconds", time.perf_counter() - started, key=label)
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,183 @@
+"""
+대량 분석(POST /bulk) 입력 스트리밍
+
+상담 센터/학교처럼 그림 수백 장을 한 번에 올리는 경우를 위해 요청 본문을 끝까지 받기 전에
+그림을 하나씩 꺼내 분석에 넘긴다.
+
+- iter_multipart_items: multipart 본문을 python-multipart 로 조각 단위로 파싱해 파일 파트가 끝날 때마다 BulkItem 을 낸다.
+  호출자가 다음 항목을 가져갈 때만 본문을 더 읽으므로 분석 중인 그림 수가 상한에 닿으면
+  본문 수신이 멈추고 TCP 흐름 제어로 업로더에 backpressure 가 걸린다.
+- iter_zip_items: zip 은 끝의 중앙 디렉터리가 있어야 열 수 있으므로 본문을 임시 파일로 받은 뒤 항목을 하나씩 읽는다.
+
+카테고리는 multipart 필드 이름 또는 zip 최상위 폴더 이름(house / tree / person)으로 정하고,
+없으면 쿼리의 category 를 쓴다.
+"""
+import asyncio
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from starlette.responses import StreamingResponse
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from metrics import metrics
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # 구버전 python-multipart
+    from multipart.multipart import MultipartParser, parse_options_header
+
+CATEGORY_BY_NAME = {"house": 0, "tree": 1, "person": 2, "0": 0, "1": 1, "2": 2}
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+
+@dataclass
+class BulkItem:
+    index: int
+    filename: str
+    category: Optional[int]
+    data: bytes = b""
+    error: Optional[HTTPException] = None
+
+
+def _item_too_large() -> HTTPException:
+    metrics.inc("upload_rejected", reason="too_large")
+    return HTTPException(status_code=413, detail="업로드 크기가 너무 큽니다.")
+
+
+def _too_many_items(max_items: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"한 번에 분석할 수 있는 그림은 최대 {max_items}개입니다.")
+
+
+# ============= multipart =============
+async def iter_multipart_items(request: Request, max_item_bytes: int, max_items: int, default_category: Optional[int]):
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="multipart boundary 가 없습니다.")
+
+    ready = []
+    part = {}
+    counter = {"next_index": 0}
+
+    def on_part_begin():
+        part.clear()
+        part.update(headers={}, field=b"", value=b"", data=bytearray(), size=0)
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"], part["value"] = b"", b""
+
+    def on_part_data(data, start, end):
+        part["size"] += end - start
+        if part["size"] <= max_item_bytes:
+            part["data"] += data[start:end]
+
+    def on_part_end():
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        filename = disposition.get(b"filename")
+        if filename is None:
+            # 파일이 아닌 일반 필드는 무시 (카테고리/옵션은 쿼리로 받는다)
+            return
+        field = disposition.get(b"name", b"").decode("utf-8", "replace")
+        item = BulkItem(
+            index=counter["next_index"],
+            filename=filename.decode("utf-8", "replace"),
+            category=CATEGORY_BY_NAME.get(field.lower(), default_category),
+            data=bytes(part["data"]),
+        )
+        counter["next_index"] += 1
+        if part["size"] > max_item_bytes:
+            item.data, item.error = b"", _item_too_large()
+        ready.append(item)
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+    })
+
+    async for chunk in request.stream():
+        parser.write(chunk)
+        while ready:
+            item = ready.pop(0)
+            if item.index >= max_items:
+                raise _too_many_items(max_items)
+            yield item
+    parser.finalize()
+    for item in ready:
+        if item.index >= max_items:
+            raise _too_many_items(max_items)
+        yield item
+
+
+# ============= zip =============
+def _zip_category(name: str, default_category: Optional[int]) -> Optional[int]:
+    top = Path(name).parts[0].lower() if len(Path(name).parts) > 1 else ""
+    return CATEGORY_BY_NAME.get(top, default_category)
+
+
+async def iter_zip_items(request: Request, spill_dir: Path, max_item_bytes: int, max_items: int,
+                         default_category: Optional[int]):
+    spill_file = await asyncio.to_thread(tempfile.NamedTemporaryFile, dir=spill_dir, suffix=".zip", delete=False)
+    path = Path(spill_file.name)
+    try:
+        async for chunk in request.stream():
+            await asyncio.to_thread(spill_file.write, chunk)
+        await asyncio.to_thread(spill_file.close)
+
+        try:
+            archive = await asyncio.to_thread(zipfile.ZipFile, path)
+        except zipfile.BadZipFile as exc:
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f"zip 파일을 열 수 없습니다: {exc}") from exc
+
+        with archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and Path(info.filename).suffix.lower() in IMAGE_SUFFIXES
+            ]
+            if len(members) > max_items:
+                raise _too_many_items(max_items)
+            for index, info in enumerate(members):
+                item = BulkItem(index, info.filename, _zip_category(info.filename, default_category))
+                # 압축 해제 전 크기로 확인 (zip 폭탄 방지)
+                if info.file_size > max_item_bytes:
+                    item.error = _item_too_large()
+                else:
+                    item.data = await asyncio.to_thread(archive.read, info)
+                yield item
+    finally:
+        if not spill_file.closed:
+            await asyncio.to_thread(spill_file.close)
+        path.unlink(missing_ok=True)
+
+
+class NdjsonResponse(StreamingResponse):
+    """
+    요청 본문을 읽는 동안 결과를 내보내는 스트리밍 응답.
+    기본 StreamingResponse 는 (ASGI spec 2.4 미만에서) 연결 종료를 감지하려고 receive() 를 같이 읽는데,
+    그러면 아직 읽지 않은 요청 본문 조각을 가져가 버리므로 여기서는 응답만 보낸다.
+    연결이 끊기면 요청 본문 읽기나 전송 중에 예외가 난다.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
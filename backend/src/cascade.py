@@ -0,0 +1,32 @@
+"""
+저해상도 우선 캐스케이드 추론
+
+그림 대부분은 단순한 선화라서 작은 입력 크기(CASCADE_FIRST_IMGSZ, 예: 320)로도 결과가 정해진다.
+첫 패스 결과가 다음 중 하나에 해당할 때만 원래 입력 크기로 다시 검출한다.
+
+- anchor_missing : 기준 객체(집전체/나무전체/사람전체)가 RULE_CONF 이상으로 검출되지 않음
+- near_threshold : 검출 confidence 가 analysis_module 의 RULE_CONF(0.8) 와 margin 이내로 가까움
+                   (해상도에 따라 규칙 포함 여부가 뒤집힐 수 있음)
+"""
+from analysis_module import HOUSE_CLASS_NAMES, PERSON_CLASS_NAMES, RULE_CONF, TREE_CLASS_NAMES
+
+ANCHOR_CLASS_IDS = {
+    0: HOUSE_CLASS_NAMES.index("집전체"),
+    1: TREE_CLASS_NAMES.index("나무전체"),
+    2: PERSON_CLASS_NAMES.index("사람전체"),
+}
+
+
+def escalation_reason(detections: list, category: int, margin: float, relevant=None):
+    """
+    원래 입력 크기로 다시 검출해야 하면 사유 문자열, 첫 패스로 충분하면 None
+    relevant(rule_deps.relevant_classes)를 주면 문장에 영향이 없는 클래스는 기준 근처여도 무시한다
+    """
+    anchor = ANCHOR_CLASS_IDS[category]
+    if not any(det.cls_id == anchor and det.conf >= RULE_CONF for det in detections):
+        return "anchor_missing"
+    if relevant is not None:
+        detections = [det for det in detections if det.cls_id in relevant]
+    if any(abs(det.conf - RULE_CONF) < margin for det in detections):
+        return "near_threshold"
+    return None
@@ -0,0 +1,86 @@
+"""
+torch(.pt) 와 onnx / TorchScript 백엔드 검출 결과 일치 여부 확인 스크립트
+
+사용 예:
+    python check_backend_parity.py --category 0 --images ./samples/house
+    python check_backend_parity.py --category 0 --images ./samples/house --save-fixtures ./parity_out
+    python check_backend_parity.py --category 0 --images ./samples/house --compare torchscript --batch 8
+
+기준은 .pt 모델을 이미지 하나씩(batch 1) 실행한 결과이고, 비교 대상은 --batch 개씩 묶어 실행한다
+(서버의 마이크로 배치와 같은 조건. TorchScript 는 MODEL_CACHE_DIR 아티팩트를 만들어/읽어 쓴다).
+이미지마다 두 결과를 test/test_analysis.txt 와 같은 라벨 형식으로 만들고,
+analysis_module 이 사용하는 0.8 이상 검출끼리 (클래스, IoU >= 0.5) 로 짝지어 비교한다.
+최종 analysis_text 가 다르거나 짝이 맞지 않는 검출이 있으면 종료 코드 1 을 반환한다.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from analysis_module import RULE_CONF, get_analysis_result
+from detections import unmatched_detections, write_label_file
+from detector_backends import DEFAULT_WEIGHTS, OnnxBackend, TorchBackend
+from model_cache import DEFAULT_CACHE_DIR, ArtifactCache
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="torch(.pt) / onnx / TorchScript 검출 결과 비교")
+    parser.add_argument("--category", type=int, choices=(0, 1, 2), required=True)
+    parser.add_argument("--images", type=Path, required=True, help="이미지 폴더")
+    parser.add_argument("--weights", type=Path, help="가중치(.pt) 경로 (기본: ~/htp/weights)")
+    parser.add_argument("--conf", type=float, default=float(os.getenv("YOLO_CONF", "0.70")))
+    parser.add_argument("--imgsz", type=int, default=int(os.getenv("YOLO_IMGSZ", "640")))
+    parser.add_argument("--device", default=os.getenv("YOLO_DEVICE", "0"))
+    parser.add_argument("--save-fixtures", type=Path, help="백엔드별 라벨 파일을 저장할 폴더")
+    parser.add_argument("--compare", choices=("onnx", "torchscript"), default="onnx", help="비교할 백엔드")
+    parser.add_argument("--batch", type=int, default=int(os.getenv("YOLO_BATCH_MAX", "8")),
+                        help="비교 대상 백엔드에 한 번에 넣을 이미지 수 (기본: YOLO_BATCH_MAX)")
+    parser.add_argument("--cache-dir", type=Path, default=Path(os.getenv("MODEL_CACHE_DIR") or DEFAULT_CACHE_DIR),
+                        help="TorchScript 아티팩트 캐시 폴더")
+    args = parser.parse_args()
+
+    weights = args.weights or DEFAULT_WEIGHTS[args.category]
+    torch_backend = TorchBackend(args.conf, args.imgsz, args.device)
+    if args.compare == "onnx":
+        other_backend = OnnxBackend(args.conf, args.imgsz)
+    else:
+        other_backend = TorchBackend(args.conf, args.imgsz, args.device, cache=ArtifactCache(args.cache_dir))
+    torch_model = torch_backend.load_model(weights)
+    other_model = other_backend.load_model(weights)
+
+    images = sorted(p for p in args.images.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    batch = max(1, args.batch)
+    mismatched = 0
+    for start in range(0, len(images), batch):
+        chunk = images[start:start + batch]
+        other_results = other_backend.predict_batch(other_model, [str(path) for path in chunk])
+        for image_path, other_dets in zip(chunk, other_results):
+            torch_dets = torch_backend.predict_batch(torch_model, [str(image_path)])[0]
+
+            if args.save_fixtures:
+                write_label_file(torch_dets, args.save_fixtures / "torch" / f"{image_path.stem}.txt")
+                write_label_file(other_dets, args.save_fixtures / args.compare / f"{image_path.stem}.txt")
+
+            missing, extra = unmatched_detections(torch_dets, other_dets, min_conf=RULE_CONF)
+            torch_text = get_analysis_result(args.category, detections=torch_dets)
+            other_text = get_analysis_result(args.category, detections=other_dets)
+            same_text = torch_text == other_text
+
+            if missing or extra or not same_text:
+                mismatched += 1
+                print(f"[불일치] {image_path.name}: 누락 {len(missing)}개, 추가 {len(extra)}개, 문장 일치={same_text}")
+                for det in missing:
+                    print(f"    torch 에만 있음: {det}")
+                for det in extra:
+                    print(f"    {args.compare} 에만 있음: {det}")
+            else:
+                print(f"[일치] {image_path.name}")
+
+    print(f"\n총 {len(images)}개 중 불일치 {mismatched}개")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
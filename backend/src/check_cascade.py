@@ -0,0 +1,98 @@
+"""
+캐스케이드 추론 보고서
+
+사용 예:
+    python check_cascade.py --images ./samples
+    python check_cascade.py --images ./samples --first-imgsz 320 --margin 0.1 --max-text-change 0.01
+
+--images 아래 house / tree / person 폴더의 이미지마다 첫 패스(작은 입력 크기)와 원래 입력 크기 결과를 모두 구하고,
+캐스케이드가 실제로 낼 결과(첫 패스로 끝나거나 다시 검출한 결과)의 analysis_text 가
+항상 원래 크기로 검출한 결과와 얼마나 자주 다른지, 재검출 비율과 사유, 패스별 평균 지연을 카테고리별로 출력한다.
+문장 변경 비율이 --max-text-change 를 넘는 카테고리가 있으면 종료 코드 1 을 반환한다.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from analysis_module import get_analysis_result
+from cascade import escalation_reason
+from detector_backends import DEFAULT_WEIGHTS, create_backend
+from image_prep import decode_image
+from rule_deps import relevant_classes
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+CATEGORY_DIRS = {0: "house", 1: "tree", 2: "person"}
+
+
+def _timed_predict(backend, model, image, imgsz):
+    started = time.perf_counter()
+    detections = backend.predict_batch(model, [image], imgsz)[0]
+    return detections, time.perf_counter() - started
+
+
+def report_category(backend, category: int, image_dir: Path, args) -> bool:
+    model = backend.load_model(DEFAULT_WEIGHTS[category])
+    images = sorted(p for p in image_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    reasons = Counter()
+    changed = 0
+    first_seconds, full_seconds, cascade_seconds = [], [], []
+    for image_path in images:
+        image = decode_image(image_path, args.imgsz)
+        first_dets, first_time = _timed_predict(backend, model, image, args.first_imgsz)
+        full_dets, full_time = _timed_predict(backend, model, image, args.imgsz)
+        first_seconds.append(first_time)
+        full_seconds.append(full_time)
+
+        reason = escalation_reason(first_dets, category, args.margin, relevant_classes(category))
+        reasons[reason or "settled"] += 1
+        cascade_seconds.append(first_time + full_time if reason else first_time)
+        cascade_dets = full_dets if reason else first_dets
+        if get_analysis_result(category, detections=cascade_dets) != get_analysis_result(category, detections=full_dets):
+            changed += 1
+            print(f"    문장 변경: {image_path.name}")
+
+    total = len(images)
+    if not total:
+        print(f"[{CATEGORY_DIRS[category]}] 이미지 없음")
+        return True
+    escalated = total - reasons["settled"]
+    change_ratio = changed / total
+    detail = ", ".join(f"{name} {count}" for name, count in sorted(reasons.items()) if name != "settled")
+    print(
+        f"[{CATEGORY_DIRS[category]}] 이미지 {total}개, 재검출 {escalated}개 ({escalated / total:.1%}; {detail or '-'}), "
+        f"문장 변경 {changed}개 ({change_ratio:.1%})"
+    )
+    print(
+        f"    평균 지연: 첫 패스 {sum(first_seconds) / total * 1000:.1f}ms, "
+        f"원래 크기 {sum(full_seconds) / total * 1000:.1f}ms, "
+        f"캐스케이드 {sum(cascade_seconds) / total * 1000:.1f}ms"
+    )
+    return change_ratio <= args.max_text_change
+
+
+def main():
+    parser = argparse.ArgumentParser(description="캐스케이드 추론 재검출 비율/결과 차이 보고")
+    parser.add_argument("--images", type=Path, required=True, help="house/tree/person 하위 폴더가 있는 이미지 폴더")
+    parser.add_argument("--backend", default=os.getenv("YOLO_BACKEND", "torch"))
+    parser.add_argument("--conf", type=float, default=float(os.getenv("YOLO_CONF", "0.70")))
+    parser.add_argument("--imgsz", type=int, default=int(os.getenv("YOLO_IMGSZ", "640")))
+    parser.add_argument("--device", default=os.getenv("YOLO_DEVICE", "0"))
+    parser.add_argument("--first-imgsz", type=int, default=int(os.getenv("CASCADE_FIRST_IMGSZ", "320")))
+    parser.add_argument("--margin", type=float, default=float(os.getenv("CASCADE_MARGIN", "0.1")))
+    parser.add_argument("--max-text-change", type=float, default=0.0)
+    args = parser.parse_args()
+
+    backend = create_backend(args.backend, args.conf, args.imgsz, args.device)
+    passed = True
+    for category, dirname in CATEGORY_DIRS.items():
+        image_dir = args.images / dirname
+        if image_dir.is_dir():
+            passed &= report_category(backend, category, image_dir, args)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
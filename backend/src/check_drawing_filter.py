@@ -0,0 +1,77 @@
+"""
+추론 전 그림 판정(drawing_filter) 임계값 확인 스크립트
+
+사용 예:
+    python check_drawing_filter.py --drawings ./samples/house ./samples/tree ./samples/person --others ./samples/photos
+    python check_drawing_filter.py --drawings ./samples/house --min-paper-ratio 0.3 --max-edge-density 0.35
+
+실제 그림 업로드(--drawings)와 거절되어야 하는 사진/스크린샷/빈 종이(--others)마다 판정 값
+(paper_ratio, ink_ratio, colorfulness, edge_density)과 결과를 출력한다.
+그림이 하나라도 거절되면 종료 코드 1 을 반환한다. 그림이 아닌 입력의 통과 비율은 참고용으로 출력한다.
+DRAWING_FILTER_ENABLED=1 로 켜기 전에 실제 업로드 샘플로 이 스크립트를 통과시킨다.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from drawing_filter import DrawingThresholds, drawing_features, rejection_reason
+from image_prep import decode_image
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def _images(folders):
+    for folder in folders:
+        yield from sorted(p for p in folder.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def _judge(image_path: Path, thresholds: DrawingThresholds, imgsz: int):
+    features = drawing_features(decode_image(image_path, imgsz))
+    values = " ".join(f"{name}={value:.3f}" for name, value in features.items())
+    return rejection_reason(features, thresholds), values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="그림 판정 임계값 확인")
+    parser.add_argument("--drawings", type=Path, nargs="+", required=True, help="통과해야 하는 그림 폴더")
+    parser.add_argument("--others", type=Path, nargs="*", default=[], help="거절되어야 하는 사진/스크린샷/빈 종이 폴더")
+    parser.add_argument("--imgsz", type=int, default=int(os.getenv("YOLO_IMGSZ", "640")))
+    parser.add_argument("--min-ink-ratio", type=float, default=float(os.getenv("DRAWING_MIN_INK_RATIO", "0.002")))
+    parser.add_argument("--min-paper-ratio", type=float, default=float(os.getenv("DRAWING_MIN_PAPER_RATIO", "0.35")))
+    parser.add_argument("--max-colorfulness", type=float, default=float(os.getenv("DRAWING_MAX_COLORFULNESS", "100")))
+    parser.add_argument("--max-edge-density", type=float, default=float(os.getenv("DRAWING_MAX_EDGE_DENSITY", "0.3")))
+    args = parser.parse_args()
+
+    thresholds = DrawingThresholds(
+        args.min_ink_ratio, args.min_paper_ratio, args.max_colorfulness, args.max_edge_density,
+    )
+
+    drawings = list(_images(args.drawings))
+    rejected = 0
+    for image_path in drawings:
+        reason, values = _judge(image_path, thresholds, args.imgsz)
+        if reason is not None:
+            rejected += 1
+            print(f"[그림 거절] {image_path} ({reason}) {values}")
+        else:
+            print(f"[통과] {image_path} {values}")
+
+    others = list(_images(args.others))
+    passed = 0
+    for image_path in others:
+        reason, values = _judge(image_path, thresholds, args.imgsz)
+        if reason is None:
+            passed += 1
+            print(f"[그림 아닌 입력 통과] {image_path} {values}")
+        else:
+            print(f"[거절] {image_path} ({reason}) {values}")
+
+    print(f"\n그림 {len(drawings)}개 중 거절 {rejected}개")
+    if others:
+        print(f"그림이 아닌 입력 {len(others)}개 중 통과 {passed}개")
+    return 1 if rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
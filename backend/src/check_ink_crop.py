@@ -0,0 +1,82 @@
+"""
+그림 영역 자동 크롭 전/후 규칙 결과 비교 스크립트
+
+사용 예:
+    python check_ink_crop.py --category 0 --images ./samples/house
+    python check_ink_crop.py --category 2 --images ./samples/person --buckets 320,416,512 --margin 0.04
+
+이미지마다 원본 전체(YOLO_IMGSZ)로 검출한 결과와, 그림 영역만 잘라 더 작은 imgsz 버킷으로 검출한 뒤
+원본 좌표로 되돌린 결과를 비교한다. 0.8 이상 검출끼리 (클래스, IoU >= 0.5) 로 짝짓고
+최종 analysis_text 가 같은지 확인하며, 하나라도 다르면 종료 코드 1 을 반환한다.
+INK_CROP_ENABLED=1 로 켜기 전에 실제 업로드 샘플로 이 스크립트를 통과시킨다.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from analysis_module import RULE_CONF, get_analysis_result
+from detections import unmatched_detections
+from detector_backends import DEFAULT_WEIGHTS, create_backend
+from image_prep import decode_image
+from ink_crop import plan_ink_crop
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="자동 크롭 전/후 규칙 결과 비교")
+    parser.add_argument("--category", type=int, choices=(0, 1, 2), required=True)
+    parser.add_argument("--images", type=Path, required=True, help="이미지 폴더")
+    parser.add_argument("--weights", type=Path, help="가중치(.pt) 경로 (기본: ~/htp/weights)")
+    parser.add_argument("--backend", default=os.getenv("YOLO_BACKEND", "torch"))
+    parser.add_argument("--conf", type=float, default=float(os.getenv("YOLO_CONF", "0.70")))
+    parser.add_argument("--imgsz", type=int, default=int(os.getenv("YOLO_IMGSZ", "640")))
+    parser.add_argument("--device", default=os.getenv("YOLO_DEVICE", "0"))
+    parser.add_argument("--buckets", default=os.getenv("INK_CROP_BUCKETS", "320,416,512"))
+    parser.add_argument("--margin", type=float, default=float(os.getenv("INK_CROP_MARGIN", "0.04")))
+    args = parser.parse_args()
+
+    buckets = [int(v) for v in args.buckets.split(",") if v.strip()]
+    backend = create_backend(args.backend, args.conf, args.imgsz, args.device)
+    model = backend.load_model(args.weights or DEFAULT_WEIGHTS[args.category])
+
+    images = sorted(p for p in args.images.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    mismatched = cropped = 0
+    area_ratios = []
+    for image_path in images:
+        image = decode_image(image_path, args.imgsz)
+        full_dets = backend.predict_batch(model, [image])[0]
+
+        plan = plan_ink_crop(image, args.imgsz, buckets, args.margin)
+        if plan is None:
+            print(f"[원본 유지] {image_path.name}")
+            continue
+        cropped += 1
+        left, top, right, bottom = plan.box
+        area_ratios.append((right - left) * (bottom - top) / (image.width * image.height))
+        crop_dets = plan.remap(backend.predict_batch(model, [plan.image], plan.imgsz)[0])
+
+        missing, extra = unmatched_detections(full_dets, crop_dets, min_conf=RULE_CONF)
+        same_text = (
+            get_analysis_result(args.category, detections=full_dets)
+            == get_analysis_result(args.category, detections=crop_dets)
+        )
+        if missing or extra or not same_text:
+            mismatched += 1
+            print(f"[불일치] {image_path.name} imgsz={plan.imgsz}: 누락 {len(missing)}개, 추가 {len(extra)}개, 문장 일치={same_text}")
+            for det in missing:
+                print(f"    원본에만 있음: {det}")
+            for det in extra:
+                print(f"    크롭에만 있음: {det}")
+        else:
+            print(f"[일치] {image_path.name} imgsz={plan.imgsz}")
+
+    if area_ratios:
+        print(f"\n크롭 영역 평균 비율: {sum(area_ratios) / len(area_ratios):.2f}")
+    print(f"총 {len(images)}개 중 크롭 {cropped}개, 불일치 {mismatched}개")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+콘텐츠 주소 기반 검출 결과 캐시
+
+같은 그림을 다시 올리는 경우(네트워크 오류 후 재시도 등) YOLO 추론을 건너뛰기 위해
+업로드 바이트의 SHA-256 + category + 모델 버전(가중치 해시/백엔드/정밀도) + conf + imgsz 를 키로
+Detection 리스트를 저장한다.
+
+- 메모리 LRU 계층 (항상 사용)
+- 디스크 계층 (선택): 카테고리별 폴더에 JSON 으로 저장하고, 전체 크기가 한도를 넘으면 오래 안 쓴 파일부터 삭제
+가중치가 교체되면 모델 버전이 바뀌어 키가 달라지고, invalidate_category() 로 이전 항목도 지운다.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from detections import Detection
+from metrics import metrics
+
+
+def make_key(content_sha256: str, category: int, model_version: str, conf: float, imgsz: int, prep: str = "") -> str:
+    # prep: 검출 전 전처리 설정(크롭 등). 설정이 바뀌면 다른 키가 된다
+    raw = f"{content_sha256}|{category}|{model_version}|{conf}|{imgsz}|{prep}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DetectionCache:
+    def __init__(self, max_entries: int, disk_dir: Path = None, disk_max_bytes: int = 0):
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._disk_bytes = 0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(p.stat().st_size for p in self.disk_dir.rglob("*.json"))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.disk_dir is not None
+
+    # ============= 조회/저장 =============
+    def get(self, key: str, category: int):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is not None:
+            metrics.inc("detection_cache", result="hit", tier="memory")
+            return entry[1]
+
+        detections = self._read_disk(key, category)
+        if detections is not None:
+            metrics.inc("detection_cache", result="hit", tier="disk")
+            self._put_memory(key, category, detections)
+            return detections
+
+        metrics.inc("detection_cache", result="miss")
+        return None
+
+    def put(self, key: str, category: int, detections: list) -> None:
+        self._put_memory(key, category, detections)
+        self._write_disk(key, category, detections)
+
+    def invalidate_category(self, category: int) -> None:
+        with self._lock:
+            stale = [key for key, (cat, _) in self._memory.items() if cat == category]
+            for key in stale:
+                del self._memory[key]
+        if self.disk_dir:
+            category_dir = self.disk_dir / str(category)
+            with self._lock:
+                removed = sum(p.stat().st_size for p in category_dir.rglob("*.json")) if category_dir.exists() else 0
+                shutil.rmtree(category_dir, ignore_errors=True)
+                self._disk_bytes = max(0, self._disk_bytes - removed)
+        metrics.inc("detection_cache_invalidations", category=category)
+
+    # ============= 메모리 계층 =============
+    def _put_memory(self, key: str, category: int, detections: list) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (category, list(detections))
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # ============= 디스크 계층 =============
+    def _disk_path(self, key: str, category: int) -> Path:
+        return self.disk_dir / str(category) / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str, category: int):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key, category)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+            os.utime(path)  # 최근 사용 시각 갱신 (삭제 순서 기준)
+        except (OSError, ValueError):
+            return None
+        return [Detection(int(row[0]), *map(float, row[1:6])) for row in rows]
+
+    def _write_disk(self, key: str, category: int, detections: list) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key, category)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps([list(d) for d in detections]).encode("utf-8")
+        tmp_path = path.with_name(f"{path.name}.tmp{threading.get_ident()}")
+        tmp_path.write_bytes(payload)
+        try:
+            # 같은 키를 덮어쓰면 이전 파일 크기만큼 사용량에서 뺀다
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._disk_bytes += len(payload) - replaced
+            over_limit = self.disk_max_bytes and self._disk_bytes > self.disk_max_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """디스크 사용량이 한도의 90% 이하가 될 때까지 오래 안 쓴 파일부터 삭제"""
+        files = []
+        for path in self.disk_dir.rglob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        target = int(self.disk_max_bytes * 0.9)
+        for _, size, path in files:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            metrics.inc("detection_cache_disk_evictions")
+        with self._lock:
+            self._disk_bytes = total
@@ -0,0 +1,93 @@
+"""
+YOLO 검출 결과 구조체
+
+라벨 파일(`cls cx cy w h conf`, 정규화 좌표) 한 줄과 같은 정보를 담는다.
+검출기는 이 구조체를 바로 반환하고, analysis_module 은 라벨 파일 없이 이를 그대로 받는다.
+"""
+from pathlib import Path
+from typing import Iterable, List, NamedTuple
+
+MATCH_IOU = 0.5
+
+
+class Detection(NamedTuple):
+    cls_id: int
+    cx: float
+    cy: float
+    w: float
+    h: float
+    conf: float
+
+
+def from_yolo_result(result) -> List[Detection]:
+    """ultralytics Results 한 개를 Detection 리스트로 변환"""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return []
+    classes = boxes.cls.tolist()
+    xywhn = boxes.xywhn.tolist()
+    confs = boxes.conf.tolist()
+    return [
+        Detection(int(cls_id), cx, cy, w, h, conf)
+        for cls_id, (cx, cy, w, h), conf in zip(classes, xywhn, confs)
+    ]
+
+
+def parse_label_lines(lines: Iterable[str]) -> List[Detection]:
+    detections = []
+    for line in lines:
+        parts = line.strip().split()
+        if len(parts) >= 6:
+            cx, cy, w, h = map(float, parts[1:5])
+            detections.append(Detection(int(parts[0]), cx, cy, w, h, float(parts[5])))
+    return detections
+
+
+def read_label_file(path) -> List[Detection]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_label_lines(f.readlines())
+
+
+def to_label_lines(detections: Iterable[Detection]) -> List[str]:
+    return [
+        f"{d.cls_id} {d.cx:g} {d.cy:g} {d.w:g} {d.h:g} {d.conf:g}"
+        for d in detections
+    ]
+
+
+def write_label_file(detections: Iterable[Detection], path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = to_label_lines(detections)
+    path.write_text("".join(line + "\n" for line in lines), encoding='utf-8')
+    return path
+
+
+# ============= 검출 결과 비교 =============
+def box_iou(a: Detection, b: Detection) -> float:
+    ax1, ay1, ax2, ay2 = a.cx - a.w / 2, a.cy - a.h / 2, a.cx + a.w / 2, a.cy + a.h / 2
+    bx1, by1, bx2, by2 = b.cx - b.w / 2, b.cy - b.h / 2, b.cx + b.w / 2, b.cy + b.h / 2
+    inter = max(0.0, min(ax2, bx2) - max(ax1, bx1)) * max(0.0, min(ay2, by2) - max(ay1, by1))
+    union = a.w * a.h + b.w * b.h - inter
+    return inter / union if union > 0 else 0.0
+
+
+def unmatched_detections(reference, candidate, min_conf: float = 0.0, iou: float = MATCH_IOU):
+    """
+    min_conf 이상인 검출끼리 클래스가 같고 IoU 가 iou 이상인 쌍을 탐욕적으로 매칭한 뒤
+    (reference 에만 있는 검출, candidate 에만 있는 검출) 을 반환
+    """
+    reference = [d for d in reference if d.conf >= min_conf]
+    remaining = [d for d in candidate if d.conf >= min_conf]
+    missing = []
+    for ref in sorted(reference, key=lambda d: -d.conf):
+        best, best_iou = None, iou
+        for cand in remaining:
+            if cand.cls_id == ref.cls_id:
+                overlap = box_iou(ref, cand)
+                if overlap >= best_iou:
+                    best, best_iou = cand, overlap
+        if best is None:
+            missing.append(ref)
+        else:
+            remaining.remove(best)
+    return missing, remaining
@@ -0,0 +1,334 @@
+"""
+검출기 백엔드
+
+- TorchBackend: ultralytics YOLO(.pt) 를 그대로 사용 (GPU 노드 기본값)
+- OnnxBackend : .pt 를 ONNX 로 한 번 내보내 가중치 옆에 캐시해 두고 ONNX Runtime(CPU)으로 실행
+
+두 백엔드 모두 이미지 리스트를 받아 이미지별 Detection 리스트를 반환하므로
+analysis_module 은 어떤 백엔드가 쓰였는지 알 필요가 없다.
+백엔드 선택은 YOLO_BACKEND 환경 변수(torch / onnx)로 하고,
+onnx 백엔드는 YOLO_PRECISION=int8 이면 quantize_models.py 로 만든 INT8 모델을 로드한다.
+cache(model_cache.ArtifactCache)를 넘기면 TorchScript / ONNX / ORT 최적화 그래프를
+가중치 해시 기준으로 디스크에 캐시해 두고 다음 프로세스부터 바로 로드한다.
+"""
+import logging
+import os
+import platform
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from detections import Detection, from_yolo_result
+
+logger = logging.getLogger(__name__)
+
+LETTERBOX_COLOR = (114, 114, 114)
+NMS_IOU = 0.7
+MAX_DET = 300
+
+# 카테고리별 YOLO 가중치 경로 (main.YOLO_MODELS 와 검증/양자화/캐시 도구가 모두 이 값을 쓴다)
+DEFAULT_WEIGHTS = {
+    0: Path.home() / "htp" / "weights" / "house_best.pt",
+    1: Path.home() / "htp" / "weights" / "tree_best.pt",
+    2: Path.home() / "htp" / "weights" / "person_best.pt",
+}
+
+
+def load_pil(source) -> Image.Image:
+    """파일 경로 또는 PIL 이미지를 EXIF 회전이 반영된 RGB 이미지로 변환"""
+    if isinstance(source, Image.Image):
+        return source if source.mode == "RGB" else source.convert("RGB")
+    with Image.open(source) as image:
+        return ImageOps.exif_transpose(image).convert("RGB")
+
+
+# ============= Torch(ultralytics) 백엔드 =============
+class TorchModel:
+    """
+    imgsz 별 YOLO 인스턴스. .pt 는 하나를 모든 크기에 쓰고,
+    TorchScript 는 고정 입력 크기로 export 되므로 크기마다 따로 만들어 둔다.
+    """
+
+    def __init__(self, weights_path: Path, loader, per_size: bool):
+        self.weights_path = weights_path
+        self._loader = loader
+        self._per_size = per_size
+        self._by_size = {}
+
+    def get(self, imgsz: int):
+        key = imgsz if self._per_size else None
+        model = self._by_size.get(key)
+        if model is None:
+            model = self._by_size[key] = self._loader(self.weights_path, imgsz)
+        return model
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, conf: float, imgsz: int, device: str, cache=None):
+        self.conf = conf
+        self.imgsz = imgsz
+        self.device = device
+        # CPU 에서는 half 가 의미 없거나 지원되지 않으므로 GPU 에서만 사용
+        self.half = str(device).lower() != "cpu"
+        self.cache = cache
+
+    def load_model(self, weights_path: Path) -> TorchModel:
+        model = TorchModel(weights_path, self._load_for_size, per_size=self.cache is not None)
+        model.get(self.imgsz)
+        return model
+
+    def _load_for_size(self, weights_path: Path, imgsz: int):
+        from ultralytics import YOLO
+
+        if self.cache is None:
+            return YOLO(str(weights_path))
+
+        # conv-bn 이 fuse 된 TorchScript 를 디바이스/imgsz/half 별로 캐시
+        import torch
+
+        artifact = self.cache.artifact_path(
+            weights_path, "torchscript", ".torchscript",
+            device=self.device, imgsz=imgsz, half=int(self.half), torch=torch.__version__,
+        )
+        self.cache.get_or_build(artifact, lambda tmp_path: self._export_torchscript(weights_path, tmp_path, imgsz))
+        return YOLO(str(artifact), task="detect")
+
+    def _export_torchscript(self, weights_path: Path, output_path: Path, imgsz: int) -> None:
+        from ultralytics import YOLO
+
+        exported = YOLO(str(weights_path)).export(
+            format="torchscript", imgsz=imgsz, device=self.device, half=self.half,
+        )
+        Path(exported).replace(output_path)
+
+    def predict_batch(self, model: TorchModel, sources: list, imgsz: int = None, classes: list = None) -> list:
+        imgsz = imgsz or self.imgsz
+        results = model.get(imgsz).predict(
+            source=sources,
+            batch=len(sources),
+            imgsz=imgsz,
+            classes=classes,
+            conf=self.conf,
+            device=self.device,
+            half=self.half,
+            save=False,
+            verbose=False,
+        )
+        return [from_yolo_result(result) for result in results]
+
+
+# ============= ONNX Runtime 백엔드 =============
+class OnnxModel:
+    def __init__(self, session, onnx_path: Path):
+        self.session = session
+        self.onnx_path = onnx_path
+        self.input_name = session.get_inputs()[0].name
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, conf: float, imgsz: int, intra_op_threads: int = 0, precision: str = "fp32", cache=None):
+        self.conf = conf
+        self.imgsz = imgsz
+        # 0 이면 물리 코어 수 정도(논리 코어의 절반)로 맞춘다
+        self.intra_op_threads = intra_op_threads or max(1, (os.cpu_count() or 2) // 2)
+        self.precision = precision
+        self.cache = cache
+
+    def onnx_path_for(self, weights_path: Path, precision: str = None) -> Path:
+        if (precision or self.precision) == "int8":
+            return weights_path.with_suffix(".int8.onnx")
+        return weights_path.with_suffix(".onnx")
+
+    def export(self, weights_path: Path) -> Path:
+        """
+        fp32 ONNX 파일을 만든다. 캐시가 있으면 가중치 해시로 키를 잡아 캐시 폴더에,
+        없으면 가중치 옆에 만들고 .pt 보다 새로우면 재사용
+        """
+        if self.cache is not None:
+            artifact = self.cache.artifact_path(weights_path, "onnx", ".onnx")
+            return self.cache.get_or_build(artifact, lambda tmp_path: self._export_onnx(weights_path, tmp_path))
+
+        onnx_path = self.onnx_path_for(weights_path, "fp32")
+        if onnx_path.exists() and onnx_path.stat().st_mtime >= weights_path.stat().st_mtime:
+            return onnx_path
+        self._export_onnx(weights_path, onnx_path)
+        return onnx_path
+
+    def _export_onnx(self, weights_path: Path, output_path: Path) -> None:
+        from ultralytics import YOLO
+
+        logger.info("ONNX 내보내기: %s -> %s", weights_path, output_path)
+        exported = YOLO(str(weights_path)).export(
+            format="onnx", imgsz=self.imgsz, dynamic=True, simplify=True, device="cpu",
+        )
+        exported = Path(exported)
+        if exported != output_path:
+            exported.replace(output_path)
+
+    def _session_options(self, level=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = level or ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return options
+
+    def create_session(self, onnx_path: Path):
+        import onnxruntime as ort
+
+        return ort.InferenceSession(str(onnx_path), self._session_options(), providers=["CPUExecutionProvider"])
+
+    def _optimize_graph(self, onnx_path: Path, output_path: Path) -> None:
+        # 하드웨어 비의존 최적화(EXTENDED)까지 적용한 그래프를 저장. 로드 시 레이아웃 최적화만 다시 수행된다
+        import onnxruntime as ort
+
+        options = self._session_options(ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED)
+        options.optimized_model_filepath = str(output_path)
+        ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+
+    def _cached_optimized_graph(self, weights_path: Path, onnx_path: Path) -> Path:
+        import onnxruntime as ort
+        from model_cache import file_sha256
+
+        artifact = self.cache.artifact_path(
+            weights_path, f"ort-{self.precision}", ".onnx",
+            source=file_sha256(onnx_path)[:12], ort=ort.__version__, arch=platform.machine(),
+        )
+        return self.cache.get_or_build(artifact, lambda tmp_path: self._optimize_graph(onnx_path, tmp_path))
+
+    def load_model(self, weights_path: Path) -> OnnxModel:
+        if self.precision == "int8":
+            # INT8 모델은 정확도 게이트를 통과해야 하므로 서버에서 자동 생성하지 않는다
+            onnx_path = self.onnx_path_for(weights_path)
+            if not onnx_path.exists():
+                raise FileNotFoundError(
+                    f"INT8 모델이 없습니다: {onnx_path} (quantize_models.py 로 먼저 생성하세요)"
+                )
+            if onnx_path.stat().st_mtime < weights_path.stat().st_mtime:
+                logger.warning("INT8 모델이 가중치보다 오래되었습니다. 다시 양자화하세요: %s", onnx_path)
+        else:
+            onnx_path = self.export(weights_path)
+        if self.cache is not None:
+            onnx_path = self._cached_optimized_graph(weights_path, onnx_path)
+        return OnnxModel(self.create_session(onnx_path), onnx_path)
+
+    def predict_batch(self, model: OnnxModel, sources: list, imgsz: int = None, classes: list = None) -> list:
+        # 동적 입력 크기로 export 했으므로 imgsz 를 요청마다 바꿀 수 있다
+        import numpy as np
+
+        images = [load_pil(source) for source in sources]
+        batch, metas = [], []
+        for image in images:
+            tensor, meta = letterbox(image, imgsz or self.imgsz)
+            batch.append(tensor)
+            metas.append(meta)
+        outputs = model.session.run(None, {model.input_name: np.stack(batch)})[0]
+        return [
+            postprocess(prediction, meta, self.conf, classes)
+            for prediction, meta in zip(outputs, metas)
+        ]
+
+
+def letterbox(image: Image.Image, imgsz: int):
+    """ultralytics LetterBox(auto=False) 와 같은 방식으로 비율을 유지해 imgsz 정사각형에 배치"""
+    import numpy as np
+
+    width, height = image.size
+    ratio = min(imgsz / height, imgsz / width)
+    new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+    pad_w, pad_h = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    left, top = int(round(pad_w - 0.1)), int(round(pad_h - 0.1))
+
+    canvas = Image.new("RGB", (imgsz, imgsz), LETTERBOX_COLOR)
+    resized = image if (new_w, new_h) == (width, height) else image.resize((new_w, new_h), Image.BILINEAR)
+    canvas.paste(resized, (left, top))
+
+    tensor = np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0
+    return tensor, (ratio, left, top, width, height)
+
+
+def nms(boxes, scores, iou_threshold: float):
+    import numpy as np
+
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        if len(keep) >= MAX_DET:
+            break
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return keep
+
+
+def postprocess(prediction, meta, conf: float, classes: list = None) -> list:
+    """
+    (4 + nc, N) 출력에서 클래스별 NMS 후 원본 이미지 기준 정규화 좌표의 Detection 리스트 생성
+    classes 를 주면 ultralytics 의 classes 인자처럼 그 클래스의 후보만 NMS 에 넘긴다
+    """
+    import numpy as np
+
+    ratio, left, top, width, height = meta
+    prediction = prediction.T
+    class_scores = prediction[:, 4:]
+    cls_ids = class_scores.argmax(1)
+    scores = class_scores[np.arange(len(cls_ids)), cls_ids]
+    mask = scores > conf
+    if classes is not None:
+        mask &= np.isin(cls_ids, classes)
+    if not mask.any():
+        return []
+
+    xywh, scores, cls_ids = prediction[mask, :4], scores[mask], cls_ids[mask]
+    boxes = np.empty_like(xywh)
+    boxes[:, 0] = xywh[:, 0] - xywh[:, 2] / 2
+    boxes[:, 1] = xywh[:, 1] - xywh[:, 3] / 2
+    boxes[:, 2] = xywh[:, 0] + xywh[:, 2] / 2
+    boxes[:, 3] = xywh[:, 1] + xywh[:, 3] / 2
+
+    # 클래스별 NMS: 클래스마다 좌표를 멀리 떨어뜨려 한 번에 처리
+    offsets = cls_ids[:, None].astype(np.float32) * 7680
+    keep = nms(boxes + offsets, scores, NMS_IOU)
+    boxes, scores, cls_ids = boxes[keep], scores[keep], cls_ids[keep]
+
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - left) / ratio).clip(0, width)
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - top) / ratio).clip(0, height)
+
+    detections = []
+    for (x1, y1, x2, y2), score, cls_id in zip(boxes.tolist(), scores.tolist(), cls_ids.tolist()):
+        detections.append(Detection(
+            int(cls_id),
+            (x1 + x2) / 2 / width, (y1 + y2) / 2 / height,
+            (x2 - x1) / width, (y2 - y1) / height,
+            float(score),
+        ))
+    return detections
+
+
+def create_backend(name: str, conf: float, imgsz: int, device: str, onnx_threads: int = 0,
+                   precision: str = "fp32", cache=None):
+    name = (name or "torch").lower()
+    precision = (precision or "fp32").lower()
+    if precision not in ("fp32", "int8"):
+        raise ValueError(f"지원하지 않는 YOLO_PRECISION 입니다: {precision}")
+    if name == "torch":
+        if precision == "int8":
+            raise ValueError("YOLO_PRECISION=int8 은 YOLO_BACKEND=onnx 에서만 사용할 수 있습니다.")
+        return TorchBackend(conf, imgsz, device, cache)
+    if name == "onnx":
+        return OnnxBackend(conf, imgsz, onnx_threads, precision, cache)
+    raise ValueError(f"지원하지 않는 YOLO_BACKEND 입니다: {name}")
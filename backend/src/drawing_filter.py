@@ -0,0 +1,91 @@
+"""
+추론 전 빠른 입력 검사 (빈 종이 / 그림이 아닌 사진 거절)
+
+빈 종이, 셀카, 스크린샷이 YOLO 추론과 xAI 호출을 모두 거친 뒤에야 빈 분석 결과로 끝나지 않도록
+128px 로 줄인 이미지에서 몇 가지 값만 계산해 CPU 에서 수 ms 안에 판정한다.
+
+- paper_ratio : 종이처럼 밝고 채도가 낮은 픽셀 비율. 너무 적으면 종이에 그린 그림이 아님(사진)
+- ink_ratio   : 종이 밝기보다 충분히 어두운(잉크) 픽셀 비율. 너무 적으면 빈 종이
+- colorfulness: Hasler-Süsstrunk 색채도. 너무 크면 사진/스크린샷
+- edge_density: 밝기 변화가 큰 픽셀 비율. 너무 크면 질감이 많은 사진이나 글자가 많은 화면
+
+임계값은 DrawingThresholds 로 받고, 거절 사유는 metrics 의 upload_rejected{reason=...} 로 센다.
+"""
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+from PIL import Image
+
+from ink_crop import INK_DELTA
+from metrics import metrics
+
+WORK_SIDE = 128
+# 종이로 보는 최소 밝기와 최대 채도(0~255)
+PAPER_MIN_LEVEL = 150
+PAPER_MAX_SATURATION = 60
+EDGE_DELTA = 48
+
+REJECT_MESSAGES = {
+    "blank": "그림이 없는 빈 이미지입니다. 그림을 그린 뒤 다시 촬영해 주세요.",
+    "not_paper": "종이에 그린 그림이 아닌 것 같습니다. 그림 전체가 보이도록 촬영해 주세요.",
+    "too_colorful": "그림이 아닌 사진이나 화면 캡처로 보입니다.",
+    "too_many_edges": "그림이 아닌 사진이나 화면 캡처로 보입니다.",
+}
+
+
+@dataclass
+class DrawingThresholds:
+    min_ink_ratio: float = 0.002
+    min_paper_ratio: float = 0.35
+    max_colorfulness: float = 100.0
+    max_edge_density: float = 0.3
+
+
+def drawing_features(image: Image.Image) -> dict:
+    import numpy as np
+
+    small = image.copy()
+    small.thumbnail((WORK_SIDE, WORK_SIDE), Image.BILINEAR)
+    rgb = np.asarray(small.convert("RGB"), dtype=np.int16)
+    gray = np.asarray(small.convert("L"), dtype=np.int16)
+    saturation = np.asarray(small.convert("HSV"), dtype=np.int16)[:, :, 1]
+
+    paper = np.percentile(gray, 90)
+    ink_ratio = float((gray < paper - INK_DELTA).mean())
+    paper_ratio = float(((gray >= PAPER_MIN_LEVEL) & (saturation <= PAPER_MAX_SATURATION)).mean())
+
+    rg = rgb[:, :, 0] - rgb[:, :, 1]
+    yb = (rgb[:, :, 0] + rgb[:, :, 1]) / 2 - rgb[:, :, 2]
+    colorfulness = float(np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean()))
+
+    dx = np.abs(np.diff(gray, axis=1))[:-1, :]
+    dy = np.abs(np.diff(gray, axis=0))[:, :-1]
+    edge_density = float((np.maximum(dx, dy) > EDGE_DELTA).mean()) if dx.size else 0.0
+
+    return {
+        "ink_ratio": ink_ratio,
+        "paper_ratio": paper_ratio,
+        "colorfulness": colorfulness,
+        "edge_density": edge_density,
+    }
+
+
+def rejection_reason(features: dict, thresholds: DrawingThresholds):
+    """거절 사유 문자열, 통과하면 None"""
+    if features["paper_ratio"] < thresholds.min_paper_ratio:
+        return "not_paper"
+    if features["ink_ratio"] < thresholds.min_ink_ratio:
+        return "blank"
+    if features["colorfulness"] > thresholds.max_colorfulness:
+        return "too_colorful"
+    if features["edge_density"] > thresholds.max_edge_density:
+        return "too_many_edges"
+    return None
+
+
+def check_drawing(image: Image.Image, thresholds: DrawingThresholds) -> None:
+    """그림이 아닌 입력이면 422"""
+    reason = rejection_reason(drawing_features(image), thresholds)
+    if reason is not None:
+        metrics.inc("upload_rejected", reason=reason)
+        raise HTTPException(status_code=422, detail=REJECT_MESSAGES[reason])
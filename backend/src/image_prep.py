@@ -0,0 +1,79 @@
+"""
+업로드 이미지 준비 단계
+
+- read_image_info: 픽셀을 디코딩하지 않고 헤더만 읽어 (가로, 세로, 포맷)을 확인하고
+  최대 가로/세로 및 전체 픽셀 수를 넘으면 413 으로 거절한다.
+- decode_image: 검출기 입력 크기(YOLO_IMGSZ) 근처로 줄여서 한 번만 디코딩한다.
+  JPEG 는 draft 모드(DCT 스케일링)로 1/2, 1/4, 1/8 크기로 바로 디코딩하므로
+  1200만 화소 사진을 전체 해상도로 풀지 않는다. 긴 변이 target_side 보다 작아지지는 않는다.
+  디코딩한 RGB 이미지 하나를 dHash / 검출기 등 픽셀이 필요한 모든 단계가 같이 쓴다.
+"""
+import io
+import math
+import warnings
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from metrics import metrics
+
+
+@dataclass
+class ImageInfo:
+    width: int
+    height: int
+    format: str
+
+
+def _open(source) -> Image.Image:
+    return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _unreadable(exc: Exception) -> HTTPException:
+    return HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f"이미지를 해석할 수 없습니다: {exc}")
+
+
+def _too_many_pixels(detail: str) -> HTTPException:
+    metrics.inc("upload_rejected", reason="too_many_pixels")
+    return HTTPException(status_code=413, detail=f"이미지 해상도가 너무 큽니다: {detail}")
+
+
+def read_image_info(source, max_side: int, max_pixels: int) -> ImageInfo:
+    """헤더만 읽어 이미지 크기를 확인하고 제한을 넘으면 413"""
+    try:
+        with _open(source) as image:
+            width, height = image.size
+            image_format = image.format or ""
+    except Exception as exc:
+        raise _unreadable(exc) from exc
+
+    if width > max_side or height > max_side or width * height > max_pixels:
+        raise _too_many_pixels(f"{width}x{height}")
+    return ImageInfo(width, height, image_format)
+
+
+def decode_image(source, target_side: int = 0) -> Image.Image:
+    """
+    EXIF 회전을 반영한 RGB 이미지로 디코딩한다.
+    target_side 를 주면 JPEG 는 긴 변이 target_side 이상인 가장 작은 DCT 스케일로 디코딩한다.
+    """
+    try:
+        with warnings.catch_warnings():
+            # Image.MAX_IMAGE_PIXELS 를 넘는 압축 폭탄은 경고로 넘기지 않고 거절
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with _open(source) as image:
+                full_size = image.size
+                if target_side and image.format == "JPEG":
+                    scale = target_side / max(full_size)
+                    if scale < 1:
+                        image.draft("RGB", (math.ceil(full_size[0] * scale), math.ceil(full_size[1] * scale)))
+                decoded = ImageOps.exif_transpose(image).convert("RGB")
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as exc:
+        raise _too_many_pixels(str(exc)) from exc
+    except Exception as exc:
+        raise _unreadable(exc) from exc
+
+    metrics.observe("image_decode_scale", max(decoded.size) / max(full_size))
+    return decoded
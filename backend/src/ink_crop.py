@@ -0,0 +1,102 @@
+"""
+그림 영역(잉크 bounding box) 자동 크롭
+
+HTP 사진은 대부분 빈 종이라서 640 letterbox 의 픽셀 대부분이 여백에 쓰인다.
+축소한 흑백 이미지에서 종이 밝기보다 충분히 어두운 픽셀을 행/열 방향으로 세어(투영)
+그림이 있는 영역을 찾고, 그 영역만 잘라 같은 유효 해상도(원본 대비 배율)를 유지하는
+더 작은 imgsz 버킷으로 검출한다. 검출 결과는 remap() 으로 원본 이미지 기준 정규화 좌표로 되돌린다.
+(analysis_module 규칙은 집전체 중앙 0.25~0.75, 사람전체 높이 2/3 등 전체 이미지 비율을 쓰므로 필수)
+
+크롭해도 이득이 없는 경우(그림이 거의 전체를 차지하거나 버킷이 줄지 않는 경우, 잉크를 못 찾은 경우)는
+None 을 반환하고 원본 그대로 검출한다.
+"""
+import math
+from dataclasses import dataclass
+
+from PIL import Image
+
+from detections import Detection
+from metrics import metrics
+
+WORK_SIDE = 256
+# 종이 밝기(상위 분위수)보다 이만큼 어두우면 잉크로 본다
+INK_DELTA = 40
+# 행/열에 잉크 픽셀이 이 비율 이상일 때만 그림 영역으로 본다 (먼지/잡티 무시)
+MIN_LINE_FRACTION = 0.01
+
+
+@dataclass
+class CropPlan:
+    image: Image.Image
+    imgsz: int
+    # 원본 이미지 기준 픽셀 좌표 (left, top, right, bottom)
+    box: tuple
+    full_size: tuple
+
+    def remap(self, detections: list) -> list:
+        """크롭 이미지 기준 정규화 좌표를 원본 이미지 기준 정규화 좌표로 변환"""
+        left, top, right, bottom = self.box
+        full_w, full_h = self.full_size
+        crop_w, crop_h = right - left, bottom - top
+        return [
+            Detection(
+                det.cls_id,
+                (left + det.cx * crop_w) / full_w,
+                (top + det.cy * crop_h) / full_h,
+                det.w * crop_w / full_w,
+                det.h * crop_h / full_h,
+                det.conf,
+            )
+            for det in detections
+        ]
+
+
+def find_ink_box(image: Image.Image, margin: float):
+    """그림 영역의 원본 픽셀 좌표 (left, top, right, bottom). 잉크가 없으면 None"""
+    import numpy as np
+
+    width, height = image.size
+    scale = min(1.0, WORK_SIDE / max(width, height))
+    small = image.convert("L")
+    if scale < 1.0:
+        small = small.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+
+    paper = np.percentile(pixels, 90)
+    ink = pixels < paper - INK_DELTA
+    rows = np.flatnonzero(ink.sum(axis=1) >= max(1, MIN_LINE_FRACTION * ink.shape[1]))
+    cols = np.flatnonzero(ink.sum(axis=0) >= max(1, MIN_LINE_FRACTION * ink.shape[0]))
+    if not rows.size or not cols.size:
+        return None
+
+    # 축소 좌표 -> 원본 좌표, 여백은 원본 크기 비율로 추가
+    pad_x, pad_y = margin * width, margin * height
+    left = max(0, math.floor(cols[0] / scale - pad_x))
+    top = max(0, math.floor(rows[0] / scale - pad_y))
+    right = min(width, math.ceil((cols[-1] + 1) / scale + pad_x))
+    bottom = min(height, math.ceil((rows[-1] + 1) / scale + pad_y))
+    return left, top, right, bottom
+
+
+def plan_ink_crop(image: Image.Image, imgsz: int, buckets: list, margin: float):
+    """
+    크롭 계획. 원본을 imgsz 로 letterbox 했을 때와 같은 배율을 유지하는 가장 작은 버킷을 고른다.
+    이득이 없으면 None
+    """
+    box = find_ink_box(image, margin)
+    if box is None:
+        metrics.inc("ink_crop", result="no_ink")
+        return None
+
+    width, height = image.size
+    left, top, right, bottom = box
+    needed = imgsz * max(right - left, bottom - top) / max(width, height)
+    bucket = min((b for b in buckets if b >= needed), default=imgsz)
+    if bucket >= imgsz:
+        metrics.inc("ink_crop", result="no_gain")
+        return None
+
+    metrics.inc("ink_crop", result="cropped")
+    metrics.observe("ink_crop_area_ratio", (right - left) * (bottom - top) / (width * height))
+    metrics.observe("ink_crop_imgsz", bucket)
+    return CropPlan(image.crop(box), bucket, box, (width, height))
@@ -0,0 +1,211 @@
+"""
+비동기 분석 작업(job) 저장소와 워커 풀
+
+POST /jobs 는 업로드를 JOB_DIR 에 저장하고 작업을 등록한 뒤 바로 job id 를 돌려주고,
+워커가 YOLO + 성격 분석을 실행해 결과를 저장한다. 클라이언트는 GET /jobs/{id} 로 상태/결과를 조회한다.
+(wait 를 주면 완료될 때까지 최대 그 시간만큼 기다리는 long-poll)
+
+- JobStore : SQLite 에 작업 상태/결과를 저장. 프로세스가 재시작되어도 남는다
+- JobRunner: asyncio 워커 풀. 시작 시 끝나지 않은 작업(queued/running)을 다시 큐에 넣는다
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+class JobStore:
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                category INTEGER NOT NULL,
+                image_path TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                result TEXT,
+                error TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self._conn.commit()
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor.fetchall()
+
+    def create(self, job_id: str, category: int, image_path: Path, sha256: str) -> None:
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, status, category, image_path, sha256, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, category, str(image_path), sha256, now, now),
+        )
+
+    def get(self, job_id: str):
+        rows = self._execute(
+            "SELECT id, status, category, image_path, sha256, created_at, updated_at, result, error "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        )
+        if not rows:
+            return None
+        job_id, status, category, image_path, sha256, created_at, updated_at, result, error = rows[0]
+        return {
+            "job_id": job_id,
+            "status": status,
+            "category": category,
+            "image_path": image_path,
+            "sha256": sha256,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "result": json.loads(result) if result else None,
+            "error": json.loads(error) if error else None,
+        }
+
+    def set_status(self, job_id: str, status: str, result=None, error=None) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, updated_at = ?, result = ?, error = ? WHERE id = ?",
+            (
+                status, time.time(),
+                json.dumps(result, ensure_ascii=False) if result is not None else None,
+                json.dumps(error, ensure_ascii=False) if error is not None else None,
+                job_id,
+            ),
+        )
+
+    def unfinished_ids(self) -> list:
+        rows = self._execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING),
+        )
+        return [row[0] for row in rows]
+
+    def purge_finished(self, older_than: float) -> int:
+        """완료 후 older_than 초가 지난 작업 삭제"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - older_than),
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobRunner:
+    def __init__(self, store: JobStore, handler, workers: int, retention_seconds: float = 0):
+        # handler(job: dict) -> 결과 dict (코루틴). 실패 시 (status, detail) 을 담은 예외를 올린다
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.retention_seconds = retention_seconds
+        self._queue = asyncio.Queue()
+        self._events = {}
+        self._tasks = []
+
+    async def start(self) -> None:
+        # 재시작 전에 끝나지 않은 작업을 다시 실행
+        pending = await asyncio.to_thread(self.store.unfinished_ids)
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+        if pending:
+            logger.info("끝나지 않은 작업 %d개를 다시 실행합니다.", len(pending))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.retention_seconds > 0:
+            self._tasks.append(asyncio.create_task(self._purge_loop()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: str) -> None:
+        self._queue.put_nowait(job_id)
+        metrics.inc("jobs", status=QUEUED)
+
+    async def wait(self, job_id: str, timeout: float) -> None:
+        """작업이 끝나거나 timeout 이 지날 때까지 대기 (long-poll)"""
+        event = self._events.setdefault(job_id, asyncio.Event())
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] in FINISHED:
+            self._events.pop(job_id, None)
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _notify(self, job_id: str) -> None:
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("작업 처리 중 오류: %s", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] in FINISHED:
+            return
+
+        await asyncio.to_thread(self.store.set_status, job_id, RUNNING)
+        metrics.observe("job_queue_wait_seconds", time.time() - job["created_at"])
+        started = time.perf_counter()
+        # 종료(취소)로 중단되면 running 상태와 입력 파일을 그대로 두어 재시작 후 다시 실행한다
+        try:
+            result = await self.handler(job)
+        except Exception as exc:
+            error = {
+                "status": getattr(exc, "status_code", 500),
+                "detail": getattr(exc, "detail", None) or f"분석 중 오류 발생: {exc}",
+            }
+            await asyncio.to_thread(self.store.set_status, job_id, FAILED, None, error)
+            metrics.inc("jobs", status=FAILED)
+        else:
+            await asyncio.to_thread(self.store.set_status, job_id, DONE, result)
+            metrics.inc("jobs", status=DONE)
+        metrics.observe("job_run_seconds", time.perf_counter() - started)
+        await asyncio.to_thread(Path(job["image_path"]).unlink, missing_ok=True)
+        self._notify(job_id)
+
+    async def _purge_loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(3600, self.retention_seconds))
+            try:
+                removed = await asyncio.to_thread(self.store.purge_finished, self.retention_seconds)
+                if removed:
+                    logger.info("보관 기간이 지난 작업 %d개를 삭제했습니다.", removed)
+            except Exception:
+                logger.exception("작업 정리 실패")
@@ -0,0 +1,221 @@
+"""
+성격 분석(LLM) 응답 캐시
+
+analysis_text 는 rules.py 의 고정된 문장들을 이어 붙인 것이라 같은 그림 특징이면 같은 프롬프트가 된다.
+문장 집합(순서/중복 무시)으로 정규화한 텍스트 + 프롬프트 버전 + 모델 이름 + temperature 를 키로
+LLM 결과문(원문 텍스트)을 저장한다.
+
+- 메모리 LRU 계층 (항상 사용)
+- SQLite 계층 (선택): 프로세스가 재시작되어도 남는다. TTL 이 지난 항목은 쓰지 않고, 행 수가 한도를 넘으면
+  오래 안 쓴 항목부터 삭제
+- variants: 키마다 결과문을 최대 K개까지 모은 뒤 돌아가며 반환한다. K개가 모이기 전까지는 miss 로 보고 새로 생성한다
+
+pregen_personality.py 로 미리 만든 결과 표는 load_precomputed 로 같은 키 공간({키: 결과문})으로 읽는다.
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_LINE_PREFIX = re.compile(r"^(\[[^\]]+\])\s*")
+
+
+def normalize_analysis_text(text: str) -> str:
+    """
+    분석 문장을 순서/중복과 무관한 형태로 정규화
+    /session 의 "[집] ..." 처럼 줄 앞에 그림 이름이 붙어 있으면 문장마다 그 이름을 유지한다
+    """
+    sentences = set()
+    for line in text.splitlines():
+        line = line.strip()
+        match = _LINE_PREFIX.match(line)
+        prefix = match.group(1) if match else ""
+        body = line[match.end():] if match else line
+        for sentence in _SENTENCE_END.split(body):
+            sentence = " ".join(sentence.split())
+            if sentence:
+                sentences.add(f"{prefix}{sentence}")
+    return "\n".join(sorted(sentences))
+
+
+def make_key(analysis_text: str, prompt_version: str, model: str, temperature: float) -> str:
+    raw = f"{prompt_version}|{model}|{temperature}|{normalize_analysis_text(analysis_text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def load_precomputed(path: Path, prompt_version: str, model: str) -> dict:
+    """사전 생성 표를 {키: 결과문} 으로 읽는다. 다른 프롬프트/모델로 만든 표면 빈 dict"""
+    with open(path, "r", encoding="utf-8") as f:
+        table = json.load(f)
+    if table.get("prompt_version") != prompt_version or table.get("model") != model:
+        logger.warning("사전 생성 표의 프롬프트/모델이 현재와 달라 사용하지 않습니다. 다시 생성하세요: %s", path)
+        return {}
+    return {key: entry["result"] for key, entry in table["entries"].items()}
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, db_path: Path = None, ttl_seconds: float = 0,
+                 max_rows: int = 0, variants: int = 1):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.variants = max(1, variants)
+        self._lock = threading.Lock()
+        # key -> [(결과문, 생성 시각, 생성에 걸린 시간), ...]
+        self._memory = OrderedDict()
+        self._next_variant = {}
+        self._conn = None
+        self._rows = 0
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT NOT NULL,
+                    variant INTEGER NOT NULL,
+                    value TEXT NOT NULL,
+                    latency REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    used_at REAL NOT NULL,
+                    PRIMARY KEY (key, variant)
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_used_at ON llm_cache (used_at)")
+            self._conn.commit()
+            self._purge_expired()
+            self._rows = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._conn is not None
+
+    # ============= 조회/저장 =============
+    def get(self, key: str):
+        """저장된 결과문 중 하나를 돌아가며 반환. variants 개가 모이지 않았거나 없으면 None"""
+        tier = "memory"
+        with self._lock:
+            entries = self._memory.get(key)
+            if entries is not None:
+                self._memory.move_to_end(key)
+        entries = self._fresh(entries)
+        if not entries:
+            tier = "disk"
+            entries = self._read_db(key)
+            if entries:
+                self._put_memory(key, entries)
+        if len(entries) < self.variants:
+            metrics.inc("llm_cache", result="miss")
+            return None
+
+        with self._lock:
+            index = self._next_variant.get(key, 0) % len(entries)
+            self._next_variant[key] = index + 1
+        value, _, latency = entries[index]
+        metrics.inc("llm_cache", result="hit", tier=tier)
+        metrics.observe("llm_cache_saved_seconds", latency)
+        if tier == "disk":
+            # 메모리 계층에서 찾은 경우는 쓰기를 줄이기 위해 사용 시각을 갱신하지 않는다
+            self._touch_db(key)
+        return value
+
+    def put(self, key: str, value: str, latency: float) -> None:
+        """새로 생성한 결과문을 variant 로 추가 (variants 개가 이미 있으면 가장 오래된 것을 교체)"""
+        now = time.time()
+        with self._lock:
+            entries = list(self._fresh(self._memory.get(key)) or [])
+        if not entries:
+            entries = self._read_db(key)
+        entries.append((value, now, latency))
+        entries = entries[-self.variants:]
+        self._put_memory(key, entries)
+        self._write_db(key, entries)
+
+    # ============= 메모리 계층 =============
+    def _fresh(self, entries):
+        if not entries or not self.ttl_seconds:
+            return entries or []
+        deadline = time.time() - self.ttl_seconds
+        return [entry for entry in entries if entry[1] >= deadline]
+
+    def _put_memory(self, key: str, entries: list) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = entries
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                old_key, _ = self._memory.popitem(last=False)
+                self._next_variant.pop(old_key, None)
+
+    # ============= SQLite 계층 =============
+    def _read_db(self, key: str) -> list:
+        if self._conn is None:
+            return []
+        deadline = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT value, created_at, latency FROM llm_cache WHERE key = ? AND created_at >= ? ORDER BY variant",
+                (key, deadline),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def _touch_db(self, key: str) -> None:
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+    def _write_db(self, key: str, entries: list) -> None:
+        if self._conn is None:
+            return
+        now = time.time()
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,)).rowcount
+            self._conn.executemany(
+                "INSERT INTO llm_cache (key, variant, value, latency, created_at, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, index, value, latency, created_at, now)
+                 for index, (value, created_at, latency) in enumerate(entries)],
+            )
+            self._conn.commit()
+            self._rows += len(entries) - removed
+            over_limit = self.max_rows and self._rows > self.max_rows
+        if over_limit:
+            self._evict_db()
+
+    def _purge_expired(self) -> None:
+        if not self.ttl_seconds:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+
+    def _evict_db(self) -> None:
+        """만료된 항목을 지우고, 그래도 한도의 90% 를 넘으면 오래 안 쓴 항목부터 삭제"""
+        self._purge_expired()
+        target = int(self.max_rows * 0.9)
+        with self._lock:
+            rows = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if rows > target:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE rowid IN "
+                    "(SELECT rowid FROM llm_cache ORDER BY used_at LIMIT ?)",
+                    (rows - target,),
+                )
+                self._conn.commit()
+                metrics.inc("llm_cache_evictions", rows - target)
+                rows = target
+            self._rows = rows
@@ -0,0 +1,375 @@
+"""
+성격 분석 LLM 호출 게이트웨이
+
+요청마다 xai Client 를 새로 만들면 gRPC 연결을 매번 새로 맺고, 시간 제한/동시 호출 제한/재시도가 없어
+upstream 이 느려지면 모든 요청이 끝없이 기다리다 500 이 된다. 게이트웨이는
+  - 프로세스 전체에서 Client(gRPC 채널) 하나를 재사용하고 (첫 호출 때 생성)
+  - 동시에 upstream 으로 나가는 호출 수를 max_concurrency 로 제한하고 (자리가 나기를 deadline 까지 기다림)
+  - 시도마다 call_timeout, 재시도를 포함한 전체에 deadline 을 적용하고
+    (deadline 이 지나면 새로 시도하지 않는다. 이미 시작한 시도는 call_timeout 까지 갈 수 있다)
+  - 일시적인 오류(UNAVAILABLE, RESOURCE_EXHAUSTED, DEADLINE_EXCEEDED, ABORTED)는 지터를 준 지수 백오프로 재시도하고
+  - 최근 오류 비율이 높으면 회로 차단기를 열어 cooldown 동안 바로 503 으로 응답한다
+    (cooldown 뒤 호출 하나만 시험으로 보내 성공하면 닫고, 실패하면 다시 연다)
+오류는 HTTPException 으로 올린다: 차단/일시적 오류 503, 시간 초과 504, 그 밖의 upstream 오류 502.
+
+느린 소수의 응답이 p99 를 좌우하므로 sample() 은 헤지(hedge) 요청을 지원한다.
+  - 첫 요청이 지금까지 성공한 호출 시간의 hedge_quantile(p95) 안에 끝나지 않으면 같은 요청을 하나 더 보내고
+    (빠른 모델이 있으면 그 모델로) 먼저 성공한 응답을 쓰고 나머지는 취소한다
+  - 동시 호출 자리가 남아 있을 때만 보낸다 (포화 상태에서 헤지가 부하를 키우지 않도록)
+  - 남은 시간(요청 마감 시각을 주면 그때까지)이 기본 모델의 p95 보다 짧으면 처음부터 빠른 모델로 보낸다
+sample()/stream() 은 실제로 답한 모델을 함께 돌려주므로, 호출하는 쪽은 기본 모델 키로 캐시할지 판단할 수 있다.
+헤지 비율/승률/추가 토큰은 llm_hedge, llm_hedge_wins, llm_hedge_extra_tokens 메트릭으로 본다.
+
+성격 분석 호출은 스레드에서 실행되므로 threading 기반으로 동작한다.
+로컬 테스트는 llm_standin.py (지연/오류를 흉내 내는 gRPC 서버)에 LLM_API_HOST 로 연결해서 한다.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+import grpc
+import xai_sdk
+from fastapi import HTTPException
+from xai_sdk import Client
+from xai_sdk.chat import Response
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 헤지하는 호출만 쓰는 _start_sample 은 xai_sdk 의 공개되지 않은 내부(chat._stub, chat._make_request, Response 생성자)를 쓴다.
+# 헤지하지 않는 호출(기본값)은 공개 API 인 chat.sample() 만 쓴다. 이 버전에서만 확인했으므로 환경 파일(htp_backend_environment*.yml)에 같은 버전으로 고정해 두었다.
+# 버전을 올릴 때는 tests/test_llm_gateway.py 를 다시 돌려 확인하고 이 값과 환경 파일을 함께 바꾼다
+XAI_SDK_VERSION = "1.20.0"
+if xai_sdk.__version__ != XAI_SDK_VERSION:
+    logger.warning("xai_sdk %s 은 확인하지 않은 버전입니다 (확인한 버전: %s). 헤지 호출이 동작하지 않을 수 있습니다.",
+                   xai_sdk.__version__, XAI_SDK_VERSION)
+
+TRANSIENT_CODES = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.ABORTED,
+}
+
+
+def _unavailable() -> HTTPException:
+    return HTTPException(status_code=503, detail="성격 분석 서비스가 일시적으로 응답하지 않습니다. 잠시 후 다시 시도해 주세요.")
+
+
+def _to_http_error(exc: grpc.RpcError) -> HTTPException:
+    code = exc.code()
+    if code == grpc.StatusCode.DEADLINE_EXCEEDED:
+        return HTTPException(status_code=504, detail="성격 분석 응답 시간이 초과되었습니다.")
+    if code in TRANSIENT_CODES:
+        return _unavailable()
+    return HTTPException(status_code=502, detail=f"AI 호출 오류: {code.name} {exc.details()}")
+
+
+def _start_sample(chat):
+    """
+    chat.sample() 과 같은 요청을 취소할 수 있는 grpc Future 로 보낸다 (xai_sdk 동기 API 는 취소할 수 없음)
+    xai_sdk 내부를 쓰므로 XAI_SDK_VERSION 에서만 확인했다. 결과는 Response(future.result(), 0) 으로 감싼다
+    """
+    return chat._stub.GetCompletion.future(chat._make_request(1))
+
+
+class _Attempt:
+    def __init__(self, role: str, model: str, future):
+        self.role = role
+        self.model = model
+        self.future = future
+        self.started = time.perf_counter()
+
+    @property
+    def succeeded(self) -> bool:
+        return self.future.done() and not self.future.cancelled() and self.future.exception() is None
+
+
+class CircuitBreaker:
+    def __init__(self, error_rate: float, min_calls: int, window_seconds: float, cooldown_seconds: float):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (시각, 성공 여부)
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown_seconds:
+                return False
+            # cooldown 이 지나면 시험 호출 하나만 통과
+            self._probing = True
+            return True
+
+    def record(self, ok: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                self._outcomes.clear()
+                self._opened_at = None if ok else now
+                metrics.inc("llm_breaker", state="closed" if ok else "open")
+                return
+            if self._opened_at is not None:
+                return
+            self._outcomes.append((now, ok))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+                self._outcomes.popleft()
+            failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+                self._opened_at = now
+                metrics.inc("llm_breaker", state="open")
+
+
+class LlmGateway:
+    def __init__(self, api_key: str = None, api_host: str = "api.x.ai", insecure: bool = False,
+                 max_concurrency: int = 16, call_timeout: float = 60, deadline: float = 90,
+                 retries: int = 2, backoff_seconds: float = 0.5, breaker: CircuitBreaker = None,
+                 hedge_quantile: float = 0, hedge_min_delay: float = 1.0):
+        self.api_key = api_key
+        self.api_host = api_host
+        self.insecure = insecure
+        self.max_concurrency = max(1, max_concurrency)
+        self.call_timeout = call_timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.breaker = breaker or CircuitBreaker(0.5, 10, 30, 15)
+        # 0 이면 헤지하지 않음
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    @property
+    def client(self) -> Client:
+        with self._client_lock:
+            if self._client is None:
+                self._client = Client(
+                    api_key=self.api_key,
+                    api_host=self.api_host,
+                    timeout=self.call_timeout,
+                    use_insecure_channel=self.insecure,
+                )
+            return self._client
+
+    @property
+    def in_flight(self) -> int:
+        """게이트웨이에 들어와 있는 호출 수 (자리를 기다리는 호출 포함)"""
+        return self._in_flight
+
+    def _enter(self, deadline: float) -> None:
+        with self._in_flight_lock:
+            self._in_flight += 1
+            metrics.observe("llm_in_flight", self._in_flight)
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._leave(acquired=False)
+            metrics.inc("llm_gateway", result="queue_timeout")
+            raise HTTPException(status_code=503, detail="성격 분석 요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해 주세요.")
+
+    def _leave(self, acquired: bool = True) -> None:
+        if acquired:
+            self._slots.release()
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def _backoff(self, attempt: int, deadline: float) -> bool:
+        """다음 시도 전 대기. 남은 시간이 없으면 False"""
+        remaining = deadline - time.monotonic()
+        if attempt >= self.retries or remaining <= 0:
+            return False
+        # full jitter: 0 ~ backoff * 2^attempt
+        time.sleep(min(remaining, random.uniform(0, self.backoff_seconds * (2 ** attempt))))
+        return time.monotonic() < deadline
+
+    # ============= 모델 선택/헤지 =============
+    def _route(self, model: str, fast_model: str, deadline: float) -> str:
+        """남은 시간이 model 의 p95 호출 시간보다 짧으면 fast_model"""
+        if fast_model and fast_model != model:
+            expected = metrics.quantile("llm_call_seconds", 0.95, model=model)
+            if expected > deadline - time.monotonic():
+                metrics.inc("llm_route", model=fast_model, reason="deadline")
+                return fast_model
+        metrics.inc("llm_route", model=model, reason="default")
+        return model
+
+    def _hedge_delay(self, model: str, deadline: float):
+        """헤지 요청을 보낼 때까지 기다릴 시간. 헤지하지 않으면 None"""
+        if not self.hedge_quantile:
+            return None
+        delay = metrics.quantile("llm_call_seconds", self.hedge_quantile, model=model)
+        if delay <= 0:
+            # 아직 성공한 호출 기록이 없음
+            return None
+        delay = max(self.hedge_min_delay, delay)
+        return delay if time.monotonic() + delay < deadline else None
+
+    def _sample_once(self, build_chat, model: str) -> tuple:
+        """헤지하지 않는 호출: 공개 API 인 chat.sample()"""
+        started = time.perf_counter()
+        response = build_chat(self.client, model).sample()
+        metrics.observe("llm_call_seconds", time.perf_counter() - started, model=model)
+        metrics.inc("llm_tokens", response.usage.total_tokens, model=model, role="primary")
+        return response, model
+
+    def _sample_hedged(self, build_chat, model: str, hedge_model: str, delay: float) -> tuple:
+        """delay 초 안에 첫 요청이 끝나지 않으면 hedge_model 로 같은 요청을 하나 더 보낸다"""
+        finished = threading.Event()
+        attempts = []
+
+        def start(role: str, model_name: str) -> None:
+            future = _start_sample(build_chat(self.client, model_name))
+            attempts.append(_Attempt(role, model_name, future))
+            future.add_done_callback(lambda _: finished.set())
+
+        start("primary", model)
+        hedge_slot = False
+        try:
+            if not finished.wait(delay):
+                hedge_slot = self._slots.acquire(blocking=False)
+                if hedge_slot:
+                    start("hedge", hedge_model)
+                    metrics.inc("llm_hedge", result="fired", model=hedge_model)
+                else:
+                    metrics.inc("llm_hedge", result="skipped")
+            while True:
+                finished.clear()
+                winner = next((attempt for attempt in attempts if attempt.succeeded), None)
+                if winner is not None or all(attempt.future.done() for attempt in attempts):
+                    break
+                finished.wait()
+        finally:
+            for attempt in attempts:
+                attempt.future.cancel()
+            if hedge_slot:
+                self._slots.release()
+
+        if winner is None:
+            # 모두 실패하면 첫 요청의 오류로 판단 (재시도 여부, HTTP 상태)
+            raise attempts[0].future.exception()
+        response = Response(winner.future.result(), 0)
+        # 헤지가 이겨 취소된 첫 요청도 그때까지 걸린 시간(실제 이상)을 기록해 p95 가 낮게 치우치지 않게 한다
+        primary = attempts[0]
+        metrics.observe("llm_call_seconds", time.perf_counter() - primary.started, model=primary.model)
+        if winner is not primary:
+            metrics.observe("llm_call_seconds", time.perf_counter() - winner.started, model=winner.model)
+        for attempt in attempts:
+            if attempt.succeeded:
+                usage = attempt.future.result().usage
+                metrics.inc("llm_tokens", usage.total_tokens, model=attempt.model, role=attempt.role)
+        if len(attempts) > 1:
+            metrics.inc("llm_hedge_wins", winner=winner.role)
+            loser = attempts[1] if winner is attempts[0] else attempts[0]
+            # 취소된 요청의 토큰은 알 수 없으므로 같은 프롬프트를 한 번 더 보낸 비용(prompt_tokens)으로 추정
+            extra = loser.future.result().usage.total_tokens if loser.succeeded else response.usage.prompt_tokens
+            metrics.inc("llm_hedge_extra_tokens", extra)
+        return response, winner.model
+
+    # ============= 호출 =============
+    def _deadline(self, request_deadline: float = None) -> float:
+        """게이트웨이 전체 시간 제한과 요청 마감 시각(time.monotonic 기준) 중 이른 쪽"""
+        deadline = time.monotonic() + self.deadline
+        return deadline if request_deadline is None else min(deadline, request_deadline)
+
+    def sample(self, build_chat, model: str, fast_model: str = None, deadline: float = None) -> tuple:
+        """
+        (build_chat(client, 모델 이름) 으로 만든 대화의 sample() 결과, 실제로 답한 모델)
+        fast_model: 남은 시간이 부족할 때와 헤지 요청에 쓸 모델 (없으면 model)
+        deadline: HTTP 요청의 마감 시각(time.monotonic 기준). 모델 선택/재시도/헤지가 이때까지 남은 시간으로 판단한다
+        """
+        deadline = self._deadline(deadline)
+        self._enter(deadline)
+        try:
+            attempt = 0
+            while True:
+                if not self.breaker.allow():
+                    metrics.inc("llm_gateway", result="rejected")
+                    raise _unavailable()
+                routed = self._route(model, fast_model, deadline)
+                delay = self._hedge_delay(routed, deadline)
+                try:
+                    if delay is None:
+                        response, answered = self._sample_once(build_chat, routed)
+                    else:
+                        response, answered = self._sample_hedged(build_chat, routed, fast_model or routed, delay)
+                except grpc.RpcError as exc:
+                    self.breaker.record(False)
+                    if exc.code() in TRANSIENT_CODES and self._backoff(attempt, deadline):
+                        metrics.inc("llm_gateway_retries", code=exc.code().name)
+                        attempt += 1
+                        continue
+                    metrics.inc("llm_gateway", result=exc.code().name)
+                    raise _to_http_error(exc) from exc
+                except Exception:
+                    self.breaker.record(False)
+                    metrics.inc("llm_gateway", result="error")
+                    raise
+                self.breaker.record(True)
+                metrics.inc("llm_gateway", result="ok")
+                return response, answered
+        finally:
+            self._leave()
+
+    def stream(self, build_chat, model: str, fast_model: str = None, deadline: float = None):
+        """
+        build_chat(client, 모델 이름) 으로 만든 대화의 stream() 조각(Chunk)을 (실제로 답한 모델, 조각) 으로 낸다.
+        첫 조각을 받기 전 오류만 재시도한다 (이미 보낸 조각을 되돌릴 수 없으므로). 헤지하지 않는다
+        deadline 은 sample() 과 같다
+        """
+        deadline = self._deadline(deadline)
+        self._enter(deadline)
+        try:
+            attempt = 0
+            while True:
+                if not self.breaker.allow():
+                    metrics.inc("llm_gateway", result="rejected")
+                    raise _unavailable()
+                routed = self._route(model, fast_model, deadline)
+                started = time.perf_counter()
+                received = False
+                try:
+                    for _, chunk in build_chat(self.client, routed).stream():
+                        received = True
+                        yield routed, chunk
+                except grpc.RpcError as exc:
+                    self.breaker.record(False)
+                    if not received and exc.code() in TRANSIENT_CODES and self._backoff(attempt, deadline):
+                        metrics.inc("llm_gateway_retries", code=exc.code().name)
+                        attempt += 1
+                        continue
+                    metrics.inc("llm_gateway", result=exc.code().name)
+                    raise _to_http_error(exc) from exc
+                except Exception:
+                    self.breaker.record(False)
+                    metrics.inc("llm_gateway", result="error")
+                    raise
+                except GeneratorExit:
+                    # 읽는 쪽이 중간에 닫음 (연결 끊김). upstream 오류가 아니므로 성공으로 기록
+                    self.breaker.record(True)
+                    raise
+                self.breaker.record(True)
+                metrics.observe("llm_call_seconds", time.perf_counter() - started, model=routed)
+                metrics.inc("llm_gateway", result="ok")
+                return
+        finally:
+            self._leave()
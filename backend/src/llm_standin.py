@@ -0,0 +1,156 @@
+"""
+성격 분석 LLM 대역 서버 (로컬 부하/장애 테스트용)
+
+xai_sdk 가 쓰는 gRPC Chat 서비스(GetCompletion, GetCompletionChunk)를 흉내 내어
+지연(--latency, --jitter, 가끔 매우 느린 응답 --slow-rate/--slow-latency, 모델별 지연 --model-latency)과
+오류(--error-rate, --error-code)를 마음대로 줄 수 있다.
+실제 API 를 쓰지 않고 게이트웨이의 동시 호출 제한, 시간 제한, 재시도, 회로 차단기를 확인할 때 쓴다.
+결과문은 프롬프트 형식(요약 2줄, 상세 7줄, 조언 3개)을 따르는 고정 문장이다.
+JSON 출력 형식(response_format)을 요청하면 같은 내용을 구조화 출력 스키마의 JSON 으로 돌려준다.
+
+사용 예:
+    python llm_standin.py --port 50051 --latency 2 --jitter 1 --error-rate 0.2
+    python llm_standin.py --latency 2 --slow-rate 0.05 --slow-latency 15 --model-latency grok-3-mini=0.5
+    LLM_API_HOST=localhost:50051 LLM_INSECURE=1 XAI_API_KEY=local uvicorn main:app
+"""
+import argparse
+import json
+import random
+import time
+from concurrent import futures
+
+import grpc
+from xai_sdk.proto.v6 import chat_pb2, chat_pb2_grpc, sample_pb2, usage_pb2
+
+REPLY_LINES = [
+    "🤝 친화성: 다른 사람을 배려하고 따뜻하게 대하는 성향이 보여요.",
+    "주변과 조화를 이루며 안정감을 찾는 모습이 그림에 드러납니다.",
+    "그림 속 요소들이 균형 있게 배치되어 있어요.",
+    "이는 관계 속에서 편안함을 느끼는 마음을 나타낼 수 있어요.",
+    "세부 묘사에서 주변을 세심하게 살피는 태도가 보입니다.",
+    "새로운 상황에서도 차분하게 적응하려는 모습이 느껴져요.",
+    "다른 사람의 감정에 공감하는 힘이 있어요.",
+    "때로는 자신의 의견을 표현하는 것을 망설일 수도 있어요.",
+    "스스로를 믿고 자신감을 가져도 좋아요.",
+    "💬 생각을 솔직하게 표현하는 연습을 해 보세요.",
+    "🌱 나만을 위한 시간을 꾸준히 가져 보세요.",
+    "🤗 고마운 사람에게 마음을 전해 보세요.",
+]
+REPLY = "\n".join(REPLY_LINES)
+JSON_REPLY = json.dumps({
+    "type": "Agreeableness",
+    "summary": " ".join(REPLY_LINES[:2]),
+    "details": " ".join(REPLY_LINES[2:9]),
+    "advices": REPLY_LINES[9:12],
+    "warning": "",
+}, ensure_ascii=False)
+JSON_FORMATS = (chat_pb2.FormatType.FORMAT_TYPE_JSON_OBJECT, chat_pb2.FormatType.FORMAT_TYPE_JSON_SCHEMA)
+STREAM_CHUNK_CHARS = 16
+
+
+class StandinChat(chat_pb2_grpc.ChatServicer):
+    def __init__(self, latency: float, jitter: float, error_rate: float, error_code: grpc.StatusCode,
+                 slow_rate: float = 0.0, slow_latency: float = 0.0, model_latency: dict = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.model_latency = model_latency or {}
+
+    def _delay_or_fail(self, request, context) -> None:
+        latency = self.model_latency.get(request.model, self.latency)
+        if random.random() < self.slow_rate:
+            latency = self.slow_latency
+        time.sleep(max(0.0, latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.error_rate:
+            context.abort(self.error_code, "stand-in error")
+
+    def _reply(self, request) -> str:
+        return JSON_REPLY if request.response_format.format_type in JSON_FORMATS else REPLY
+
+    def _usage(self, request) -> usage_pb2.SamplingUsage:
+        prompt_tokens = sum(len(content.text) for message in request.messages for content in message.content)
+        completion_tokens = len(self._reply(request))
+        return usage_pb2.SamplingUsage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+
+    def GetCompletion(self, request, context):
+        self._delay_or_fail(request, context)
+        return chat_pb2.GetChatCompletionResponse(
+            id="standin",
+            model=request.model,
+            outputs=[chat_pb2.CompletionOutput(
+                index=0,
+                finish_reason=sample_pb2.FinishReason.REASON_STOP,
+                message=chat_pb2.CompletionMessage(content=self._reply(request), role=chat_pb2.MessageRole.ROLE_ASSISTANT),
+            )],
+            usage=self._usage(request),
+        )
+
+    def GetCompletionChunk(self, request, context):
+        # 첫 조각까지의 지연/오류만 흉내 내고 나머지 조각은 바로 보낸다
+        self._delay_or_fail(request, context)
+        reply = self._reply(request)
+        for start in range(0, len(reply), STREAM_CHUNK_CHARS):
+            yield chat_pb2.GetChatCompletionChunk(
+                id="standin",
+                model=request.model,
+                outputs=[chat_pb2.CompletionOutputChunk(
+                    index=0,
+                    delta=chat_pb2.Delta(content=reply[start:start + STREAM_CHUNK_CHARS],
+                                         role=chat_pb2.MessageRole.ROLE_ASSISTANT),
+                )],
+            )
+        yield chat_pb2.GetChatCompletionChunk(
+            id="standin",
+            model=request.model,
+            outputs=[chat_pb2.CompletionOutputChunk(index=0, finish_reason=sample_pb2.FinishReason.REASON_STOP)],
+            usage=self._usage(request),
+        )
+
+
+def serve(port: int, latency: float = 1.0, jitter: float = 0.0, error_rate: float = 0.0,
+          error_code: str = "UNAVAILABLE", workers: int = 64, slow_rate: float = 0.0,
+          slow_latency: float = 0.0, model_latency: dict = None) -> grpc.Server:
+    """대역 서버를 띄워 반환 (멈출 때는 server.stop(None))"""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    chat_pb2_grpc.add_ChatServicer_to_server(
+        StandinChat(latency, jitter, error_rate, grpc.StatusCode[error_code], slow_rate, slow_latency, model_latency),
+        server,
+    )
+    server.add_insecure_port(f"[::]:{port}")
+    server.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="성격 분석 LLM 대역 gRPC 서버")
+    parser.add_argument("--port", type=int, default=50051)
+    parser.add_argument("--latency", type=float, default=1.0, help="응답(스트리밍은 첫 조각)까지 평균 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="지연에 더하는 ±범위(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="오류로 응답할 비율 (0~1)")
+    parser.add_argument("--error-code", default="UNAVAILABLE", help="오류 시 gRPC 상태 코드 이름")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="--slow-latency 로 느리게 응답할 비율 (0~1)")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="느린 응답의 지연(초)")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="모델별 평균 지연 (여러 번 지정 가능)")
+    parser.add_argument("--workers", type=int, default=64)
+    args = parser.parse_args()
+
+    model_latency = {}
+    for item in args.model_latency:
+        model, _, seconds = item.partition("=")
+        model_latency[model] = float(seconds)
+    server = serve(args.port, args.latency, args.jitter, args.error_rate, args.error_code, args.workers,
+                   args.slow_rate, args.slow_latency, model_latency)
+    print(f"LLM 대역 서버: localhost:{args.port} (지연 {args.latency}±{args.jitter}s, 오류율 {args.error_rate})")
+    server.wait_for_termination()
+
+
+if __name__ == "__main__":
+    main()
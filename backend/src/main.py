@@ -1,15 +1,20 @@
 import asyncio
+import hashlib
+import json
+import logging
 import os
 import shutil
-import subprocess
 import sys
+import time
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict
 
-from fastapi import BackgroundTasks, FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from PIL import Image
+from starlette.concurrency import iterate_in_threadpool
 from starlette.status import HTTP_400_BAD_REQUEST, HTTP_500_INTERNAL_SERVER_ERROR
 
 from dotenv import load_dotenv
@@ -24,26 +29,244 @@ os.chdir(BASE_DIR)
 
 UPLOAD_DIR = BASE_DIR / "uploads"
 YOLO_OUTPUT_DIR = BASE_DIR / "yolo_outputs"
+# 비동기 작업 입력 파일과 작업 SQLite 는 소스 폴더 밖에 둔다 (재시작 후에도 남아야 하므로 임시 폴더가 아님)
+JOB_DIR = Path(os.getenv("JOB_DIR", str(Path.home() / ".htp_backend" / "jobs")))
 
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 YOLO_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+JOB_DIR.mkdir(parents=True, exist_ok=True)
 
-YOLO_MODELS: Dict[int, Path] = {
-    0: Path.home() / "htp" / "weights" / "house_best.pt",
-    1: Path.home() / "htp" / "weights" / "tree_best.pt",
-    2: Path.home() / "htp" / "weights" / "person_best.pt",
-}
+CATEGORY_NAMES = {0: "집", 1: "나무", 2: "사람"}
 
 YOLO_CONF = float(os.getenv("YOLO_CONF", "0.70"))
 YOLO_IMGSZ = int(os.getenv("YOLO_IMGSZ", "640"))
 YOLO_DEVICE = os.getenv("YOLO_DEVICE", "0")
-YOLO_BINARY = os.getenv("YOLO_BIN", "yolo")
+# 검출기 백엔드: torch(ultralytics) 또는 onnx(ONNX Runtime CPU)
+YOLO_BACKEND = os.getenv("YOLO_BACKEND", "torch")
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+# onnx 백엔드 정밀도: fp32 또는 int8(quantize_models.py 로 생성한 모델)
+YOLO_PRECISION = os.getenv("YOLO_PRECISION", "fp32")
+# TorchScript/ONNX 등 최적화된 모델 아티팩트를 가중치 해시 기준으로 캐시하는 폴더 (빈 값이면 캐시 안 함, 기본값)
+# torch 백엔드는 지정하면 .pt 대신 TorchScript 를 쓰므로 check_backend_parity.py --compare torchscript 로 확인한 뒤 켠다
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "")
+# 같은 카테고리 요청을 모으는 시간 창(ms)과 최대 배치 크기
+YOLO_BATCH_WINDOW_MS = float(os.getenv("YOLO_BATCH_WINDOW_MS", "10"))
+YOLO_BATCH_MAX = int(os.getenv("YOLO_BATCH_MAX", "8"))
+# 그림 영역 자동 크롭: 켜면 여백을 잘라내고 같은 유효 해상도의 더 작은 imgsz 버킷으로 검출
+# (check_ink_crop.py 로 규칙 결과가 바뀌지 않는지 확인한 뒤 켠다)
+INK_CROP_ENABLED = os.getenv("INK_CROP_ENABLED", "0") == "1"
+INK_CROP_MARGIN = float(os.getenv("INK_CROP_MARGIN", "0.04"))
+INK_CROP_BUCKETS = [int(v) for v in os.getenv("INK_CROP_BUCKETS", "320,416,512").split(",") if v.strip()]
+# 캐스케이드 추론: 먼저 작은 입력 크기로 검출하고 기준 객체가 없거나
+# confidence 가 규칙 기준(0.8)과 CASCADE_MARGIN 이내로 가까울 때만 원래 크기로 다시 검출
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "0") == "1"
+CASCADE_FIRST_IMGSZ = int(os.getenv("CASCADE_FIRST_IMGSZ", "320"))
+CASCADE_MARGIN = float(os.getenv("CASCADE_MARGIN", "0.1"))
+# 비동기 작업(POST /jobs): SQLite 저장 경로, 워커 수, 완료된 작업 보관 시간(시간), long-poll 최대 대기(초)
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", str(JOB_DIR / "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+# 1 이면 rules.py 기준으로 최종 문장에 영향을 주는 클래스만 검출 (rule_deps.py 가 시작 시 계산)
+RULE_CLASS_FILTER = os.getenv("RULE_CLASS_FILTER", "1") == "1"
+# 추론 전 빈 종이/그림이 아닌 이미지 거절(422) 및 판정 임계값
+# (실제 업로드를 거절하므로 check_drawing_filter.py 로 그림 샘플이 모두 통과하는지 확인한 뒤 켠다)
+DRAWING_FILTER_ENABLED = os.getenv("DRAWING_FILTER_ENABLED", "0") == "1"
+DRAWING_MIN_INK_RATIO = float(os.getenv("DRAWING_MIN_INK_RATIO", "0.002"))
+DRAWING_MIN_PAPER_RATIO = float(os.getenv("DRAWING_MIN_PAPER_RATIO", "0.35"))
+DRAWING_MAX_COLORFULNESS = float(os.getenv("DRAWING_MAX_COLORFULNESS", "100"))
+DRAWING_MAX_EDGE_DENSITY = float(os.getenv("DRAWING_MAX_EDGE_DENSITY", "0.3"))
+# 업로드 제한: 최대 바이트, 메모리에 둘 최대 바이트(넘으면 임시 파일로), 최대 가로/세로 및 전체 픽셀 수,
+# 본문 수신이 멈춘 채 기다리는 시간(초)과 본문 전체 수신 제한 시간(초)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_MEMORY_LIMIT = int(os.getenv("UPLOAD_MEMORY_LIMIT", str(4 * 1024 * 1024)))
+MAX_IMAGE_SIDE = int(os.getenv("MAX_IMAGE_SIDE", "8000"))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(50_000_000)))
+# 헤더 검사를 거치지 않는 경로에서도 압축 폭탄을 디코딩하지 않도록 PIL 한도를 같이 맞춘다
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+UPLOAD_IDLE_TIMEOUT = float(os.getenv("UPLOAD_IDLE_TIMEOUT", "15"))
+UPLOAD_BODY_TIMEOUT = float(os.getenv("UPLOAD_BODY_TIMEOUT", "60"))
+# 집/나무/사람 세 장을 한 본문으로 받는 POST /session 의 본문 전체 수신 제한 시간(초). 기본값은 한 장 제한의 세 배
+SESSION_BODY_TIMEOUT = float(os.getenv("SESSION_BODY_TIMEOUT", str(3 * UPLOAD_BODY_TIMEOUT)))
+# 대량 분석(POST /bulk): 요청 전체 최대 바이트, 최대 그림 수, 동시에 분석하는 최대 그림 수, 본문 전체 수신 제한 시간(초)
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+BULK_MAX_IN_FLIGHT = int(os.getenv("BULK_MAX_IN_FLIGHT", "16"))
+BULK_BODY_TIMEOUT = float(os.getenv("BULK_BODY_TIMEOUT", "1800"))
+# 검출 결과 캐시: 메모리 LRU 항목 수(0 이면 사용 안 함), 디스크 계층 폴더(빈 값이면 사용 안 함)와 최대 크기(MB)
+DETECTION_CACHE_SIZE = int(os.getenv("DETECTION_CACHE_SIZE", "1024"))
+DETECTION_CACHE_DIR = os.getenv("DETECTION_CACHE_DIR", "")
+DETECTION_CACHE_DISK_MB = int(os.getenv("DETECTION_CACHE_DISK_MB", "512"))
+# 근접 중복(지각 해시) 색인: 사용 여부, 후보로 볼 해밍 거리(64비트 중), 카테고리별 최대 항목 수
+# 후보는 축소 이미지 픽셀 비교로 확인한 뒤에만 재사용한다 (항목당 약 16KB)
+PHASH_ENABLED = os.getenv("PHASH_ENABLED", "0") == "1"
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "4"))
+PHASH_CAPACITY = int(os.getenv("PHASH_CAPACITY", "5000"))
+# 가중치 파일 교체 감지 주기(초). 교체되면 모델을 다시 로드하고 해당 카테고리 캐시를 비운다
+WEIGHTS_WATCH_INTERVAL = float(os.getenv("WEIGHTS_WATCH_INTERVAL", "30"))
+# 성격 분석(LLM) 응답 캐시: 메모리 LRU 항목 수(0 이면 사용 안 함), SQLite 계층 경로(빈 값이면 사용 안 함),
+# 보관 시간(시간, 0 이면 무기한), SQLite 최대 행 수, 키마다 모아 두고 돌아가며 보여 줄 결과문 수
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "")
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "100000"))
+LLM_CACHE_VARIANTS = int(os.getenv("LLM_CACHE_VARIANTS", "1"))
+# pregen_personality.py 로 미리 생성한 성격 분석 결과 표(JSON). 표에 있는 문장은 LLM 을 호출하지 않는다 (빈 값이면 사용 안 함)
+PERSONALITY_TABLE = os.getenv("PERSONALITY_TABLE", "")
+# 검출 특징 벡터 최근접 결과 색인: 카테고리별 최대 항목 수(0 이면 사용 안 함), 허용 해밍 거리,
+# 진행 중인 LLM 호출이 이 수 이상이면(포화) 새로 호출하지 않고 가장 가까운 이전 결과문을 사용
+NARRATIVE_INDEX_CAPACITY = int(os.getenv("NARRATIVE_INDEX_CAPACITY", "100000"))
+NARRATIVE_NN_MAX_DISTANCE = int(os.getenv("NARRATIVE_NN_MAX_DISTANCE", "2"))
+NARRATIVE_NN_SATURATION = int(os.getenv("NARRATIVE_NN_SATURATION", "16"))
+# 성격 분석 LLM 게이트웨이: API 주소(llm_standin.py 대역 서버 등), 1 이면 TLS 없이 연결, 동시 호출 수,
+# 시도마다의 시간 제한(초), 재시도를 포함한 전체 시간 제한(초), 일시적 오류 재시도 횟수, 재시도 백오프 기준(초)
+LLM_API_HOST = os.getenv("LLM_API_HOST", "api.x.ai")
+LLM_INSECURE = os.getenv("LLM_INSECURE", "0") == "1"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "60"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "90"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+# 같은 문장 집합으로 진행 중인 호출을 기다리는 최대 시간(초): 먼저 시작한 호출의 전체 시간 제한에
+# 이미 시작한 시도가 시도별 시간 제한까지 갈 수 있는 여유를 더한 값
+LLM_FLIGHT_WAIT = LLM_DEADLINE + LLM_CALL_TIMEOUT
+# POST / , /stream, /session 요청이 도착한 뒤 응답까지의 시간 제한(초). 업로드/검출에 쓴 시간을 뺀 나머지로
+# LLM 모델 선택/재시도/헤지를 판단한다 (작업/일괄 처리는 LLM_DEADLINE 만 적용)
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "90"))
+# 회로 차단기: 최근 LLM_BREAKER_WINDOW 초 동안 LLM_BREAKER_MIN_CALLS 회 이상 호출 중 오류 비율이
+# LLM_BREAKER_ERROR_RATE 이상이면 LLM_BREAKER_COOLDOWN 초 동안 호출하지 않고 바로 503
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_WINDOW = float(os.getenv("LLM_BREAKER_WINDOW", "30"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "15"))
+# 헤지 요청: 1 이면 첫 요청이 성공 호출 시간의 LLM_HEDGE_QUANTILE 분위수(최소 LLM_HEDGE_MIN_DELAY 초) 안에 끝나지 않을 때
+# 같은 요청을 하나 더 보내(LLM_FAST_MODEL 이 있으면 그 모델로) 먼저 끝난 응답을 쓴다
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+# 1 이면 업로드/라벨 파일을 디스크에 남기는 디버깅용 파일 경로로 분석
+DETECTION_DEBUG_FILES = os.getenv("DETECTION_DEBUG_FILES", "0") == "1"
 
 from analysis_module import get_analysis_result  # noqa: E402
-from psychology_grok_v2_ver3 import analyze_personality  # noqa: E402
+from psychology_grok_v2_ver3 import (  # noqa: E402
+    MODEL, PROMPT_VERSION, generate_personality_text, parse_personality_result, select_model, select_temperature,
+    stream_personality,
+)
+from batching import MicroBatcher  # noqa: E402
+from bulk import ZIP_CONTENT_TYPES, BulkItem, NdjsonResponse, iter_multipart_items, iter_zip_items  # noqa: E402
+from cascade import escalation_reason  # noqa: E402
+from detection_cache import DetectionCache, make_key  # noqa: E402
+from detections import Detection, write_label_file  # noqa: E402
+# 카테고리별 가중치 경로는 detector_backends 한 곳에서 정의 (검증/양자화 도구와 공유)
+from detector_backends import DEFAULT_WEIGHTS as YOLO_MODELS, create_backend  # noqa: E402
+from drawing_filter import DrawingThresholds, check_drawing  # noqa: E402
+from image_prep import decode_image, read_image_info  # noqa: E402
+from ink_crop import plan_ink_crop  # noqa: E402
+from jobs import JobRunner, JobStore  # noqa: E402
+from llm_cache import ResponseCache, load_precomputed, make_key as make_llm_key  # noqa: E402
+from llm_gateway import CircuitBreaker, LlmGateway  # noqa: E402
+from metrics import metrics  # noqa: E402
+from narrative_index import NarrativeIndex, feature_vector  # noqa: E402
+from model_cache import ArtifactCache  # noqa: E402
+from phash_index import PerceptualHashIndex, fingerprint  # noqa: E402
+from rule_deps import CLASS_NAMES, class_filter, relevant_classes  # noqa: E402
+from singleflight import NotShared, SingleFlight  # noqa: E402
+from upload_ingest import IngestedUpload, UploadLimitMiddleware, ingest_upload  # noqa: E402
+from yolo_engine import YoloEngine  # noqa: E402
+
+yolo_engine = YoloEngine(
+    YOLO_MODELS,
+    create_backend(
+        YOLO_BACKEND, YOLO_CONF, YOLO_IMGSZ, YOLO_DEVICE, ONNX_INTRA_OP_THREADS, YOLO_PRECISION,
+        cache=ArtifactCache(Path(MODEL_CACHE_DIR)) if MODEL_CACHE_DIR else None,
+    ),
+    extra_imgsz=(INK_CROP_BUCKETS if INK_CROP_ENABLED else []) + ([CASCADE_FIRST_IMGSZ] if CASCADE_ENABLED else []),
+    class_filter=class_filter() if RULE_CLASS_FILTER else None,
+)
+
+yolo_batcher = MicroBatcher(
+    # 같은 카테고리 + 같은 입력 크기끼리만 한 배치로 묶는다
+    lambda key, sources: yolo_engine.predict_batch(sources, key[0], key[1]),
+    window_ms=YOLO_BATCH_WINDOW_MS,
+    max_batch=YOLO_BATCH_MAX,
+)
+drawing_thresholds = DrawingThresholds(
+    DRAWING_MIN_INK_RATIO, DRAWING_MIN_PAPER_RATIO, DRAWING_MAX_COLORFULNESS, DRAWING_MAX_EDGE_DENSITY,
+)
+detection_cache = DetectionCache(
+    DETECTION_CACHE_SIZE,
+    disk_dir=Path(DETECTION_CACHE_DIR) if DETECTION_CACHE_DIR else None,
+    disk_max_bytes=DETECTION_CACHE_DISK_MB * 1024 * 1024,
+)
+phash_index = PerceptualHashIndex(PHASH_CAPACITY if PHASH_ENABLED else 0, PHASH_MAX_DISTANCE)
+llm_cache = ResponseCache(
+    LLM_CACHE_SIZE,
+    db_path=Path(LLM_CACHE_DB) if LLM_CACHE_DB else None,
+    ttl_seconds=LLM_CACHE_TTL_HOURS * 3600,
+    max_rows=LLM_CACHE_MAX_ROWS,
+    variants=LLM_CACHE_VARIANTS,
+)
+narrative_index = NarrativeIndex(NARRATIVE_INDEX_CAPACITY, NARRATIVE_NN_MAX_DISTANCE)
+llm_gateway = LlmGateway(
+    api_key=os.getenv("XAI_API_KEY"),
+    api_host=LLM_API_HOST,
+    insecure=LLM_INSECURE,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    call_timeout=LLM_CALL_TIMEOUT,
+    deadline=LLM_DEADLINE,
+    retries=LLM_RETRIES,
+    backoff_seconds=LLM_RETRY_BACKOFF,
+    breaker=CircuitBreaker(LLM_BREAKER_ERROR_RATE, LLM_BREAKER_MIN_CALLS, LLM_BREAKER_WINDOW, LLM_BREAKER_COOLDOWN),
+    hedge_quantile=LLM_HEDGE_QUANTILE if LLM_HEDGE else 0,
+    hedge_min_delay=LLM_HEDGE_MIN_DELAY,
+)
+# 같은 문장 집합으로 진행 중인 성격 분석 호출은 하나로 합친다
+personality_flight = SingleFlight("llm_singleflight")
+personality_table = load_precomputed(Path(PERSONALITY_TABLE), PROMPT_VERSION, MODEL) if PERSONALITY_TABLE else {}
+
+logger = logging.getLogger(__name__)
+
 
+async def _watch_weights() -> None:
+    while True:
+        await asyncio.sleep(WEIGHTS_WATCH_INTERVAL)
+        try:
+            reloaded = await asyncio.to_thread(yolo_engine.reload_changed)
+        except Exception:
+            logger.exception("가중치 다시 로드 실패")
+            continue
+        for category in reloaded:
+            await asyncio.to_thread(detection_cache.invalidate_category, category)
+            phash_index.invalidate_category(category)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 세 모델을 서버 시작 시 한 번만 로드해 두고 요청 간에 재사용
+    await asyncio.to_thread(yolo_engine.load)
+    watcher = asyncio.create_task(_watch_weights()) if WEIGHTS_WATCH_INTERVAL > 0 else None
+    await job_runner.start()
+    yield
+    await job_runner.stop()
+    if watcher:
+        watcher.cancel()
 
-app = FastAPI(title="HTP 이미지 분석 API", version="1.0.0")
+
+app = FastAPI(title="HTP 이미지 분석 API", version="1.0.0", lifespan=lifespan)
+
+# multipart 본문 오버헤드만큼 여유를 두고 본문 크기/수신 시간을 스트리밍 중에 제한
+MULTIPART_OVERHEAD = 64 * 1024
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_body_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+    idle_timeout=UPLOAD_IDLE_TIMEOUT,
+    body_timeout=UPLOAD_BODY_TIMEOUT,
+    path_limits={
+        # 파일 세 개(각각 MAX_UPLOAD_BYTES 까지)와 파트마다의 오버헤드
+        "/session": (3 * (MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD), SESSION_BODY_TIMEOUT),
+        "/bulk": (BULK_MAX_BYTES, BULK_BODY_TIMEOUT),
+    },
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -54,96 +277,164 @@ app.add_middleware(
 )
 
 
-def _save_upload_file(upload: UploadFile) -> Path:
-    file_ext = Path(upload.filename or "").suffix or ".jpg"
-    saved_path = UPLOAD_DIR / f"{uuid.uuid4().hex}{file_ext}"
-    with saved_path.open("wb") as buffer:
-        shutil.copyfileobj(upload.file, buffer)
+def _save_upload_file(upload: IngestedUpload) -> Path:
+    saved_path = UPLOAD_DIR / f"{uuid.uuid4().hex}{upload.suffix}"
+    if upload.path is not None:
+        shutil.move(str(upload.path), saved_path)
+        upload.path = None
+    else:
+        saved_path.write_bytes(upload.data)
     return saved_path
 
 
-def _build_yolo_command(image_path: Path, category: int, run_name: str) -> list[str]:
-    model_path = YOLO_MODELS.get(category)
-    if not model_path or not model_path.exists():
+async def _run_yolo(source, category: int, imgsz: int = YOLO_IMGSZ) -> list[Detection]:
+    if not yolo_engine.is_loaded(category):
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"YOLO 가중치 파일을 찾을 수 없습니다: category={category}",
         )
 
-    output_dir = YOLO_OUTPUT_DIR / run_name
-    return [
-        YOLO_BINARY,
-        "predict",
-        f"model={model_path}",
-        f"source={image_path}",
-        f"imgsz={YOLO_IMGSZ}",
-        f"conf={YOLO_CONF}",
-        f"device={YOLO_DEVICE}",
-        "save=True",
-        "save_txt=True",
-        "save_conf=True",
-        f"project={YOLO_OUTPUT_DIR}",
-        f"name={run_name}",
-        "exist_ok=False", # 251118 1634 "exist_ok=True"
-        "half=True",
-    ]
-
-
-def _run_yolo(image_path: Path, category: int) -> Path:
-    run_name = f"run_{uuid.uuid4().hex[:8]}"
-    command = _build_yolo_command(image_path, category, run_name)
-
-    result = subprocess.run(
-        command,
-        capture_output=True,
-        text=True,
-        cwd=BASE_DIR,
-        env=os.environ.copy(),
-    )
-
-    if result.returncode != 0:
-        raise HTTPException(
-            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"YOLO 실행 실패: {result.stderr}",
-        )
-
-    labels_dir = YOLO_OUTPUT_DIR / run_name / "labels"
-    label_file = labels_dir / f"{image_path.stem}.txt"
-    if not label_file.exists():
+    try:
+        return await yolo_batcher.submit((category, imgsz), source)
+    except Exception as exc:
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="YOLO labels.txt 를 찾지 못했습니다.",
-        )
-    return label_file
-
-
-def _cleanup_paths(paths: list[Path]) -> None:
-    for path in paths:
-        if not path:
-            continue
-        try:
-            if path.is_dir():
-                shutil.rmtree(path, ignore_errors=True)
-            elif path.exists():
-                path.unlink(missing_ok=True)
-        except Exception:
-            continue
+            detail=f"YOLO 실행 실패: {exc}",
+        ) from exc
 
 
-def _process(image_path: Path, label_path: Path, category: int) -> dict:
+def _build_analysis_text(category: int, detections=None, label_path: Path = None) -> str:
     analysis_text = get_analysis_result(
         user_choice=category,
-        txt_file_path=str(label_path),
-        image_path=str(image_path),
+        txt_file_path=str(label_path) if label_path else None,
+        detections=detections,
     )
 
+    if analysis_text == "":
+        # 규칙에 걸리는 대상이 하나도 검출되지 않음 (서버 오류가 아니라 입력 문제)
+        metrics.inc("upload_rejected", reason="no_detections")
+        raise HTTPException(
+            status_code=422,
+            detail="그림에서 분석할 대상을 찾지 못했습니다. 그림 전체가 잘 보이도록 다시 촬영해 주세요.",
+        )
     if not analysis_text or analysis_text.startswith("오류"):
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"분석 모듈 오류: {analysis_text}",
         )
+    return analysis_text
+
+
+def _combined_analysis_text(texts: dict) -> str:
+    """카테고리별 분석 문장을 그림 이름을 붙여 한 텍스트로 합친다"""
+    return "\n".join(f"[{CATEGORY_NAMES[category]}] {text}" for category, text in sorted(texts.items()))
+
+
+def _personality_cache_key(analysis_text: str) -> str:
+    return make_llm_key(analysis_text, PROMPT_VERSION, select_model(analysis_text), select_temperature(analysis_text))
+
+
+def _request_deadline() -> float:
+    """지금 도착한 요청의 마감 시각 (time.monotonic 기준)"""
+    return time.monotonic() + REQUEST_DEADLINE
+
+
+def _flight_wait(deadline: float = None) -> float:
+    """진행 중인 호출을 기다릴 시간 (요청 마감 시각이 있으면 그때까지만)"""
+    if deadline is None:
+        return LLM_FLIGHT_WAIT
+    return max(0.0, min(LLM_FLIGHT_WAIT, deadline - time.monotonic()))
+
+
+def _keyed_answer(analysis_text: str, model: str) -> bool:
+    """
+    캐시 키를 만든 모델(select_model)이 답했는지.
+    남은 시간이 부족해 빠른 모델로 보냈거나 빠른 모델 헤지가 이긴 결과문은 캐시/색인에 넣거나
+    같은 키로 기다리던 요청에 넘기지 않는다 (그 요청에만 쓴다)
+    """
+    if model == select_model(analysis_text):
+        return True
+    metrics.inc("llm_cache_skipped", model=model)
+    return False
+
+
+def _cached_personality_text(key: str):
+    """사전 생성 표 -> 응답 캐시 순서로 찾는다"""
+    result_text = personality_table.get(key)
+    if result_text is not None:
+        metrics.inc("llm_cache", result="hit", tier="table")
+        return result_text
+    return llm_cache.get(key) if llm_cache.enabled else None
+
+
+def _reusable_personality_text(analysis_text: str, category: int = None, detections=None) -> tuple:
+    """
+    LLM 을 새로 호출하지 않고 쓸 수 있는 결과문 찾기: (캐시 키, 특징 벡터, 결과문 또는 None)
+    사전 생성 표/응답 캐시에 없고 LLM 이 포화 상태면 특징 벡터가 가장 가까운 이전 결과문을 쓴다
+    """
+    key = _personality_cache_key(analysis_text)
+    feature = None
+    if narrative_index.enabled and category is not None and detections is not None:
+        feature = feature_vector(category, detections)
+
+    result_text = _cached_personality_text(key)
+    if result_text is not None:
+        if feature is not None:
+            narrative_index.add(category, feature, result_text)
+    elif feature is not None and llm_gateway.in_flight >= NARRATIVE_NN_SATURATION:
+        found = narrative_index.nearest(category, feature)
+        if found:
+            result_text = found[0][1]
+    return key, feature, result_text
+
+
+def _flight_timeout() -> HTTPException:
+    metrics.inc("llm_singleflight_timeouts")
+    return HTTPException(status_code=504, detail="성격 분석 응답 시간이 초과되었습니다.")
+
+
+def _generate_personality_text(analysis_text: str, key: str, category: int = None, feature=None,
+                               deadline: float = None) -> tuple:
+    """(결과문, 답한 모델)"""
+    started = time.perf_counter()
+    result_text, model = generate_personality_text(analysis_text, llm_gateway, deadline)
+    if not _keyed_answer(analysis_text, model):
+        return result_text, model
+    if llm_cache.enabled:
+        llm_cache.put(key, result_text, time.perf_counter() - started)
+    if feature is not None:
+        narrative_index.add(category, feature, result_text)
+    return result_text, model
+
+
+def _personality_text(analysis_text: str, category: int = None, detections=None, deadline: float = None) -> str:
+    """
+    같은 문장 집합이면 미리 생성했거나 캐시된 LLM 결과문을 쓰고, 없으면 생성해서 캐시/색인에 넣는다.
+    같은 문장 집합으로 이미 진행 중인 호출이 있으면 그 결과를 기다려 함께 쓴다
+    (색인에는 직접 생성했거나 표/캐시에서 찾은 결과문만 넣고, 최근접/빌려 온 결과문은 넣지 않는다)
+    deadline: 요청 마감 시각 (time.monotonic 기준, 없으면 LLM_DEADLINE 만 적용)
+    """
+    key, feature, result_text = _reusable_personality_text(analysis_text, category, detections)
+    if result_text is not None:
+        return result_text
+    keyed_model = select_model(analysis_text)
+    try:
+        result_text, _ = personality_flight.do(
+            key, lambda: _generate_personality_text(analysis_text, key, category, feature, deadline),
+            _flight_wait(deadline), shareable=lambda result: result[1] == keyed_model,
+        )
+    except TimeoutError:
+        raise _flight_timeout()
+    return result_text
 
-    personality = analyze_personality(analysis_text)
+
+def analyze_personality(analysis_text: str, category: int = None, detections=None, deadline: float = None) -> dict:
+    """category/detections 를 주면 LLM 포화 시 특징 벡터가 가까운 이전 결과를 쓸 수 있다"""
+    return parse_personality_result(_personality_text(analysis_text, category, detections, deadline))
+
+
+def _process(category: int, analysis_text: str, detections=None, deadline: float = None) -> dict:
+    personality = analyze_personality(analysis_text, category, detections, deadline)
     return {
         "category": category,
         "analysis_text": analysis_text,
@@ -151,12 +442,113 @@ def _process(image_path: Path, label_path: Path, category: int) -> dict:
     }
 
 
-@app.post("/")
-async def analyze_image(
-    background_tasks: BackgroundTasks,
-    image: UploadFile = File(...),
-    category: str = Form(...),
-):
+async def _detect(image: Image.Image, category: int) -> list[Detection]:
+    plan = None
+    if INK_CROP_ENABLED:
+        plan = await asyncio.to_thread(plan_ink_crop, image, YOLO_IMGSZ, INK_CROP_BUCKETS, INK_CROP_MARGIN)
+    if plan is None:
+        return await _cascade_yolo(image, category, YOLO_IMGSZ)
+    return plan.remap(await _cascade_yolo(plan.image, category, plan.imgsz))
+
+
+async def _cascade_yolo(image: Image.Image, category: int, imgsz: int) -> list[Detection]:
+    if not CASCADE_ENABLED or CASCADE_FIRST_IMGSZ >= imgsz:
+        return await _run_yolo(image, category, imgsz)
+
+    started = time.perf_counter()
+    detections = await _run_yolo(image, category, CASCADE_FIRST_IMGSZ)
+    metrics.observe("cascade_pass_seconds", time.perf_counter() - started, stage="first")
+    reason = escalation_reason(detections, category, CASCADE_MARGIN, relevant_classes(category))
+    if reason is None:
+        metrics.inc("cascade", result="settled", category=category)
+        return detections
+
+    metrics.inc("cascade", result="escalated", reason=reason, category=category)
+    started = time.perf_counter()
+    detections = await _run_yolo(image, category, imgsz)
+    metrics.observe("cascade_pass_seconds", time.perf_counter() - started, stage="full")
+    return detections
+
+
+async def _analysis_with_files(upload: IngestedUpload, category: int) -> tuple:
+    # 디버깅용 파일 경로: 업로드/라벨 파일을 남겨 두고 라벨 파일을 다시 읽어 분석
+    saved_image = await asyncio.to_thread(_save_upload_file, upload)
+    decoded = await asyncio.to_thread(decode_image, saved_image, YOLO_IMGSZ)
+    if DRAWING_FILTER_ENABLED:
+        await asyncio.to_thread(check_drawing, decoded, drawing_thresholds)
+    detections = await _detect(decoded, category)
+    label_path = YOLO_OUTPUT_DIR / f"run_{uuid.uuid4().hex[:8]}" / "labels" / f"{saved_image.stem}.txt"
+    await asyncio.to_thread(write_label_file, detections, label_path)
+    return detections, await asyncio.to_thread(_build_analysis_text, category, None, label_path)
+
+
+async def _analysis_from_upload(upload: IngestedUpload, category: int) -> tuple:
+    model_version = yolo_engine.model_version(category)
+
+    # 1. 같은 바이트 + 같은 모델/설정이면 캐시된 검출 결과를 쓰고 디코딩/추론을 건너뛴다
+    cache_key = None
+    if detection_cache.enabled and yolo_engine.is_loaded(category):
+        prep = f"crop{INK_CROP_MARGIN}:{INK_CROP_BUCKETS}" if INK_CROP_ENABLED else ""
+        if CASCADE_ENABLED:
+            prep += f"|cascade{CASCADE_FIRST_IMGSZ}:{CASCADE_MARGIN}"
+        cache_key = make_key(upload.sha256, category, model_version, YOLO_CONF, YOLO_IMGSZ, prep)
+        cached = await asyncio.to_thread(detection_cache.get, cache_key, category)
+        if cached is not None:
+            return cached, await asyncio.to_thread(_build_analysis_text, category, cached)
+
+    # 검출기 입력 크기 근처로 한 번만 디코딩하고 dHash / 검출기가 같은 이미지를 쓴다
+    decoded = await asyncio.to_thread(decode_image, upload.source, YOLO_IMGSZ)
+    # 빈 종이/사진/스크린샷은 모델이나 LLM 을 쓰기 전에 422 로 거절
+    if DRAWING_FILTER_ENABLED:
+        await asyncio.to_thread(check_drawing, decoded, drawing_thresholds)
+
+    # 2. 재인코딩만 다른 같은 그림이면 이전 검출 결과와 분석 문장을 재사용
+    #    (근접 결과는 이 바이트 해시의 검출 결과가 아니므로 검출 결과 캐시에는 넣지 않는다)
+    image_hash = None
+    if phash_index.enabled:
+        image_hash, image_thumb = await asyncio.to_thread(fingerprint, decoded)
+        near = phash_index.lookup(category, image_hash, image_thumb, model_version)
+        if near is not None:
+            return near["detections"], near["analysis_text"]
+
+    # 3. 추론 (그림 영역만 잘라 더 작은 입력 크기로 검출하고 원본 좌표로 되돌림)
+    detections = await _detect(decoded, category)
+    if cache_key:
+        await asyncio.to_thread(detection_cache.put, cache_key, category, detections)
+    analysis_text = await asyncio.to_thread(_build_analysis_text, category, detections)
+    if image_hash is not None:
+        phash_index.add(
+            category, image_hash, image_thumb,
+            {"detections": detections, "analysis_text": analysis_text},
+            model_version,
+        )
+    return detections, analysis_text
+
+
+async def _analyze_upload(upload: IngestedUpload, category: int) -> tuple:
+    """(검출 결과, 규칙 분석 문장)"""
+    if DETECTION_DEBUG_FILES:
+        return await _analysis_with_files(upload, category)
+    return await _analysis_from_upload(upload, category)
+
+
+async def _analysis_text(upload: IngestedUpload, category: int) -> str:
+    _, analysis_text = await _analyze_upload(upload, category)
+    return analysis_text
+
+
+async def _ingest(image: UploadFile) -> IngestedUpload:
+    # 청크 단위로 받으며 크기/해상도 제한 확인 (파일 I/O 는 스레드에서)
+    upload = await ingest_upload(image, MAX_UPLOAD_BYTES, UPLOAD_MEMORY_LIMIT, UPLOAD_DIR)
+    try:
+        await asyncio.to_thread(read_image_info, upload.source, MAX_IMAGE_SIDE, MAX_IMAGE_PIXELS)
+    except BaseException:
+        await asyncio.to_thread(upload.cleanup)
+        raise
+    return upload
+
+
+def _parse_category(category: str) -> int:
     # 1. 먼저 숫자로 변환 시도
     try:
         category_int = int(category)
@@ -172,12 +564,24 @@ async def analyze_image(
             status_code=400,
             detail="category 값은 0(집), 1(나무), 2(사람) 중 하나여야 합니다."
         )
+    return category_int
+
 
-    saved_image = _save_upload_file(image)
+@app.post("/")
+async def analyze_image(
+    image: UploadFile = File(...),
+    category: str = Form(...),
+):
+    deadline = _request_deadline()
+    # 1. category 확인
+    category_int = _parse_category(category)
+
+    # 2. 업로드 수집 후 분석
+    upload = await _ingest(image)
 
     try:
-        label_path = await asyncio.to_thread(_run_yolo, saved_image, category_int)
-        result = await asyncio.to_thread(_process, saved_image, label_path, category_int)
+        detections, analysis_text = await _analyze_upload(upload, category_int)
+        result = await asyncio.to_thread(_process, category_int, analysis_text, detections, deadline)
     except HTTPException:
         raise
     except Exception as exc:
@@ -186,16 +590,373 @@ async def analyze_image(
             detail=f"분석 중 오류 발생: {str(exc)}",
         ) from exc
     finally:
-        # label_path가 정의됐는지 안전하게 확인
-        cleanup_paths = [saved_image]
-        if 'label_path' in locals() and label_path and hasattr(label_path, 'parent'):
-            cleanup_paths.append(label_path.parent.parent)
-        background_tasks.add_task(_cleanup_paths, cleanup_paths)
+        await asyncio.to_thread(upload.cleanup)
 
     return JSONResponse(result)
 
 
+def _sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _detection_payload(category: int, detections) -> list:
+    names = CLASS_NAMES[category]
+    return [
+        {
+            "class_id": det.cls_id,
+            "name": names[det.cls_id] if det.cls_id < len(names) else str(det.cls_id),
+            "box": [round(det.cx, 4), round(det.cy, 4), round(det.w, 4), round(det.h, 4)],
+            "conf": round(det.conf, 4),
+        }
+        for det in detections
+    ]
+
+
+async def _stream_personality_text(analysis_text: str, cache_key: str, call, started: float,
+                                   deadline: float = None, category: int = None, feature=None):
+    """
+    성격 분석 결과문을 조각 단위로 내보내고, 끝나면 캐시/색인에 넣고 기다리던 요청에 전체 결과문을 넘긴다.
+    중간에 실패하거나 연결이 끊기면 기다리던 요청에도 오류를 넘긴다.
+    캐시 키와 다른 모델이 답했으면 캐시/색인에 넣지 않고, 기다리던 요청은 다시 합류하게 한다
+    """
+    chunks = []
+    model = None
+    try:
+        # 동기 xai 스트림을 스레드에서 한 조각씩 읽는다 (연결이 끊기면 더 읽지 않음)
+        async for model, chunk in iterate_in_threadpool(stream_personality(analysis_text, llm_gateway, deadline)):
+            if not chunks:
+                metrics.observe("llm_first_token_seconds", time.perf_counter() - started)
+            chunks.append(chunk)
+            yield chunk
+    except BaseException as exc:
+        if not isinstance(exc, Exception):
+            # 연결 끊김(취소)은 기다리던 요청에 일반 오류로 넘긴다
+            exc = RuntimeError("먼저 시작한 스트리밍 요청이 중단되었습니다.")
+        personality_flight.finish(cache_key, call, error=exc)
+        raise
+    result_text = "".join(chunks)
+    if not _keyed_answer(analysis_text, model):
+        personality_flight.finish(cache_key, call, error=NotShared())
+        return
+    if llm_cache.enabled:
+        await asyncio.to_thread(llm_cache.put, cache_key, result_text, time.perf_counter() - started)
+    if feature is not None:
+        narrative_index.add(category, feature, result_text)
+    personality_flight.finish(cache_key, call, result=result_text)
+
+
+async def _stream_events(category: int, detections, analysis_text: str, deadline: float = None):
+    """검출/규칙 문장 -> 성격 분석 결과문 조각 -> 최종 JSON 결과 순서로 SSE 이벤트를 낸다"""
+    yield _sse_event("analysis", {
+        "category": category,
+        "detections": _detection_payload(category, detections),
+        "analysis_text": analysis_text,
+    })
+
+    started = time.perf_counter()
+    chunks = []
+    try:
+        cache_key, feature, cached = await asyncio.to_thread(
+            _reusable_personality_text, analysis_text, category, detections,
+        )
+        call, leader = (None, False) if cached is not None else personality_flight.join(cache_key)
+        while cached is None and not leader:
+            # 같은 문장 집합으로 진행 중인 호출(스트리밍 포함)이 끝나면 그 결과를 받는다
+            try:
+                cached = await asyncio.to_thread(call.wait, _flight_wait(deadline))
+            except TimeoutError:
+                raise _flight_timeout()
+            except NotShared:
+                # 다른 모델이 답한 결과문은 받지 않고 다시 합류한다
+                call, leader = personality_flight.join(cache_key)
+        if cached is not None:
+            # 캐시/색인/진행 중인 호출에서 받은 결과문은 한 조각으로 보낸다
+            chunks.append(cached)
+            yield _sse_event("token", {"text": cached})
+        else:
+            tokens = _stream_personality_text(analysis_text, cache_key, call, started, deadline, category, feature)
+            try:
+                async for chunk in tokens:
+                    chunks.append(chunk)
+                    yield _sse_event("token", {"text": chunk})
+            finally:
+                # 연결이 끊겨 여기서 멈춰도 기다리던 요청이 바로 오류를 받도록 닫는다
+                await tokens.aclose()
+        # 색인에는 _reusable_personality_text(표/캐시)와 _stream_personality_text(직접 생성)만 넣는다
+        personality = parse_personality_result("".join(chunks))
+    except HTTPException as exc:
+        metrics.inc("stream_results", result="error")
+        yield _sse_event("error", {"status": exc.status_code, "detail": exc.detail})
+        return
+    except Exception as exc:
+        metrics.inc("stream_results", result="error")
+        yield _sse_event("error", {"status": 500, "detail": f"분석 중 오류 발생: {exc}"})
+        return
+    metrics.observe("llm_stream_seconds", time.perf_counter() - started)
+    metrics.inc("stream_results", result="ok")
+    yield _sse_event("result", {
+        "category": category,
+        "analysis_text": analysis_text,
+        "personality": personality,
+    })
+
+
+@app.post("/stream")
+async def analyze_image_stream(
+    image: UploadFile = File(...),
+    category: str = Form(...),
+):
+    """
+    POST / 와 같은 분석을 SSE(text/event-stream)로 단계별로 보낸다.
+    검출이 끝나면 바로 규칙 분석 문장을 보내고, 성격 분석 결과문은 생성되는 대로 조각 단위로 보낸다.
+    업로드/검출 단계의 오류는 POST / 와 같은 HTTP 오류로, 성격 분석 중 오류는 error 이벤트로 보낸다.
+    """
+    deadline = _request_deadline()
+    category_int = _parse_category(category)
+    upload = await _ingest(image)
+    try:
+        detections, analysis_text = await _analyze_upload(upload, category_int)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(
+            status_code=500,
+            detail=f"분석 중 오류 발생: {str(exc)}",
+        ) from exc
+    finally:
+        await asyncio.to_thread(upload.cleanup)
+
+    return StreamingResponse(
+        _stream_events(category_int, detections, analysis_text, deadline),
+        media_type="text/event-stream",
+        # 프록시(nginx 등)가 이벤트를 모아 두지 않도록
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/session")
+async def analyze_session(
+    house: UploadFile = File(...),
+    tree: UploadFile = File(...),
+    person: UploadFile = File(...),
+):
+    """집/나무/사람 그림을 한 번에 받아 세 검출을 동시에 실행하고 성격 분석은 합친 문장으로 한 번만 호출"""
+    deadline = _request_deadline()
+    uploads = {}
+    try:
+        for category, image in ((0, house), (1, tree), (2, person)):
+            uploads[category] = await _ingest(image)
+
+        results = await asyncio.gather(
+            *(_analysis_text(upload, category) for category, upload in uploads.items()),
+            return_exceptions=True,
+        )
+        for category, result in zip(uploads, results):
+            if isinstance(result, HTTPException):
+                raise HTTPException(
+                    status_code=result.status_code,
+                    detail=f"{CATEGORY_NAMES[category]} 그림: {result.detail}",
+                ) from result
+            if isinstance(result, BaseException):
+                raise result
+
+        texts = dict(zip(uploads, results))
+        combined_text = _combined_analysis_text(texts)
+        personality = await asyncio.to_thread(analyze_personality, combined_text, None, None, deadline)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(
+            status_code=500,
+            detail=f"분석 중 오류 발생: {str(exc)}",
+        ) from exc
+    finally:
+        for upload in uploads.values():
+            await asyncio.to_thread(upload.cleanup)
+
+    return JSONResponse({
+        "drawings": [
+            {"category": category, "analysis_text": text}
+            for category, text in texts.items()
+        ],
+        "analysis_text": combined_text,
+        "personality": personality,
+    })
+
+
+async def _bulk_line(item: BulkItem, with_personality: bool) -> dict:
+    line = {"index": item.index, "filename": item.filename, "category": item.category}
+    try:
+        if item.error is not None:
+            raise item.error
+        if item.category not in (0, 1, 2):
+            raise HTTPException(
+                status_code=400,
+                detail="category 를 알 수 없습니다. 필드/폴더 이름(house, tree, person) 또는 category 쿼리를 지정하세요.",
+            )
+        if not item.data:
+            raise HTTPException(status_code=400, detail="빈 파일입니다.")
+
+        sha256 = await asyncio.to_thread(lambda: hashlib.sha256(item.data).hexdigest())
+        upload = IngestedUpload(sha256, len(item.data), Path(item.filename).suffix or ".jpg", data=item.data)
+        item.data = b""
+        try:
+            await asyncio.to_thread(read_image_info, upload.source, MAX_IMAGE_SIDE, MAX_IMAGE_PIXELS)
+            detections, line["analysis_text"] = await _analyze_upload(upload, item.category)
+        finally:
+            await asyncio.to_thread(upload.cleanup)
+        if with_personality:
+            line["personality"] = await asyncio.to_thread(
+                analyze_personality, line["analysis_text"], item.category, detections,
+            )
+    except HTTPException as exc:
+        line["error"] = {"status": exc.status_code, "detail": exc.detail}
+    except Exception as exc:
+        line["error"] = {"status": 500, "detail": f"분석 중 오류 발생: {exc}"}
+    metrics.inc("bulk_items", result="error" if "error" in line else "ok")
+    return line
+
+
+async def _bulk_results(items, with_personality: bool):
+    """
+    items 에서 그림을 꺼내 최대 BULK_MAX_IN_FLIGHT 개까지 동시에 분석하고, 끝나는 순서대로 NDJSON 한 줄씩 낸다.
+    분석 중인 그림이 상한에 닿으면 items 를 더 읽지 않으므로 요청 본문 수신도 멈춘다.
+    """
+    slots = asyncio.Semaphore(BULK_MAX_IN_FLIGHT)
+    lines = asyncio.Queue()
+    tasks = set()
+    summary = {"done": True, "total": 0, "failed": 0}
+
+    async def run(item: BulkItem):
+        try:
+            line = await _bulk_line(item, with_personality)
+        finally:
+            slots.release()
+        summary["total"] += 1
+        summary["failed"] += "error" in line
+        await lines.put(line)
+
+    async def produce():
+        try:
+            async for item in items:
+                await slots.acquire()
+                task = asyncio.create_task(run(item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except HTTPException as exc:
+            summary["error"] = {"status": exc.status_code, "detail": exc.detail}
+        except Exception as exc:
+            summary["error"] = {"status": 400, "detail": f"요청 본문을 읽는 중 오류 발생: {exc}"}
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await lines.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (line := await lines.get()) is not None:
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+    finally:
+        producer.cancel()
+        for task in list(tasks):
+            task.cancel()
+
+
+@app.post("/bulk")
+async def analyze_bulk(request: Request, category: int = None, personality: bool = False):
+    """
+    여러 그림을 multipart(파일 여러 개) 또는 zip 으로 받아 끝나는 순서대로 NDJSON 으로 결과를 보낸다.
+    personality=true 일 때만 그림마다 성격 분석을 호출한다. (기본: 검출 + 규칙 분석만)
+    """
+    if category is not None and category not in (0, 1, 2):
+        raise HTTPException(
+            status_code=400,
+            detail="category 값은 0(집), 1(나무), 2(사람) 중 하나여야 합니다."
+        )
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "multipart/form-data":
+        if "boundary=" not in request.headers.get("content-type", ""):
+            raise HTTPException(status_code=400, detail="multipart boundary 가 없습니다.")
+        items = iter_multipart_items(request, MAX_UPLOAD_BYTES, BULK_MAX_ITEMS, category)
+    elif content_type in ZIP_CONTENT_TYPES:
+        items = iter_zip_items(request, UPLOAD_DIR, MAX_UPLOAD_BYTES, BULK_MAX_ITEMS, category)
+    else:
+        raise HTTPException(status_code=415, detail="multipart/form-data 또는 application/zip 만 지원합니다.")
+
+    return NdjsonResponse(_bulk_results(items, personality))
+
+
+async def _run_job(job: dict) -> dict:
+    image_path = Path(job["image_path"])
+    size = await asyncio.to_thread(lambda: image_path.stat().st_size)
+    upload = IngestedUpload(job["sha256"], size, image_path.suffix, path=image_path)
+    detections, analysis_text = await _analyze_upload(upload, job["category"])
+    return await asyncio.to_thread(_process, job["category"], analysis_text, detections)
+
+
+job_runner = JobRunner(
+    JobStore(Path(JOB_DB_PATH)), _run_job, JOB_WORKERS, retention_seconds=JOB_RETENTION_HOURS * 3600,
+)
+
+
+def _job_response(job: dict) -> dict:
+    response = {key: job[key] for key in ("job_id", "status", "category", "created_at", "updated_at")}
+    if job["result"] is not None:
+        response["result"] = job["result"]
+    if job["error"] is not None:
+        response["error"] = job["error"]
+    return response
+
+
+def _persist_job_image(job_id: str, upload: IngestedUpload) -> Path:
+    # 재시작 후에도 다시 실행할 수 있도록 작업 입력을 JOB_DIR 에 보관 (작업이 끝나면 삭제)
+    image_path = JOB_DIR / f"{job_id}{upload.suffix}"
+    if upload.path is not None:
+        shutil.move(str(upload.path), image_path)
+        upload.path = None
+    else:
+        image_path.write_bytes(upload.data)
+    return image_path
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    image: UploadFile = File(...),
+    category: str = Form(...),
+):
+    """분석 작업을 등록하고 바로 job id 를 반환. 결과는 GET /jobs/{job_id} 로 조회"""
+    category_int = _parse_category(category)
+
+    upload = await _ingest(image)
+    job_id = uuid.uuid4().hex
+    try:
+        image_path = await asyncio.to_thread(_persist_job_image, job_id, upload)
+    finally:
+        await asyncio.to_thread(upload.cleanup)
+    await asyncio.to_thread(job_runner.store.create, job_id, category_int, image_path, upload.sha256)
+    job_runner.submit(job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """작업 상태/결과 조회. wait(초)를 주면 끝날 때까지 최대 그만큼 기다린 뒤 응답 (long-poll)"""
+    if wait > 0:
+        await job_runner.wait(job_id, min(wait, JOB_MAX_WAIT))
+    job = await asyncio.to_thread(job_runner.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return _job_response(job)
+
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
@@ -0,0 +1,86 @@
+"""
+인메모리 메트릭 레지스트리
+
+카운터(inc)와 분포(observe)를 이름 + 라벨 단위로 모아 두고 `GET /metrics` 에서 JSON 으로 노출한다.
+분포는 최근 값 일부만 보관해 p50/p95 를 계산한다.
+"""
+import threading
+from collections import deque
+
+RECENT_SAMPLES = 1024
+
+
+def _series_key(name: str, labels: dict) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+def _quantile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _Summary:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self.recent)
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": round(_quantile(recent, 0.50), 6),
+            "p95": round(_quantile(recent, 0.95), 6),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _series_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _series_key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = _Summary()
+            summary.observe(value)
+
+    def quantile(self, name: str, q: float, **labels) -> float:
+        key = _series_key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            recent = sorted(summary.recent) if summary else []
+        return _quantile(recent, q)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "summaries": {key: s.snapshot() for key, s in self._summaries.items()},
+            }
+
+
+metrics = Metrics()
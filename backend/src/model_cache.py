@@ -0,0 +1,143 @@
+"""
+사전 컴파일된 모델 아티팩트 디스크 캐시
+
+검출기 로더가 만드는 최적화 아티팩트(TorchScript, ONNX, ONNX Runtime 최적화 그래프)를
+가중치 파일 해시 + 종류 + 디바이스 + imgsz 등으로 키를 만들어 MODEL_CACHE_DIR 에 저장한다.
+재시작하거나 새로 뜬 레플리카는 이미 만들어진 아티팩트를 바로 로드한다.
+가중치가 바뀌면 해시가 달라지므로 자동으로 새 아티팩트가 만들어진다.
+
+서버는 MODEL_CACHE_DIR 을 지정했을 때만 이 캐시를 쓴다 (torch 백엔드는 .pt 대신 imgsz 별 TorchScript 를 로드하므로
+check_backend_parity.py --compare torchscript 로 마이크로 배치 크기에서 결과가 같은지 확인한 뒤 켠다).
+
+이미지 빌드 단계에서 미리 채워 두려면 (서버와 같은 INK_CROP_*/CASCADE_* 설정으로 모든 imgsz 버킷을 만든다):
+    MODEL_CACHE_DIR=... python model_cache.py warm-cache --backend torch
+    MODEL_CACHE_DIR=... python model_cache.py warm-cache --backend onnx
+"""
+import argparse
+import fcntl
+import hashlib
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / "htp" / "weights" / "cache"
+
+_hash_lock = threading.Lock()
+_hash_memo = {}
+
+
+def file_sha256(path: Path) -> str:
+    """파일 SHA-256 (경로 + 크기 + 수정 시각이 같으면 다시 읽지 않는다)"""
+    stat = path.stat()
+    memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        cached = _hash_memo.get(memo_key)
+    if cached:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _hash_lock:
+        _hash_memo[memo_key] = value
+    return value
+
+
+class ArtifactCache:
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+
+    def artifact_path(self, weights_path: Path, kind: str, suffix: str, **params) -> Path:
+        digest = file_sha256(weights_path)[:16]
+        parts = [weights_path.stem, digest, kind]
+        parts += [f"{key}{str(value).replace(os.sep, '_').replace(':', '')}" for key, value in sorted(params.items())]
+        return self.cache_dir / ("-".join(parts) + suffix)
+
+    def get_or_build(self, path: Path, build) -> Path:
+        """
+        path 가 있으면 그대로 반환하고, 없으면 build(임시 경로) 로 만든 뒤 원자적으로 옮긴다.
+        여러 프로세스가 동시에 같은 아티팩트를 만들지 않도록 파일 락을 잡는다.
+        """
+        if path.exists():
+            metrics.inc("model_artifact_cache", result="hit")
+            return path
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        lock_path = path.with_name(path.name + ".lock")
+        with open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if path.exists():
+                    metrics.inc("model_artifact_cache", result="hit")
+                    return path
+                metrics.inc("model_artifact_cache", result="miss")
+                logger.info("모델 아티팩트 생성: %s", path.name)
+                tmp_path = path.with_name(f"{path.stem}.tmp{os.getpid()}{path.suffix}")
+                try:
+                    build(tmp_path)
+                    os.replace(tmp_path, path)
+                finally:
+                    tmp_path.unlink(missing_ok=True)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return path
+
+
+def server_extra_imgsz() -> list:
+    """서버(main.py)가 기본 imgsz 외에 쓰는 입력 크기: 크롭 버킷, 캐스케이드 첫 패스 크기"""
+    sizes = []
+    if os.getenv("INK_CROP_ENABLED", "0") == "1":
+        sizes += [int(v) for v in os.getenv("INK_CROP_BUCKETS", "320,416,512").split(",") if v.strip()]
+    if os.getenv("CASCADE_ENABLED", "0") == "1":
+        sizes.append(int(os.getenv("CASCADE_FIRST_IMGSZ", "320")))
+    return sizes
+
+
+def warm_cache(backend, model_paths: dict, extra_imgsz=()) -> None:
+    # 서버와 같은 YoloEngine 로 로드해 크기별 워밍업까지 실행하므로 모든 imgsz 버킷의 아티팩트가 만들어진다
+    from yolo_engine import YoloEngine
+
+    engine = YoloEngine(model_paths, backend, extra_imgsz=extra_imgsz)
+    engine.load()
+    for category, weights_path in model_paths.items():
+        if engine.is_loaded(category):
+            print(f"[완료] category={category} backend={backend.name} imgsz={engine.imgsz_sizes}")
+        else:
+            print(f"[건너뜀] 가중치 없음: category={category} path={weights_path}")
+
+
+def main():
+    from detector_backends import DEFAULT_WEIGHTS, create_backend
+
+    parser = argparse.ArgumentParser(description="모델 아티팩트 캐시 도구")
+    sub = parser.add_subparsers(dest="command", required=True)
+    warm = sub.add_parser("warm-cache", help="세 모델의 아티팩트를 미리 만들어 캐시에 채운다")
+    warm.add_argument("--backend", default=os.getenv("YOLO_BACKEND", "torch"))
+    warm.add_argument("--precision", default=os.getenv("YOLO_PRECISION", "fp32"))
+    warm.add_argument("--device", default=os.getenv("YOLO_DEVICE", "0"))
+    warm.add_argument("--imgsz", type=int, default=int(os.getenv("YOLO_IMGSZ", "640")))
+    warm.add_argument("--conf", type=float, default=float(os.getenv("YOLO_CONF", "0.70")))
+    warm.add_argument("--extra-imgsz", type=int, nargs="*", default=server_extra_imgsz(),
+                      help="기본 imgsz 외에 만들 입력 크기 (기본: INK_CROP_*/CASCADE_* 환경 변수에서 계산)")
+    warm.add_argument("--cache-dir", type=Path, default=Path(os.getenv("MODEL_CACHE_DIR") or DEFAULT_CACHE_DIR))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    backend = create_backend(
+        args.backend, args.conf, args.imgsz, args.device,
+        precision=args.precision, cache=ArtifactCache(args.cache_dir),
+    )
+    warm_cache(backend, DEFAULT_WEIGHTS, args.extra_imgsz)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+검출 특징 벡터 기반 최근접 성격 분석 결과 색인
+
+많은 그림은 꽃 하나가 더 있는 것처럼 영향이 작은 특징 하나만 다르다.
+그림마다 analysis_module.collect_features 의 특징을 비트 벡터 하나(uint64)로 만든다.
+  - 기준 객체 크기/위치 구간, 창문 크기 구간/3개 이상, 눈 개수(한쪽/양쪽) 등 구간 비트
+  - 규칙 문장에 영향이 있는 클래스(rule_deps.relevant_classes)의 유무 비트
+카테고리는 색인을 나눠 구분한다.
+
+LLM 이 포화 상태일 때(진행 중인 호출이 많을 때) 해밍 거리가 max_distance 이하인 이전 결과문이 있으면
+새로 호출하지 않고 그 결과문을 쓴다. 벡터는 카테고리별 numpy uint64 배열에 두고
+XOR + popcount(np.bitwise_count) 로 전체를 한 번에 비교하므로 수백만 개도 수 ms 안에 찾는다.
+같은 벡터는 한 칸만 쓰고(최신 결과로 교체), 카테고리별 항목 수는 capacity 로 제한해 가장 오래된 칸부터 덮어쓴다.
+"""
+import threading
+
+import numpy as np
+
+from analysis_module import collect_features
+from metrics import metrics
+from rule_deps import CLASS_NAMES, relevant_classes
+
+INITIAL_SLOTS = 1024
+
+
+def feature_vector(category: int, detections) -> int:
+    """규칙 판단에 쓰는 특징을 비트로 묶은 값 (64비트 이하)"""
+    analysis_results, house_counts, tree_counts, person_counts = collect_features(category, detections)
+    if category == 0:
+        house = analysis_results["house"]
+        window_sizes = {window["size"] for window in analysis_results["windows"]}
+        bits = [house["size"] == size for size in ("크다", "보통", "작다")]
+        bits += [house["location"] == location for location in ("중앙", "비중앙")]
+        bits += [size in window_sizes for size in ("크다", "보통", "작다")]
+        bits.append(house_counts["창문"] >= 3)
+        counts = house_counts
+    elif category == 1:
+        tree_sizes = {tree["size"] for tree in analysis_results["trees"]}
+        bits = [size in tree_sizes for size in ("보통", "작다")]
+        counts = tree_counts
+    else:
+        person_sizes = {person["size"] for person in analysis_results["persons"]}
+        eyes = person_counts["눈"]
+        bits = [size in person_sizes for size in ("크다", "보통", "작다")]
+        bits += [eyes % 2 == 1, eyes > 0 and eyes % 2 == 0]
+        counts = person_counts
+
+    names = CLASS_NAMES[category]
+    bits += [counts[names[cls_id]] > 0 for cls_id in sorted(relevant_classes(category))]
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bool(bit)
+    return value
+
+
+class _CategoryVectors:
+    def __init__(self):
+        self.vectors = np.zeros(INITIAL_SLOTS, dtype=np.uint64)
+        self.payloads = []
+        self.slot_by_vector = {}
+        self.next_slot = 0  # 가득 찬 뒤 덮어쓸 칸 (가장 오래된 칸)
+
+
+class NarrativeIndex:
+    def __init__(self, capacity: int, max_distance: int):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._categories = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _index(self, category: int) -> _CategoryVectors:
+        index = self._categories.get(category)
+        if index is None:
+            index = self._categories[category] = _CategoryVectors()
+        return index
+
+    def add(self, category: int, vector: int, payload) -> None:
+        with self._lock:
+            index = self._index(category)
+            slot = index.slot_by_vector.get(vector)
+            if slot is not None:
+                index.payloads[slot] = payload
+                return
+
+            size = len(index.payloads)
+            if size < self.capacity:
+                if size == len(index.vectors):
+                    grown = np.zeros(min(self.capacity, size * 2), dtype=np.uint64)
+                    grown[:size] = index.vectors
+                    index.vectors = grown
+                slot = size
+                index.payloads.append(payload)
+            else:
+                slot = index.next_slot
+                index.next_slot = (slot + 1) % self.capacity
+                del index.slot_by_vector[int(index.vectors[slot])]
+                index.payloads[slot] = payload
+            index.vectors[slot] = vector
+            index.slot_by_vector[vector] = slot
+
+    def nearest(self, category: int, vector: int, k: int = 1) -> list:
+        """해밍 거리가 max_distance 이하인 항목을 가까운 순으로 최대 k개 [(거리, payload), ...]"""
+        with self._lock:
+            index = self._index(category)
+            size = len(index.payloads)
+            if size == 0:
+                distances = np.empty(0, dtype=np.uint8)
+            else:
+                distances = np.bitwise_count(index.vectors[:size] ^ np.uint64(vector))
+            candidates = np.flatnonzero(distances <= self.max_distance)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(distances[candidates], k)[:k]]
+            candidates = candidates[np.argsort(distances[candidates], kind="stable")]
+            found = [(int(distances[slot]), index.payloads[slot]) for slot in candidates]
+
+        if not found:
+            metrics.inc("narrative_nn", result="miss", category=category)
+            return []
+        metrics.inc("narrative_nn", result="hit", category=category)
+        metrics.observe("narrative_nn_distance", found[0][0], category=category)
+        return found
+
+    def invalidate_category(self, category: int) -> None:
+        with self._lock:
+            self._categories.pop(category, None)
@@ -0,0 +1,141 @@
+"""
+지각 해시(dHash) 기반 근접 중복 업로드 색인
+
+모바일 클라이언트가 같은 그림을 JPEG 품질/크롭만 조금 다르게 다시 올리면 바이트 해시는 달라진다.
+축소한 흑백 이미지의 dHash(64비트)를 카테고리별로 보관하고, 해밍 거리가 max_distance 이하인
+이전 업로드를 후보로 찾는다.
+
+dHash 는 창문/문/굴뚝 하나가 더 그려진 그림도 거리 1~4 로 보므로 후보를 그대로 쓰지 않는다.
+함께 보관한 128x128 흑백 축소 이미지와 픽셀 단위로 비교해 모든 픽셀 차이가 PIXEL_TOLERANCE 이하일 때만
+(재인코딩/해상도 변경 수준) 그 검출 결과와 분석 문장을 재사용한다. 선이 하나라도 더해진 그림은 거절되고,
+원본 좌표가 달라지는 크롭도 다시 검출한다.
+
+조회는 multi-index hashing 으로 한다. 64비트를 (max_distance + 1) 개 구간으로 나누면
+거리가 max_distance 이하인 두 해시는 적어도 한 구간이 완전히 같으므로(비둘기집 원리),
+구간 값별 버킷만 확인하면 되고 항목 수가 수십만 개여도 전체를 훑지 않는다.
+카테고리별 항목 수는 capacity 로 제한하고 가장 오래된 항목부터 내보낸다.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from metrics import metrics
+
+HASH_BITS = 64
+# 확인용 축소 이미지 한 변 크기와 허용하는 픽셀별 최대 밝기 차이 (JPEG 재인코딩/축소는 한 자리 수, 더해진 선은 100 안팎)
+THUMBNAIL_SIZE = 128
+PIXEL_TOLERANCE = 40
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """(hash_size + 1) x hash_size 흑백 축소 이미지에서 가로로 이웃한 픽셀 밝기 비교로 만든 해시"""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    # 행 우선 순서의 비트열 (첫 비트가 최상위 비트). packbits 가 끝에 채운 0 비트는 밀어낸다
+    bits = (pixels[:, :-1] > pixels[:, 1:]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big") >> (-bits.size % 8)
+
+
+def thumbnail(image: Image.Image, size: int = THUMBNAIL_SIZE) -> np.ndarray:
+    """근접 후보 확인에 쓰는 size x size 흑백 축소 이미지"""
+    return np.asarray(image.convert("L").resize((size, size), Image.BILINEAR), dtype=np.uint8)
+
+
+def fingerprint(image: Image.Image) -> tuple:
+    """(dHash, 확인용 축소 이미지)"""
+    return dhash(image), thumbnail(image)
+
+
+def same_drawing(a: np.ndarray, b: np.ndarray, tolerance: int = PIXEL_TOLERANCE) -> bool:
+    """두 축소 이미지의 모든 픽셀 밝기 차이가 tolerance 이하인지"""
+    return a.shape == b.shape and int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max()) <= tolerance
+
+
+class _CategoryIndex:
+    def __init__(self, band_count: int):
+        self.entries = OrderedDict()
+        self.band_width = HASH_BITS // band_count
+        self.band_count = band_count
+        self.bands = [dict() for _ in range(band_count)]
+        self.next_id = 0
+
+    def band_values(self, value: int):
+        mask = (1 << self.band_width) - 1
+        for band in range(self.band_count):
+            yield band, (value >> (band * self.band_width)) & mask
+
+
+class PerceptualHashIndex:
+    def __init__(self, capacity: int, max_distance: int):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        # 구간 수는 max_distance + 1 (구간 폭이 너무 좁아지지 않도록 최대 16개)
+        self.band_count = min(max_distance + 1, 16)
+        self._lock = threading.Lock()
+        self._categories = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _index(self, category: int) -> _CategoryIndex:
+        index = self._categories.get(category)
+        if index is None:
+            index = self._categories[category] = _CategoryIndex(self.band_count)
+        return index
+
+    def lookup(self, category: int, value: int, thumb: np.ndarray, model_version: str = ""):
+        """해밍 거리 후보 중 축소 이미지까지 같은 항목의 payload (없으면 None)"""
+        with self._lock:
+            index = self._index(category)
+            candidates = set()
+            for band, band_value in index.band_values(value):
+                candidates.update(index.bands[band].get(band_value, ()))
+
+            near = []
+            for entry_id in candidates:
+                stored_value, stored_version, stored_thumb, payload = index.entries[entry_id]
+                if stored_version != model_version:
+                    continue
+                distance = (stored_value ^ value).bit_count()
+                if distance <= self.max_distance:
+                    near.append((distance, entry_id, stored_thumb, payload))
+
+        metrics.observe("phash_candidates", len(candidates), category=category)
+        if not near:
+            metrics.inc("phash_lookup", result="miss", category=category)
+            return None
+        # 가까운 후보부터 픽셀 비교로 확인 (dHash 만 같고 그림이 다르면 거절)
+        for distance, _, stored_thumb, payload in sorted(near, key=lambda item: item[:2]):
+            if same_drawing(stored_thumb, thumb):
+                metrics.inc("phash_lookup", result="hit", category=category)
+                metrics.observe("phash_hit_distance", distance, category=category)
+                return payload
+        metrics.inc("phash_lookup", result="rejected", category=category)
+        return None
+
+    def add(self, category: int, value: int, thumb: np.ndarray, payload, model_version: str = "") -> None:
+        with self._lock:
+            index = self._index(category)
+            entry_id = index.next_id
+            index.next_id += 1
+            index.entries[entry_id] = (value, model_version, thumb, payload)
+            for band, band_value in index.band_values(value):
+                index.bands[band].setdefault(band_value, set()).add(entry_id)
+            while len(index.entries) > self.capacity:
+                self._evict_oldest(index)
+
+    def _evict_oldest(self, index: _CategoryIndex) -> None:
+        entry_id, (value, _, _, _) = index.entries.popitem(last=False)
+        for band, band_value in index.band_values(value):
+            bucket = index.bands[band].get(band_value)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del index.bands[band][band_value]
+
+    def invalidate_category(self, category: int) -> None:
+        with self._lock:
+            self._categories.pop(category, None)
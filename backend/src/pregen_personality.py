@@ -0,0 +1,212 @@
+"""
+성격 분석 결과 사전 생성
+
+get_analysis_result 의 결과는 카테고리별로 유한한 규칙 분기 조합으로 정해진다.
+(기준 객체의 크기/위치, 창문 개수와 집 대비 크기, 각 클래스의 유무, 눈 개수 등)
+이 도구는 도달 가능한 조합을 모두 만들어 분석 문장을 구하고, 문장 집합(llm_cache.normalize_analysis_text)
+기준으로 중복을 없앤 뒤 각 문장에 대한 성격 분석 결과문을 미리 생성해 표(JSON)로 저장한다.
+서버는 PERSONALITY_TABLE 로 이 표를 읽어 두고 표에 있는 문장은 LLM 을 호출하지 않고 바로 답한다.
+
+- 조합의 축은 rules.py 에서 읽는다: '유무' 만 있는 클래스는 있다/없다, 개수/종류 규칙이 있는 클래스는 0~--max-count 개,
+  기준 객체 대비 '크기' 규칙이 있는 클래스(창문)는 크다/보통/작다 크기의 조합
+- 기준 객체(집전체/나무전체/사람전체)는 analysis_module 의 크기/위치 구간마다 대표 박스 하나씩 (최대 --max-anchors 개)
+- 문장에 영향이 없는 클래스(rule_deps.relevant_classes 에서 제외된 클래스)는 조합에 넣지 않는다
+- 결과문 생성은 --concurrency 개까지 동시에 호출하고, 이미 표에 있는 문장은 건너뛴다 (중단 후 이어서 실행 가능)
+
+사용 예:
+    python pregen_personality.py --dry-run
+    python pregen_personality.py --output personality_table.json --concurrency 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import combinations_with_replacement, product
+from pathlib import Path
+
+from analysis_module import get_analysis_result
+from cascade import ANCHOR_CLASS_IDS
+from detections import Detection
+from llm_cache import make_key, normalize_analysis_text
+from llm_gateway import LlmGateway
+from psychology_grok_v2_ver3 import MODEL, PROMPT_VERSION, generate_personality_text, select_model, select_temperature
+from rule_deps import CLASS_NAMES, relevant_classes
+from rules import House_rules, Person_rules, Tree_rules
+
+RULES = {0: House_rules, 1: Tree_rules, 2: Person_rules}
+CATEGORY_DIRS = {0: "house", 1: "tree", 2: "person"}
+
+# analysis_module 의 구간마다 대표 박스 (cx, cy, w, h)
+ANCHOR_BOXES = {
+    # 면적 1/3 이하 + 중앙, 1/3 이하 + 비중앙, 1/3~2/3 (중앙 불가), 2/3 이상
+    0: [(0.5, 0.5, 0.4, 0.4), (0.3, 0.3, 0.4, 0.4), (0.5, 0.5, 0.7, 0.7), (0.5, 0.5, 0.9, 0.9)],
+    # 면적 0.5 이하, 0.5 초과
+    1: [(0.5, 0.5, 0.5, 0.5), (0.5, 0.5, 0.9, 0.9)],
+    # 높이 1/3 이하, 1/3~2/3, 2/3 이상
+    2: [(0.5, 0.5, 0.3, 0.2), (0.5, 0.5, 0.3, 0.5), (0.5, 0.5, 0.5, 0.9)],
+}
+# 기준 객체 대비 면적 비율: 크다(2/3 이상), 보통, 작다(1/3 이하)
+RELATIVE_AREAS = (0.8, 0.5, 0.1)
+DEFAULT_BOX = (0.5, 0.5, 0.1, 0.1)
+DETECTION_CONF = 0.9
+
+
+# ============= 조합 만들기 =============
+def _multisets(values, max_size: int) -> list:
+    states = []
+    for size in range(max_size + 1):
+        states.extend(combinations_with_replacement(values, size))
+    return states
+
+
+def class_states(category: int, cls_id: int, max_anchors: int, max_count: int) -> list:
+    """
+    클래스 하나가 가질 수 있는 상태 목록. 상태는 검출 하나하나를 나타내는 값의 튜플이다.
+    (기준 객체: 박스, 기준 객체 대비 크기 규칙: 면적 비율, 그 밖: None)
+    """
+    if cls_id == ANCHOR_CLASS_IDS[category]:
+        return _multisets(ANCHOR_BOXES[category], max_anchors)
+    rule = RULES[category].get(CLASS_NAMES[category][cls_id], {})
+    if "크기" in rule:
+        return _multisets(RELATIVE_AREAS, max_count)
+    if set(rule) == {"유무"}:
+        return [(), (None,)]
+    return [(None,) * count for count in range(max_count + 1)]
+
+
+def _detections(category: int, state: dict) -> list:
+    anchor = ANCHOR_CLASS_IDS[category]
+    detections = [Detection(anchor, *box, DETECTION_CONF) for box in state.get(anchor, ())]
+    anchor_area = detections[0].w * detections[0].h if detections else DEFAULT_BOX[2] * DEFAULT_BOX[3]
+    for cls_id, values in state.items():
+        if cls_id == anchor:
+            continue
+        for value in values:
+            if value is None:
+                detections.append(Detection(cls_id, *DEFAULT_BOX, DETECTION_CONF))
+            else:
+                side = (value * anchor_area) ** 0.5
+                detections.append(Detection(cls_id, 0.5, 0.5, side, side, DETECTION_CONF))
+    return detections
+
+
+def enumerate_texts(category: int, max_anchors: int, max_count: int):
+    """
+    (조합 수, {정규화된 문장 집합: 대표 분석 문장})
+    분석할 대상이 없는 조합(빈 문장, 서버는 422 로 거절)은 제외한다
+    """
+    class_ids = sorted(relevant_classes(category))
+    axes = [class_states(category, cls_id, max_anchors, max_count) for cls_id in class_ids]
+    texts = {}
+    combinations = 0
+    for states in product(*axes):
+        combinations += 1
+        analysis_text = get_analysis_result(category, detections=_detections(category, dict(zip(class_ids, states))))
+        if not analysis_text or analysis_text.startswith("오류"):
+            continue
+        texts.setdefault(normalize_analysis_text(analysis_text), analysis_text)
+    return combinations, texts
+
+
+# ============= 표 저장/생성 =============
+def _load_table(path: Path) -> dict:
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        if table.get("prompt_version") == PROMPT_VERSION and table.get("model") == MODEL:
+            return table
+        print(f"프롬프트/모델이 바뀌어 기존 표를 새로 만듭니다: {path}")
+    return {"prompt_version": PROMPT_VERSION, "model": MODEL, "entries": {}}
+
+
+def _save_table(table: dict, path: Path) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def generate_table(texts: dict, path: Path, concurrency: int, save_every: int) -> int:
+    """표에 없는 문장만 생성해 저장하고 실패한 개수를 반환"""
+    table = _load_table(path)
+    entries = table["entries"]
+    pending = {}
+    for normalized, analysis_text in texts.items():
+        key = make_key(analysis_text, PROMPT_VERSION, select_model(analysis_text), select_temperature(analysis_text))
+        if key not in entries:
+            pending[key] = (normalized, analysis_text)
+    print(f"생성할 문장 {len(pending)}개 (이미 표에 있는 문장 {len(texts) - len(pending)}개)")
+
+    # 연결 하나를 재사용하고 일시적 오류는 재시도한다 (서버와 같은 LLM_API_HOST/LLM_INSECURE 설정)
+    gateway = LlmGateway(
+        api_key=os.getenv("XAI_API_KEY"),
+        api_host=os.getenv("LLM_API_HOST", "api.x.ai"),
+        insecure=os.getenv("LLM_INSECURE", "0") == "1",
+        max_concurrency=concurrency,
+    )
+    failed = 0
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {
+            pool.submit(generate_personality_text, analysis_text, gateway): key
+            for key, (_, analysis_text) in pending.items()
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            normalized, analysis_text = pending[key]
+            try:
+                result_text, model = future.result()
+            except Exception as exc:
+                failed += 1
+                print(f"    생성 실패: {analysis_text[:40]}... ({exc})")
+                continue
+            if model != select_model(analysis_text):
+                # 시간이 부족해 빠른 모델이 답한 결과문은 표의 키(모델)와 맞지 않으므로 다음 실행에 다시 생성
+                failed += 1
+                print(f"    {model} 가 답해 건너뜀: {analysis_text[:40]}...")
+                continue
+            entries[key] = {"analysis_text": normalized, "result": result_text}
+            done += 1
+            if done % save_every == 0:
+                _save_table(table, path)
+                print(f"    {done}/{len(pending)}")
+    _save_table(table, path)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="도달 가능한 분석 문장 조합의 성격 분석 결과 사전 생성")
+    parser.add_argument("--output", type=Path, default=Path(os.getenv("PERSONALITY_TABLE") or "personality_table.json"))
+    parser.add_argument("--categories", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--max-anchors", type=int, default=1, help="기준 객체(집전체/나무전체/사람전체) 최대 개수")
+    parser.add_argument("--max-count", type=int, default=3, help="개수/크기 규칙이 있는 클래스(창문, 눈 등)의 최대 개수")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--save-every", type=int, default=20)
+    parser.add_argument("--dry-run", action="store_true", help="조합 수와 문장 수만 보고 (LLM 호출 안 함)")
+    args = parser.parse_args()
+
+    texts = {}
+    for category in args.categories:
+        started = time.perf_counter()
+        combinations, category_texts = enumerate_texts(category, args.max_anchors, args.max_count)
+        print(
+            f"[{CATEGORY_DIRS[category]}] 클래스 {len(relevant_classes(category))}개, 조합 {combinations}개 -> "
+            f"문장 집합 {len(category_texts)}개 ({time.perf_counter() - started:.1f}s)"
+        )
+        texts.update(category_texts)
+    text_bytes = sum(len(text.encode("utf-8")) for text in texts.values())
+    print(f"전체 문장 집합 {len(texts)}개 (분석 문장 {text_bytes / 1024:.1f}KB)")
+    if args.dry_run:
+        return 0
+
+    failed = generate_table(texts, args.output, args.concurrency, args.save_every)
+    with open(args.output, "r", encoding="utf-8") as f:
+        entries = len(json.load(f)["entries"])
+    print(f"표: {args.output} (항목 {entries}개, {args.output.stat().st_size / 1024:.1f}KB), 실패 {failed}개")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
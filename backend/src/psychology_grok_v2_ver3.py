@@ -1,8 +1,13 @@
 import os
 import json
+import hashlib
+from typing import List, Literal
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 from xai_sdk import Client
 from xai_sdk.chat import user, system
 
+from metrics import metrics
+
 # ============= 성격 5요인 정보 JSON 로딩 =============
 def load_personality_types(json_path='personality_types.json'):
     with open(json_path, 'r', encoding='utf-8') as f:
@@ -25,6 +30,66 @@ SYSTEM_PROMPT = """
 4. 결과에 선택된 성격 5요인(아이콘, 설명)을 표시하세요.
 """
 
+MODEL = 'grok-4'
+# 빠른(저렴한) 모델: 분석 문장이 FAST_MODEL_MAX_CHARS 자 이하일 때, 남은 시간이 부족할 때, 헤지 요청에 사용 (빈 값이면 MODEL 만 사용)
+FAST_MODEL = os.getenv("LLM_FAST_MODEL", "")
+FAST_MODEL_MAX_CHARS = int(os.getenv("LLM_FAST_MAX_CHARS", "0"))
+
+# ============= 사용자 메시지(v2) =============
+USER_PROMPT_TEMPLATE = """
+다음은 개인의 성격 특성을 나타내는 텍스트입니다:
+
+{input_text}
+
+분석하여 성격 5요인 중 하나로 분류 및 설명,
+- 첫줄 요약 2줄
+- 상세 해석 7줄
+- 유형별 조언 3개(아이콘 포함)
+- 신경성 결과면 권고 메시지도 출력
+"""
+
+# ============= 구조화(JSON) 출력 모드 =============
+# text: 자유 형식 결과문을 줄 단위로 나눈다 / json: 아래 스키마의 JSON 으로 받는다
+OUTPUT_MODE = os.getenv("LLM_OUTPUT_MODE", "text")
+PERSONALITY_TYPES_BY_KEY = {t["key"]: t for t in PERSONALITY_TYPES}
+
+class PersonalityOutput(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    type: Literal[tuple(PERSONALITY_TYPES_BY_KEY)]
+    summary: str
+    details: str
+    advices: List[str] = Field(min_length=3, max_length=3)
+    warning: str
+
+# 요청마다 같은 시스템 메시지(고정 접두어)만 두고 분석 문장은 사용자 메시지로만 보내므로
+# 제공자 측 프롬프트 캐시가 접두어에 적용된다
+STRUCTURED_SYSTEM_PROMPT = """
+당신은 텍스트 기반 성격 심리검사 결과를 분석하고 해석하는 전문 컨설턴트입니다.
+사용자 메시지로 그림 검사에서 나온 성격 특성 문장이 주어집니다.
+
+## 핵심 전달 원칙:
+1. 톤: 사용자에게 공감하며 긍정적으로. 신경성 포함 시 매우 상냥하지만 정중하고 다소 우려스러운 톤.
+2. 짧은 데이터라도 할루시네이션 없이 의미 확장.
+
+## 성격 5요인 (type 에는 key 를 쓴다)
+""" + "\n".join(f"- {t['key']} ({t['name']} {t['icon']}): {t['description']}" for t in PERSONALITY_TYPES) + """
+
+## 출력: 아래 필드만 가진 JSON 객체 하나
+- type: 성격 5요인 중 하나의 key
+- summary: 첫 줄 요약 2문장
+- details: 상세 해석 7문장
+- advices: 유형별 조언 3개 (각각 아이콘으로 시작)
+- warning: 신경성이면 전문 상담사 상담을 권하는 문장, 아니면 빈 문자열
+"""
+
+# 프롬프트가 바뀌면 이전 프롬프트로 만든 캐시 결과를 쓰지 않도록 키에 넣는 버전
+if OUTPUT_MODE == "json":
+    _PROMPT_SOURCE = STRUCTURED_SYSTEM_PROMPT + json.dumps(PersonalityOutput.model_json_schema(), sort_keys=True)
+else:
+    _PROMPT_SOURCE = SYSTEM_PROMPT + USER_PROMPT_TEMPLATE
+PROMPT_VERSION = hashlib.sha256(_PROMPT_SOURCE.encode('utf-8')).hexdigest()[:12]
+
 # ============= txt 파일 읽기 함수 =============
 def read_input_text(file_path):
     with open(file_path, 'r', encoding='utf-8') as f:
@@ -43,51 +108,149 @@ def extract_personality_info(text, types=PERSONALITY_TYPES):
             return t
     return None
 
-# ============= 메인 분석 함수(JSON 결과) =============
-def analyze_personality(input_text):
+# ============= AI 세션 구성 =============
+def select_temperature(input_text):
     is_neuroticism = detect_neuroticism(input_text)
-    temperature = 0.5 if is_neuroticism else 0.7
+    return 0.5 if is_neuroticism else 0.7
+
+def select_model(input_text):
+    """짧은 분석 문장은 빠른 모델로 (캐시 키에도 이 모델 이름을 쓴다)"""
+    if FAST_MODEL and len(input_text) <= FAST_MODEL_MAX_CHARS:
+        return FAST_MODEL
+    return MODEL
 
-    # AI 세션
-    client = Client(api_key=os.getenv("XAI_API_KEY"))
-    chat_session = client.chat.create(model='grok-4', temperature=temperature)
+def create_chat_session(input_text, client=None, model=None):
+    temperature = select_temperature(input_text)
+
+    # AI 세션 (client 를 주면 그 연결을 재사용)
+    if client is None:
+        client = Client(api_key=os.getenv("XAI_API_KEY"))
+    if OUTPUT_MODE == "json":
+        chat_session = client.chat.create(
+            model=model or select_model(input_text), temperature=temperature, response_format=PersonalityOutput,
+        )
+        chat_session.append(system(STRUCTURED_SYSTEM_PROMPT))
+        chat_session.append(user(input_text))
+        return chat_session
+    chat_session = client.chat.create(model=model or select_model(input_text), temperature=temperature)
     chat_session.append(system(SYSTEM_PROMPT))
 
     # 사용자 메시지 구성
-    user_message = f"""
-다음은 개인의 성격 특성을 나타내는 텍스트입니다:
+    chat_session.append(user(USER_PROMPT_TEMPLATE.format(input_text=input_text)))
+    return chat_session
 
-{input_text}
+# ============= 결과문 구조화 함수 =============
+def parse_structured_result(result_text):
+    """
+    JSON 결과문을 스키마로 검증해 구조화. JSON 이 아니면 None
+    JSON 이지만 스키마에 맞지 않으면(유형 이름을 쓰거나 조언 개수가 다른 경우 등) 읽을 수 있는 필드만 쓴다
+    """
+    text = result_text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    try:
+        output = PersonalityOutput.model_validate_json(text)
+    except ValidationError:
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        metrics.inc("llm_output", format="json_invalid")
+        advices = data.get("advices")
+        return {
+            "type": extract_personality_info(str(data.get("type", ""))) or {},
+            "summary": str(data.get("summary", "")),
+            "details": str(data.get("details", "")),
+            "advices": [str(a) for a in advices][:3] if isinstance(advices, list) else [],
+            "warning": str(data.get("warning") or ""),
+        }
+    metrics.inc("llm_output", format="json")
+    return {
+        "type": PERSONALITY_TYPES_BY_KEY[output.type],
+        "summary": output.summary,
+        "details": output.details,
+        "advices": output.advices,
+        "warning": output.warning,
+    }
 
-분석하여 성격 5요인 중 하나로 분류 및 설명,
-- 첫줄 요약 2줄
-- 상세 해석 7줄
-- 유형별 조언 3개(아이콘 포함)
-- 신경성 결과면 권고 메시지도 출력
-"""
-    chat_session.append(user(user_message))
+def parse_personality_result(result_text):
+    """JSON 결과문이면 스키마로, 아니면(자유 형식 결과문, 깨진 JSON) 줄 단위로 나눈다"""
+    if result_text.lstrip().startswith(("{", "```")):
+        structured = parse_structured_result(result_text)
+        if structured is not None:
+            return structured
+    metrics.inc("llm_output", format="text")
+    personality_info = extract_personality_info(result_text)
+    # 결과문 텍스트 파싱(예시, 프롬프트대로라면 순서대로 분리 가능)
+    lines = [l for l in result_text.strip().split('\n') if l]
+    summary = "\n".join(lines[:2])
+    details = "\n".join(lines[2:9])
+    advices = [l for l in lines[9:12]]
+    warning = ""
+    for l in lines:
+        if '전문 상담사' in l:
+            warning = l
+    # JSON 결과 구조화
+    return {
+        "type": personality_info if personality_info else {},
+        "summary": summary,
+        "details": details,
+        "advices": advices,
+        "warning": warning
+    }
 
+# ============= 메인 분석 함수(JSON 결과) =============
+def generate_personality_text(input_text, gateway=None, deadline=None):
+    """
+    (LLM 결과문 원문, 답한 모델). 캐시에는 원문을 저장하되 select_model 과 다른 모델이 답했으면 저장하지 않는다
+    gateway(llm_gateway.LlmGateway)를 주면 동시 호출 제한/시간 제한/재시도를 거쳐 호출하고 그 오류를 그대로 올린다
+    deadline: 요청 마감 시각(time.monotonic 기준). 남은 시간이 부족하면 게이트웨이가 FAST_MODEL 로 보낸다
+    """
+    if gateway is not None:
+        response, model = gateway.sample(
+            lambda client, model: create_chat_session(input_text, client, model),
+            select_model(input_text),
+            FAST_MODEL or None,
+            deadline,
+        )
+        return response.content, model
+    chat_session = create_chat_session(input_text)
     try:
         response = chat_session.sample()
-        result_text = response.content
-        personality_info = extract_personality_info(result_text)
-        # 결과문 텍스트 파싱(예시, 프롬프트대로라면 순서대로 분리 가능)
-        lines = [l for l in result_text.strip().split('\n') if l]
-        summary = "\n".join(lines[:2])
-        details = "\n".join(lines[2:9])
-        advices = [l for l in lines[9:12]]
-        warning = ""
-        for l in lines:
-            if '전문 상담사' in l:
-                warning = l
-        # JSON 결과 구조화
-        return {
-            "type": personality_info if personality_info else {},
-            "summary": summary,
-            "details": details,
-            "advices": advices,
-            "warning": warning
-        }
+        return response.content, select_model(input_text)
+    except Exception as e:
+        raise Exception(f"AI 호출 오류: {e}")
+
+def analyze_personality(input_text):
+    result_text, _ = generate_personality_text(input_text)
+    return parse_personality_result(result_text)
+
+# ============= 스트리밍 분석 함수 =============
+def stream_personality(input_text, gateway=None, deadline=None):
+    """
+    결과문을 생성되는 대로 (답한 모델, 조각(str)) 단위로 내보낸다.
+    전체 결과문을 이어 붙여 parse_personality_result 에 넘기면 analyze_personality 와 같은 JSON 결과가 된다.
+    deadline 은 generate_personality_text 와 같다
+    """
+    if gateway is not None:
+        chunks = gateway.stream(
+            lambda client, model: create_chat_session(input_text, client, model),
+            select_model(input_text),
+            FAST_MODEL or None,
+            deadline,
+        )
+        for model, chunk in chunks:
+            if chunk.content:
+                yield model, chunk.content
+        return
+    model = select_model(input_text)
+    chat_session = create_chat_session(input_text)
+    try:
+        for _, chunk in chat_session.stream():
+            if chunk.content:
+                yield model, chunk.content
     except Exception as e:
         raise Exception(f"AI 호출 오류: {e}")
 
@@ -0,0 +1,153 @@
+"""
+HTP 검출기 INT8 양자화 + 규칙 출력 기반 정확도 게이트
+
+사용 예:
+    python quantize_models.py --calibration ./calibration
+    python quantize_models.py --calibration ./calibration --categories 0 2 --max-text-change 0.02
+
+--calibration 폴더 아래 house/, tree/, person/ 하위 폴더의 이미지를 보정(calibration) 데이터로 쓴다.
+카테고리마다
+  1. fp32 ONNX 를 가중치 옆에 내보내고(이미 있으면 재사용) INT8 정적 양자화 모델을 임시 파일로 만든 뒤
+  2. 보정 이미지 전체에 대해 fp32 / INT8 검출 결과를 비교해
+     - 규칙에 쓰이는 검출(analysis_module 의 RULE_CONF 이상, 클래스 + IoU 매칭)이 달라진 개수
+     - 최종 analysis_text 가 달라진 이미지 비율
+     을 보고한다.
+  3. 문장이 달라진 비율이 --max-text-change 를 넘으면 INT8 모델을 게시하지 않고 버린다.
+     (크기/비율이 규칙 결과를 좌우하므로 mAP 가 아니라 규칙 출력으로 판단)
+게이트를 통과한 모델만 `<가중치 이름>.int8.onnx` 로 게시되며, 서버는 YOLO_PRECISION=int8 일 때 이를 로드한다.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from onnxruntime.quantization import CalibrationDataReader
+
+from analysis_module import RULE_CONF, get_analysis_result
+from detections import unmatched_detections
+from detector_backends import DEFAULT_WEIGHTS, OnnxBackend, OnnxModel, letterbox, load_pil
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+CATEGORY_DIRS = {0: "house", 1: "tree", 2: "person"}
+
+
+class ImageFolderReader(CalibrationDataReader):
+    """보정 이미지를 서버와 같은 letterbox 전처리로 한 장씩 넘겨주는 리더"""
+
+    def __init__(self, input_name: str, images: list, imgsz: int):
+        super().__init__()
+        self.input_name = input_name
+        self.images = images
+        self.imgsz = imgsz
+        self._index = 0
+
+    def get_next(self):
+        if self._index >= len(self.images):
+            return None
+        tensor, _ = letterbox(load_pil(self.images[self._index]), self.imgsz)
+        self._index += 1
+        return {self.input_name: tensor[None]}
+
+    def rewind(self):
+        self._index = 0
+
+
+def list_images(folder: Path) -> list:
+    if not folder.is_dir():
+        return []
+    return sorted(p for p in folder.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def quantize(fp32_path: Path, output_path: Path, reader: ImageFolderReader) -> None:
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared_path = output_path.with_suffix(".prep.onnx")
+    try:
+        quant_pre_process(str(fp32_path), str(prepared_path))
+        quantize_static(
+            str(prepared_path),
+            str(output_path),
+            reader,
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+    finally:
+        prepared_path.unlink(missing_ok=True)
+
+
+def evaluate(backend: OnnxBackend, fp32: OnnxModel, int8: OnnxModel, images: list, category: int) -> dict:
+    """보정 이미지마다 fp32 / INT8 검출과 analysis_text 를 비교"""
+    changed_detections = 0
+    changed_texts = 0
+    for image_path in images:
+        fp32_dets = backend.predict_batch(fp32, [str(image_path)])[0]
+        int8_dets = backend.predict_batch(int8, [str(image_path)])[0]
+        missing, extra = unmatched_detections(fp32_dets, int8_dets, min_conf=RULE_CONF)
+        changed_detections += len(missing) + len(extra)
+        fp32_text = get_analysis_result(category, detections=fp32_dets)
+        int8_text = get_analysis_result(category, detections=int8_dets)
+        if fp32_text != int8_text:
+            changed_texts += 1
+            print(f"    문장 변경: {image_path.name}")
+    return {
+        "images": len(images),
+        "changed_detections": changed_detections,
+        "changed_texts": changed_texts,
+        "text_change_ratio": changed_texts / len(images) if images else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTP 검출기 INT8 양자화")
+    parser.add_argument("--calibration", type=Path, required=True, help="house/tree/person 하위 폴더를 가진 보정 이미지 폴더")
+    parser.add_argument("--categories", type=int, nargs="+", choices=(0, 1, 2), default=[0, 1, 2])
+    parser.add_argument("--max-text-change", type=float, default=0.02, help="허용하는 analysis_text 변경 비율")
+    parser.add_argument("--conf", type=float, default=float(os.getenv("YOLO_CONF", "0.70")))
+    parser.add_argument("--imgsz", type=int, default=int(os.getenv("YOLO_IMGSZ", "640")))
+    args = parser.parse_args()
+
+    backend = OnnxBackend(args.conf, args.imgsz)
+    failed = 0
+    for category in args.categories:
+        weights = DEFAULT_WEIGHTS[category]
+        images = list_images(args.calibration / CATEGORY_DIRS[category])
+        print(f"[{CATEGORY_DIRS[category]}] 보정 이미지 {len(images)}개")
+        if not images:
+            print("    보정 이미지가 없어 건너뜁니다.")
+            failed += 1
+            continue
+
+        fp32_path = backend.export(weights)
+        published_path = backend.onnx_path_for(weights, "int8")
+        candidate_path = published_path.with_suffix(".candidate.onnx")
+
+        fp32 = OnnxModel(backend.create_session(fp32_path), fp32_path)
+        quantize(fp32_path, candidate_path, ImageFolderReader(fp32.input_name, images, args.imgsz))
+        int8 = OnnxModel(backend.create_session(candidate_path), candidate_path)
+
+        report = evaluate(backend, fp32, int8, images, category)
+        size_ratio = candidate_path.stat().st_size / fp32_path.stat().st_size
+        print(
+            f"    규칙 관련 검출 변경 {report['changed_detections']}개, "
+            f"문장 변경 {report['changed_texts']}/{report['images']} ({report['text_change_ratio']:.1%}), "
+            f"모델 크기 {size_ratio:.0%}"
+        )
+
+        if report["text_change_ratio"] > args.max_text_change:
+            candidate_path.unlink(missing_ok=True)
+            print(f"    게시 거부: 문장 변경 비율이 허용치({args.max_text_change:.1%})를 넘었습니다.")
+            failed += 1
+            continue
+
+        candidate_path.replace(published_path)
+        print(f"    게시 완료: {published_path}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
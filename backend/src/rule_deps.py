@@ -0,0 +1,85 @@
+"""
+규칙 의존성 분석기
+
+rules.py 에서 '있다'/'없다' 문장이 모두 None 인 클래스(지붕, 집벽, 연기, 기둥, 수관, 머리, 상체 ...)나
+analysis_module 이 없는 규칙 키로 바꿔 읽는 클래스(새/다람쥐 -> 동물, 운동화/여자구두 -> 신발)는
+검출되어도 최종 문장에 영향을 주지 않는다. 반대로 창문 크기(집전체 대비)나 얼굴 완전성(눈/코/입)처럼
+다른 클래스를 거쳐 간접적으로 쓰이는 클래스도 있다.
+
+규칙 코드를 직접 해석하지 않고 get_analysis_result 를 블랙박스로 두고,
+고정 시드로 만든 여러 검출 조합(개수/위치/크기/confidence)에서 한 클래스의 검출만 지웠을 때
+문장이 바뀌는 경우가 한 번이라도 있으면 그 클래스를 '영향 있음'으로 본다.
+서버 시작 시 다시 계산하므로 rules.py / analysis_module.py 가 바뀌면 자동으로 반영된다.
+무작위 탐색이 클래스를 놓치면 필터가 그 클래스를 버리므로, tests/test_rule_deps.py 가
+rules.py 를 읽고 정한 기대 집합과 결과를 비교한다 (규칙을 바꾸면 기대 집합도 함께 고친다).
+
+결과 확인:
+    python rule_deps.py
+"""
+import random
+import sys
+from functools import lru_cache
+
+from analysis_module import HOUSE_CLASS_NAMES, PERSON_CLASS_NAMES, RULE_CONF, TREE_CLASS_NAMES, get_analysis_result
+from detections import Detection
+
+CLASS_NAMES = {0: HOUSE_CLASS_NAMES, 1: TREE_CLASS_NAMES, 2: PERSON_CLASS_NAMES}
+PROBE_COUNT = 300
+PROBE_SEED = 0
+
+
+def _random_detection(rng: random.Random, cls_id: int) -> Detection:
+    w, h = rng.uniform(0.02, 1.0), rng.uniform(0.02, 1.0)
+    cx = rng.uniform(w / 2, 1 - w / 2)
+    cy = rng.uniform(h / 2, 1 - h / 2)
+    conf = rng.choice((rng.uniform(RULE_CONF, 1.0), rng.uniform(0.5, RULE_CONF)))
+    return Detection(cls_id, cx, cy, w, h, conf)
+
+
+def _probes(category: int):
+    """클래스마다 0~3개 검출을 무작위로 둔 검출 조합 (고정 시드)"""
+    rng = random.Random(PROBE_SEED + category)
+    class_count = len(CLASS_NAMES[category])
+    for _ in range(PROBE_COUNT):
+        detections = []
+        for cls_id in range(class_count):
+            for _ in range(rng.choice((0, 0, 1, 1, 2, 3))):
+                detections.append(_random_detection(rng, cls_id))
+        yield detections
+
+
+@lru_cache(maxsize=None)
+def relevant_classes(category: int) -> frozenset:
+    """최종 분석 문장을 바꿀 수 있는 클래스 id 집합"""
+    class_count = len(CLASS_NAMES[category])
+    relevant = set()
+    for detections in _probes(category):
+        text = get_analysis_result(category, detections=detections)
+        for cls_id in range(class_count):
+            if cls_id in relevant:
+                continue
+            without = [det for det in detections if det.cls_id != cls_id]
+            if len(without) != len(detections) and get_analysis_result(category, detections=without) != text:
+                relevant.add(cls_id)
+        if len(relevant) == class_count:
+            break
+    return frozenset(relevant)
+
+
+def class_filter() -> dict:
+    """카테고리별 검출기 클래스 필터 (정렬된 클래스 id 리스트)"""
+    return {category: sorted(relevant_classes(category)) for category in CLASS_NAMES}
+
+
+def main():
+    for category, names in CLASS_NAMES.items():
+        relevant = relevant_classes(category)
+        kept = [names[i] for i in sorted(relevant)]
+        pruned = [name for i, name in enumerate(names) if i not in relevant]
+        print(f"[category={category}] 사용 {len(kept)}/{len(names)}: {', '.join(kept)}")
+        print(f"    제외: {', '.join(pruned) or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
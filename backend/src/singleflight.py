@@ -0,0 +1,91 @@
+"""
+진행 중인 같은 요청 합치기 (single-flight)
+
+반 학생들이 비슷한 그림을 동시에 올리면 같은 analysis_text 가 동시에 성격 분석 단계에 들어와
+각자 LLM 세션을 연다. 같은 키(정규화한 문장 집합 기준 캐시 키)의 호출이 이미 진행 중이면
+새로 호출하지 않고 그 호출이 끝나기를 기다려 같은 결과(또는 같은 예외)를 받는다.
+결과를 저장하지 않으므로 캐시처럼 오래된 결과를 돌려줄 일은 없다.
+첫 호출자의 결과가 같은 키로 볼 수 없는 결과면(예: 시간이 부족해 빠른 모델이 답함) 넘기지 않고,
+기다리던 호출자들은 다시 합류해 그중 하나가 직접 실행한다.
+
+성격 분석 호출은 스레드에서 실행되므로 threading 기반으로 동작한다.
+"""
+import threading
+
+from metrics import metrics
+
+
+class NotShared(Exception):
+    """첫 호출자의 결과를 함께 쓸 수 없음 (기다리던 호출자는 다시 합류한다)"""
+
+
+class Call:
+    def __init__(self):
+        self.waiters = 0
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def wait(self, timeout: float = None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("진행 중인 호출을 기다리다 시간이 초과되었습니다.")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        # name: 메트릭 이름 접두어
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def join(self, key: str) -> tuple:
+        """(Call, 첫 호출자 여부). 첫 호출자는 직접 실행한 뒤 반드시 finish 를 호출해야 한다"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = Call()
+                leader = True
+        metrics.inc(self.name, role="leader" if leader else "waiter")
+        return call, leader
+
+    def finish(self, key: str, call: Call, result=None, error: BaseException = None) -> None:
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        # 삭제 이후에는 더 합류할 수 없으므로 waiters 가 확정된다
+        metrics.observe(f"{self.name}_waiters", call.waiters)
+        if isinstance(error, NotShared):
+            metrics.inc(f"{self.name}_not_shared")
+        call._result, call._error = result, error
+        call._done.set()
+
+    def do(self, key: str, fn, timeout: float = None, shareable=None):
+        """
+        같은 key 로 진행 중인 fn 호출이 있으면 그 결과를 기다리고, 없으면 직접 실행
+        기다리는 쪽은 timeout 초가 지나면 TimeoutError (첫 호출자가 멈춰도 함께 멈추지 않도록)
+        shareable(결과) 가 False 면 결과를 넘기지 않고 기다리던 호출자가 다시 합류한다
+        """
+        while True:
+            call, leader = self.join(key)
+            if leader:
+                break
+            try:
+                return call.wait(timeout)
+            except NotShared:
+                continue
+        try:
+            result = fn()
+        except BaseException as exc:
+            self.finish(key, call, error=exc)
+            raise
+        if shareable is not None and not shareable(result):
+            self.finish(key, call, error=NotShared())
+        else:
+            self.finish(key, call, result=result)
+        return result
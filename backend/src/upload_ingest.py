@@ -0,0 +1,160 @@
+"""
+스트리밍 업로드 수집
+
+- UploadLimitMiddleware: 요청 본문을 받는 도중 바이트 수와 수신 지연을 감시해
+  최대 크기를 넘으면 413, 너무 느리면 408 로 바로 끊는다. (multipart 파싱이 끝날 때까지 기다리지 않음)
+- ingest_upload: UploadFile 을 청크 단위로 읽으며 SHA-256 을 함께 계산하고,
+  작은 파일은 메모리에 두고 큰 파일만 임시 파일로 내린다. 파일 I/O 는 모두 스레드에서 수행한다.
+"""
+import asyncio
+import hashlib
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from metrics import metrics
+
+CHUNK_SIZE = 256 * 1024
+
+
+def _too_large() -> HTTPException:
+    metrics.inc("upload_rejected", reason="too_large")
+    return HTTPException(status_code=413, detail="업로드 크기가 너무 큽니다.")
+
+
+def _timed_out() -> HTTPException:
+    metrics.inc("upload_rejected", reason="timeout")
+    return HTTPException(status_code=408, detail="업로드 시간이 초과되었습니다.")
+
+
+# ============= 요청 본문 제한 미들웨어 =============
+class UploadLimitMiddleware:
+    def __init__(self, app, max_body_bytes: int, idle_timeout: float, body_timeout: float, path_limits: dict = None):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.idle_timeout = idle_timeout
+        self.body_timeout = body_timeout
+        # 경로별 (최대 바이트, 전체 수신 제한 시간) 예외. 예: 대량 업로드
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            await self.app(scope, receive, send)
+            return
+
+        max_body_bytes, body_timeout = self.path_limits.get(scope["path"], (self.max_body_bytes, self.body_timeout))
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_body_bytes:
+            await self._reject(send, _too_large())
+            return
+
+        received = 0
+        body_done = False
+        started = time.monotonic()
+        response_started = False
+
+        async def limited_receive():
+            # 여기서 올린 HTTPException 은 FastAPI 가 본문 파싱 중 그대로 응답으로 바꾼다
+            nonlocal received, body_done
+            if body_done:
+                # 본문을 다 받은 뒤의 receive 는 연결 종료 감지용이므로 제한하지 않는다
+                return await receive()
+            remaining = body_timeout - (time.monotonic() - started)
+            try:
+                message = await asyncio.wait_for(receive(), timeout=max(0.0, min(self.idle_timeout, remaining)))
+            except asyncio.TimeoutError:
+                raise _timed_out()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_bytes:
+                    raise _too_large()
+                body_done = not message.get("more_body", False)
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except HTTPException as exc:
+            if response_started:
+                raise
+            await self._reject(send, exc)
+
+    @staticmethod
+    async def _reject(send, exc: HTTPException) -> None:
+        response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers={"Connection": "close"})
+        await response({"type": "http"}, None, send)
+
+
+# ============= 업로드 수집 =============
+@dataclass
+class IngestedUpload:
+    sha256: str
+    size: int
+    suffix: str
+    data: Optional[bytes] = None
+    path: Optional[Path] = None
+
+    @property
+    def source(self):
+        """디코더에 넘길 입력 (메모리 바이트 또는 임시 파일 경로)"""
+        return self.data if self.data is not None else self.path
+
+    def cleanup(self) -> None:
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+
+async def ingest_upload(upload: UploadFile, max_bytes: int, memory_limit: int, spill_dir: Path) -> IngestedUpload:
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    spill_file = None
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise _too_large()
+            digest.update(chunk)
+
+            if spill_file is None and len(buffer) + len(chunk) > memory_limit:
+                # 큰 업로드만 디스크로 내린다
+                spill_file = await asyncio.to_thread(
+                    tempfile.NamedTemporaryFile, dir=spill_dir, suffix=".upload", delete=False,
+                )
+                await asyncio.to_thread(spill_file.write, bytes(buffer))
+                buffer = bytearray()
+            if spill_file is not None:
+                await asyncio.to_thread(spill_file.write, chunk)
+            else:
+                buffer.extend(chunk)
+    except BaseException:
+        if spill_file is not None:
+            await asyncio.to_thread(spill_file.close)
+            Path(spill_file.name).unlink(missing_ok=True)
+        raise
+
+    if size == 0:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="빈 파일입니다.")
+
+    suffix = Path(upload.filename or "").suffix or ".jpg"
+    metrics.observe("upload_bytes", size)
+    if spill_file is not None:
+        await asyncio.to_thread(spill_file.close)
+        metrics.inc("upload_spilled")
+        return IngestedUpload(digest.hexdigest(), size, suffix, path=Path(spill_file.name))
+    return IngestedUpload(digest.hexdigest(), size, suffix, data=bytes(buffer))
+
@@ -0,0 +1,97 @@
+"""
+상주(in-process) YOLO 추론 엔진
+
+서버 시작 시 카테고리(0=집, 1=나무, 2=사람)별 가중치를 한 번만 로드해 메모리에 유지하고,
+요청마다 `yolo predict` CLI 프로세스를 띄우는 대신 검출기 백엔드(detector_backends)로 예측한다.
+conf / imgsz / device 의미는 기존 CLI 호출과 동일하다.
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Dict
+
+from PIL import Image
+
+from model_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+
+class YoloEngine:
+    def __init__(self, model_paths: Dict[int, Path], backend, extra_imgsz=(), class_filter: dict = None):
+        self.model_paths = model_paths
+        self.backend = backend
+        # 카테고리별로 검출할 클래스 id (rule_deps.class_filter). 없으면 모든 클래스
+        self.class_filter = class_filter or {}
+        # 기본 imgsz 외에 요청마다 쓸 수 있는 입력 크기 (크롭 버킷 등). 로드 시 함께 워밍업한다
+        self.imgsz_sizes = sorted({backend.imgsz, *extra_imgsz})
+        self._models = {}
+        # 로드한 가중치 파일의 (크기, 수정 시각)과 해시. 파일 교체 감지/캐시 키에 사용
+        self._loaded_stats = {}
+        self._versions = {}
+        # ultralytics predictor 는 스레드 안전하지 않으므로 모델별로 직렬화
+        self._locks = {category: threading.Lock() for category in model_paths}
+
+    # ============= 모델 로딩 =============
+    def load(self) -> None:
+        for category, model_path in self.model_paths.items():
+            if not model_path.exists():
+                logger.warning("YOLO 가중치 파일이 없습니다: category=%s path=%s", category, model_path)
+                continue
+            self._load_category(category, model_path)
+
+    def _load_category(self, category: int, model_path: Path) -> None:
+        stat = model_path.stat()
+        model = self.backend.load_model(model_path)
+        self._warmup(model)
+        with self._locks[category]:
+            self._models[category] = model
+            self._loaded_stats[category] = (stat.st_size, stat.st_mtime_ns)
+            self._versions[category] = file_sha256(model_path)[:16]
+        logger.info(
+            "YOLO 모델 로드 완료: category=%s backend=%s path=%s",
+            category, self.backend.name, model_path,
+        )
+
+    def reload_changed(self) -> list:
+        """가중치 파일이 교체된 카테고리만 다시 로드하고 그 카테고리 목록을 반환"""
+        reloaded = []
+        for category, model_path in self.model_paths.items():
+            if not model_path.exists():
+                continue
+            stat = model_path.stat()
+            if self._loaded_stats.get(category) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            logger.info("가중치 파일 변경 감지, 다시 로드합니다: category=%s", category)
+            self._load_category(category, model_path)
+            reloaded.append(category)
+        return reloaded
+
+    def model_version(self, category: int) -> str:
+        """가중치 해시 + 백엔드 + 정밀도 + 클래스 필터. 검출 결과 캐시 키에 사용"""
+        precision = getattr(self.backend, "precision", "fp32")
+        version = f"{self._versions.get(category, '')}:{self.backend.name}:{precision}"
+        classes = self.class_filter.get(category)
+        if classes is not None:
+            version += ":c" + ",".join(map(str, classes))
+        return version
+
+    def _warmup(self, model) -> None:
+        # 첫 요청에서 디바이스 초기화/커널 준비 비용을 치르지 않도록 크기별로 빈 이미지로 한 번 실행
+        for imgsz in self.imgsz_sizes:
+            self.backend.predict_batch(model, [Image.new("RGB", (imgsz, imgsz))], imgsz)
+
+    def is_loaded(self, category: int) -> bool:
+        return category in self._models
+
+    # ============= 예측 =============
+    def predict(self, source, category: int, imgsz: int = None) -> list:
+        return self.predict_batch([source], category, imgsz)[0]
+
+    def predict_batch(self, sources: list, category: int, imgsz: int = None) -> list:
+        """여러 이미지를 한 번의 forward pass 로 예측하고 입력 순서대로 Detection 리스트를 반환"""
+        model = self._models.get(category)
+        if model is None:
+            raise KeyError(f"로드된 YOLO 모델이 없습니다: category={category}")
+        with self._locks[category]:
+            return self.backend.predict_batch(model, sources, imgsz, self.class_filter.get(category))
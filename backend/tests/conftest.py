@@ -0,0 +1,40 @@
+"""
+backend/src 의 모듈은 flat 하게 서로 import 하므로 (예: from metrics import metrics) src 를 경로에 넣고,
+psychology_grok_v2_ver3 는 personality_types.json 을 현재 폴더 기준으로 읽으므로 src 에서 실행한다.
+main 을 import 하는 테스트가 작업 파일을 홈 폴더에 만들지 않도록 JOB_DIR 을 임시 폴더로 둔다.
+"""
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+os.chdir(SRC_DIR)
+os.environ.setdefault("JOB_DIR", tempfile.mkdtemp(prefix="htp_jobs_"))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def standin():
+    """llm_standin 대역 서버를 띄우는 함수. 띄운 서버의 주소(localhost:포트)를 반환하고 테스트가 끝나면 멈춘다"""
+    from llm_standin import serve
+
+    servers = []
+
+    def start(**options) -> str:
+        port = _free_port()
+        servers.append(serve(port, **options))
+        return f"localhost:{port}"
+
+    yield start
+    for server in servers:
+        server.stop(None)
@@ -0,0 +1,107 @@
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+
+
+def _png(color: str = "white") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    async def analyze_upload(upload, category):
+        # 검출은 건너뛰고 헤더 검사(read_image_info)를 통과한 그림만 여기까지 온다
+        return [], f"{main.CATEGORY_NAMES[category]} {upload.size}"
+
+    monkeypatch.setattr(main, "_analyze_upload", analyze_upload)
+    monkeypatch.setattr(main, "UPLOAD_DIR", tmp_path)
+    return TestClient(main.app)
+
+
+def _lines(response) -> tuple:
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    # 그림 줄은 끝나는 순서대로 오고, 마지막 줄이 요약
+    return sorted(lines[:-1], key=lambda line: line["index"]), lines[-1]
+
+
+def test_multipart_streams_one_line_per_item(client):
+    image = _png()
+    files = [
+        ("house", ("a.png", image, "image/png")),
+        ("tree", ("b.png", image, "image/png")),
+        ("person", ("broken.png", b"not an image", "image/png")),
+        ("drawing", ("c.png", image, "image/png")),
+    ]
+    items, summary = _lines(client.post("/bulk", files=files))
+
+    assert [(item["index"], item["filename"], item["category"]) for item in items] == [
+        (0, "a.png", 0), (1, "b.png", 1), (2, "broken.png", 2), (3, "c.png", None),
+    ]
+    assert items[0]["analysis_text"] == f"집 {len(image)}"
+    assert items[1]["analysis_text"] == f"나무 {len(image)}"
+    # 잘못된 항목은 그 줄에만 오류가 담기고 나머지 분석은 계속된다
+    assert items[2]["error"]["status"] == 400
+    assert "analysis_text" not in items[2]
+    assert items[3]["error"]["status"] == 400 and "category" in items[3]["error"]["detail"]
+    assert summary == {"done": True, "total": 4, "failed": 2}
+
+
+def test_category_query_is_the_default(client):
+    files = [("files", ("a.png", _png(), "image/png")), ("tree", ("b.png", _png(), "image/png"))]
+    items, summary = _lines(client.post("/bulk?category=2", files=files))
+    assert [item["category"] for item in items] == [2, 1]
+    assert summary["failed"] == 0
+
+
+def _zip(names) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name in names:
+            archive.writestr(name, _png() if name.endswith(".png") else b"text")
+    return buffer.getvalue()
+
+
+def test_zip_uses_top_folder_as_category(client, tmp_path):
+    body = _zip(["house/a.png", "person/b.png", "notes.txt", "__MACOSX/house/._a.png", "house/"])
+    items, summary = _lines(client.post("/bulk", content=body, headers={"content-type": "application/zip"}))
+
+    assert [(item["filename"], item["category"]) for item in items] == [("house/a.png", 0), ("person/b.png", 2)]
+    assert summary == {"done": True, "total": 2, "failed": 0}
+    # 받아 둔 zip 임시 파일은 지운다
+    assert not list(tmp_path.iterdir())
+
+
+def test_bad_zip_is_reported_in_summary(client):
+    _, summary = _lines(client.post("/bulk", content=b"not a zip", headers={"content-type": "application/zip"}))
+    assert summary["total"] == 0
+    assert summary["error"]["status"] == 400
+
+
+def test_too_many_items(client, monkeypatch):
+    monkeypatch.setattr(main, "BULK_MAX_ITEMS", 2)
+    files = [("house", (f"{i}.png", _png(), "image/png")) for i in range(3)]
+    items, summary = _lines(client.post("/bulk", files=files))
+    # 상한까지의 그림은 분석하고, 넘는 순간 요약 줄에 413
+    assert [item["index"] for item in items] == [0, 1]
+    assert summary["error"]["status"] == 413
+
+    body = _zip([f"house/{i}.png" for i in range(3)])
+    items, summary = _lines(client.post("/bulk", content=body, headers={"content-type": "application/zip"}))
+    # zip 은 목록을 먼저 보므로 하나도 분석하지 않는다
+    assert items == []
+    assert summary["error"]["status"] == 413
+
+
+def test_unsupported_content_type(client):
+    assert client.post("/bulk", content=b"{}", headers={"content-type": "application/json"}).status_code == 415
+    assert client.post("/bulk?category=5", files=[("house", ("a.png", _png(), "image/png"))]).status_code == 400
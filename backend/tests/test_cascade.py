@@ -0,0 +1,52 @@
+from analysis_module import RULE_CONF
+from cascade import ANCHOR_CLASS_IDS, escalation_reason
+from detections import Detection
+from rule_deps import relevant_classes
+
+HOUSE, TREE, PERSON = 0, 1, 2
+MARGIN = 0.1
+
+
+def _det(cls_id: int, conf: float) -> Detection:
+    return Detection(cls_id, 0.5, 0.5, 0.2, 0.2, conf)
+
+
+def test_settled_first_pass():
+    for category, anchor in ANCHOR_CLASS_IDS.items():
+        assert escalation_reason([_det(anchor, 0.95)], category, MARGIN) is None
+    # 기준과 margin 이상 떨어진 검출은 어느 쪽이든 결과가 정해진 것으로 본다
+    detections = [
+        _det(ANCHOR_CLASS_IDS[HOUSE], 0.95), _det(4, RULE_CONF + MARGIN + 0.01), _det(4, RULE_CONF - MARGIN - 0.01),
+    ]
+    assert escalation_reason(detections, HOUSE, MARGIN) is None
+
+
+def test_near_threshold():
+    anchor = ANCHOR_CLASS_IDS[TREE]
+    assert escalation_reason([_det(anchor, 0.95), _det(5, RULE_CONF + 0.05)], TREE, MARGIN) == "near_threshold"
+    assert escalation_reason([_det(anchor, 0.95), _det(5, RULE_CONF - 0.05)], TREE, MARGIN) == "near_threshold"
+    # 기준 객체 자신이 기준 근처여도 다시 검출
+    assert escalation_reason([_det(anchor, RULE_CONF + 0.02)], TREE, MARGIN) == "near_threshold"
+    # margin 이 0 이면 기준 근처 검사를 하지 않음
+    assert escalation_reason([_det(anchor, 0.95), _det(5, RULE_CONF - 0.05)], TREE, 0) is None
+
+
+def test_anchor_missing():
+    anchor = ANCHOR_CLASS_IDS[PERSON]
+    assert escalation_reason([], PERSON, MARGIN) == "anchor_missing"
+    # 기준 객체가 RULE_CONF 아래이거나 다른 카테고리의 기준 클래스만 있음
+    assert escalation_reason([_det(anchor, RULE_CONF - 0.2)], PERSON, MARGIN) == "anchor_missing"
+    assert escalation_reason([_det(anchor + 1, 0.95)], PERSON, MARGIN) == "anchor_missing"
+
+
+def test_near_threshold_ignores_classes_without_rules():
+    relevant = relevant_classes(HOUSE)
+    anchor = ANCHOR_CLASS_IDS[HOUSE]
+    ignored = next(cls_id for cls_id in range(15) if cls_id not in relevant)
+    used = next(cls_id for cls_id in sorted(relevant) if cls_id != anchor)
+    near = RULE_CONF + 0.02
+
+    # 문장에 영향이 없는 클래스는 기준 근처여도 첫 패스로 충분
+    assert escalation_reason([_det(anchor, 0.95), _det(ignored, near)], HOUSE, MARGIN) == "near_threshold"
+    assert escalation_reason([_det(anchor, 0.95), _det(ignored, near)], HOUSE, MARGIN, relevant) is None
+    assert escalation_reason([_det(anchor, 0.95), _det(used, near)], HOUSE, MARGIN, relevant) == "near_threshold"
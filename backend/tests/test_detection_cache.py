@@ -0,0 +1,19 @@
+from detection_cache import DetectionCache
+from detections import Detection
+
+
+def _detections(count: int) -> list:
+    return [Detection(0, 0.5, 0.5, 0.1, 0.1, 0.9) for _ in range(count)]
+
+
+def _disk_usage(cache: DetectionCache) -> int:
+    return sum(p.stat().st_size for p in cache.disk_dir.rglob("*.json"))
+
+
+def test_overwrite_keeps_disk_usage_in_sync(tmp_path):
+    cache = DetectionCache(0, disk_dir=tmp_path, disk_max_bytes=1 << 20)
+    cache.put("a", 0, _detections(5))
+    cache.put("a", 0, _detections(1))
+    cache.put("b", 1, _detections(2))
+    assert cache._disk_bytes == _disk_usage(cache)
+
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from PIL import Image, ImageDraw
+
+from drawing_filter import REJECT_MESSAGES, DrawingThresholds, check_drawing, drawing_features, rejection_reason
+
+THRESHOLDS = DrawingThresholds()
+
+
+def _drawing() -> Image.Image:
+    image = Image.new("RGB", (600, 800), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((140, 360, 460, 660), outline="black", width=4)
+    draw.polygon([(120, 360), (300, 180), (480, 360)], outline="black", width=4)
+    return image
+
+
+def _blank() -> Image.Image:
+    return Image.new("RGB", (600, 800), (245, 243, 238))
+
+
+def _dark_photo() -> Image.Image:
+    # 어두운 실내 사진처럼 밝은 종이 픽셀이 거의 없음
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(30, 120, (800, 600, 3), dtype=np.uint8))
+
+
+def _colorful() -> Image.Image:
+    # 흰 배경 위의 원색 면 (만화/화면 캡처)
+    image = Image.new("RGB", (600, 800), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 600, 250), fill=(230, 20, 20))
+    draw.rectangle((0, 250, 600, 400), fill=(20, 40, 230))
+    return image
+
+
+def _text_screen() -> Image.Image:
+    # 흰 바탕에 촘촘한 글자처럼 밝기가 계속 바뀌는 화면
+    pixels = np.full((128, 128), 255, dtype=np.uint8)
+    pixels[::2, ::2] = 0
+    pixels[1::2, 1::2] = 0
+    pixels[:40] = 255
+    return Image.fromarray(pixels).convert("RGB")
+
+
+def test_drawing_passes():
+    assert rejection_reason(drawing_features(_drawing()), THRESHOLDS) is None
+    check_drawing(_drawing(), THRESHOLDS)
+
+
+@pytest.mark.parametrize("image, reason", [
+    (_blank(), "blank"),
+    (_dark_photo(), "not_paper"),
+    (_colorful(), "too_colorful"),
+    (_text_screen(), "too_many_edges"),
+])
+def test_each_rejection_reason(image, reason):
+    assert rejection_reason(drawing_features(image), THRESHOLDS) == reason
+    with pytest.raises(HTTPException) as exc_info:
+        check_drawing(image, THRESHOLDS)
+    assert exc_info.value.status_code == 422
+    assert exc_info.value.detail == REJECT_MESSAGES[reason]
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from detections import Detection
+from ink_crop import CropPlan, plan_ink_crop
+
+WIDTH, HEIGHT = 1200, 1600
+# 종이 가운데 아래쪽에 작게 그린 집 (원본 픽셀 좌표)
+HOUSE_BOX = (420, 700, 780, 1060)
+
+
+def _drawing() -> Image.Image:
+    image = Image.new("RGB", (WIDTH, HEIGHT), "white")
+    ImageDraw.Draw(image).rectangle(HOUSE_BOX, outline="black", width=6)
+    return image
+
+
+def _detect(image: Image.Image, cls_id: int = 0) -> Detection:
+    """검출기 대신: 이미지의 어두운 픽셀 bounding box 를 정규화 (cx, cy, w, h) 로"""
+    ink = np.asarray(image.convert("L")) < 128
+    rows, cols = np.flatnonzero(ink.any(axis=1)), np.flatnonzero(ink.any(axis=0))
+    height, width = ink.shape
+    left, top, right, bottom = cols[0], rows[0], cols[-1] + 1, rows[-1] + 1
+    return Detection(cls_id, (left + right) / 2 / width, (top + bottom) / 2 / height,
+                     (right - left) / width, (bottom - top) / height, 0.9)
+
+
+def test_remap_round_trip():
+    image = _drawing()
+    plan = plan_ink_crop(image, 640, [320, 416, 512], 0.04)
+    assert plan is not None and plan.imgsz < 640
+    left, top, right, bottom = plan.box
+    assert left < HOUSE_BOX[0] and top < HOUSE_BOX[1] and right > HOUSE_BOX[2] and bottom > HOUSE_BOX[3]
+
+    # 크롭 이미지를 검출 입력 크기로 줄여 검출한 결과를 원본 기준으로 되돌리면 원본에서 검출한 결과와 같다
+    scale = plan.imgsz / max(plan.image.size)
+    resized = plan.image.resize((round(plan.image.width * scale), round(plan.image.height * scale)), Image.BILINEAR)
+    (remapped,) = plan.remap([_detect(resized)])
+    expected = _detect(image)
+    assert remapped.cls_id == expected.cls_id and remapped.conf == expected.conf
+    # 축소한 크롭에서 한 픽셀 오차 이내
+    tolerance = 1 / (scale * min(WIDTH, HEIGHT))
+    for field in ("cx", "cy", "w", "h"):
+        assert getattr(remapped, field) == pytest.approx(getattr(expected, field), abs=2 * tolerance)
+
+
+def test_remap_exact_coordinates():
+    plan = CropPlan(image=None, imgsz=320, box=(100, 200, 500, 1000), full_size=(1000, 2000))
+    # 크롭 중앙, 크롭 크기의 절반
+    (det,) = plan.remap([Detection(3, 0.5, 0.5, 0.5, 0.5, 0.85)])
+    assert det == pytest.approx(Detection(3, 0.3, 0.3, 0.2, 0.2, 0.85))
+    # 크롭 모서리는 box 모서리
+    (corner,) = plan.remap([Detection(1, 0.0, 1.0, 0.0, 0.0, 0.9)])
+    assert (corner.cx, corner.cy) == pytest.approx((0.1, 0.5))
+
+
+def test_no_crop_without_gain():
+    # 종이 전체에 그린 그림은 버킷이 줄지 않으므로 원본 그대로
+    image = Image.new("RGB", (WIDTH, HEIGHT), "white")
+    ImageDraw.Draw(image).rectangle((20, 20, WIDTH - 20, HEIGHT - 20), outline="black", width=6)
+    assert plan_ink_crop(image, 640, [320, 416, 512], 0.04) is None
+    # 잉크가 없으면 크롭하지 않음
+    assert plan_ink_crop(Image.new("RGB", (WIDTH, HEIGHT), "white"), 640, [320, 416, 512], 0.04) is None
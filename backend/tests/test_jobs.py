@@ -0,0 +1,76 @@
+import asyncio
+
+from jobs import DONE, FAILED, RUNNING, JobRunner, JobStore
+
+
+def _job_file(tmp_path, job_id: str):
+    path = tmp_path / f"{job_id}.png"
+    path.write_bytes(b"drawing")
+    return path
+
+
+def test_restart_requeues_unfinished_jobs(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    store = JobStore(db_path)
+    for job_id in ("running", "queued", "done"):
+        store.create(job_id, 0, _job_file(tmp_path, job_id), "sha")
+    # 처리 중에 프로세스가 종료된 작업과 이미 끝난 작업
+    store.set_status("running", RUNNING)
+    store.set_status("done", DONE, {"old": True})
+    store.close()
+
+    reopened = JobStore(db_path)
+    assert reopened.get("running")["status"] == RUNNING
+    assert reopened.unfinished_ids() == ["running", "queued"]
+
+    handled = []
+
+    async def handler(job):
+        handled.append(job["job_id"])
+        if job["job_id"] == "queued":
+            raise ValueError("검출 실패")
+        return {"category": job["category"]}
+
+    async def scenario():
+        runner = JobRunner(reopened, handler, workers=1)
+        await runner.start()
+        await asyncio.wait_for(runner._queue.join(), 5)
+        await runner.stop()
+
+    asyncio.run(scenario())
+    assert handled == ["running", "queued"]
+    assert reopened.get("running")["status"] == DONE
+    assert reopened.get("running")["result"] == {"category": 0}
+    failed = reopened.get("queued")
+    assert failed["status"] == FAILED
+    assert failed["error"]["status"] == 500 and "검출 실패" in failed["error"]["detail"]
+    # 끝난 작업은 다시 실행하지 않는다
+    assert reopened.get("done")["result"] == {"old": True}
+    assert reopened.unfinished_ids() == []
+    # 실행한 작업의 입력 파일은 지운다
+    assert not (tmp_path / "running.png").exists() and not (tmp_path / "queued.png").exists()
+    assert (tmp_path / "done.png").exists()
+
+
+def test_cancelled_job_stays_running_for_restart(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    image_path = _job_file(tmp_path, "job")
+    store.create("job", 1, image_path, "sha")
+
+    async def scenario():
+        running = asyncio.Event()
+
+        async def handler(job):
+            running.set()
+            await asyncio.sleep(3600)
+
+        runner = JobRunner(store, handler, workers=1)
+        await runner.start()
+        await asyncio.wait_for(running.wait(), 5)
+        # 종료 시 워커가 취소되어도 running 상태와 입력 파일을 남겨 다음 시작 때 다시 실행한다
+        await runner.stop()
+
+    asyncio.run(scenario())
+    assert store.get("job")["status"] == RUNNING
+    assert image_path.exists()
+    assert store.unfinished_ids() == ["job"]
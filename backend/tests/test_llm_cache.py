@@ -0,0 +1,89 @@
+import llm_cache
+from llm_cache import ResponseCache, make_key, normalize_analysis_text
+
+HOUSE_TEXT = "집이 크다. 창문이 많다.\n문이 있다."
+
+
+class _Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_ignores_order_and_duplicates():
+    reordered = "문이 있다.  창문이 많다.\n집이 크다. 문이 있다."
+    assert normalize_analysis_text(reordered) == normalize_analysis_text(HOUSE_TEXT)
+    assert normalize_analysis_text(HOUSE_TEXT) != normalize_analysis_text("집이 크다. 창문이 많다.")
+
+
+def test_normalize_keeps_drawing_prefix():
+    session_text = "[집] 집이 크다. 문이 있다.\n[나무] 문이 있다."
+    normalized = normalize_analysis_text(session_text)
+    assert normalized.splitlines() == ["[나무]문이 있다.", "[집]문이 있다.", "[집]집이 크다."]
+    # 같은 문장이라도 어느 그림의 문장인지가 다르면 다른 입력
+    assert normalized != normalize_analysis_text("[집] 집이 크다. 문이 있다.\n[집] 문이 있다.")
+
+
+def test_make_key():
+    key = make_key(HOUSE_TEXT, "v1", "grok-4", 0.7)
+    assert key == make_key("문이 있다. 집이 크다.\n창문이 많다. 창문이 많다.", "v1", "grok-4", 0.7)
+    assert len({
+        key,
+        make_key(HOUSE_TEXT, "v2", "grok-4", 0.7),
+        make_key(HOUSE_TEXT, "v1", "grok-3-mini", 0.7),
+        make_key(HOUSE_TEXT, "v1", "grok-4", 0.9),
+    }) == 4
+
+
+def test_sqlite_ttl(tmp_path, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    db_path = tmp_path / "llm.sqlite3"
+    cache = ResponseCache(max_entries=0, db_path=db_path, ttl_seconds=60)
+    cache.put("a", "결과", 1.0)
+
+    clock.now += 30
+    assert cache.get("a") == "결과"
+    # 재시작 후에도 남아 있다
+    assert ResponseCache(max_entries=0, db_path=db_path, ttl_seconds=60).get("a") == "결과"
+
+    clock.now += 31
+    assert cache.get("a") is None
+    reopened = ResponseCache(max_entries=0, db_path=db_path, ttl_seconds=60)
+    assert reopened._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] == 0
+
+
+def test_sqlite_max_rows_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    cache = ResponseCache(max_entries=0, db_path=tmp_path / "llm.sqlite3", max_rows=10)
+    for i in range(10):
+        clock.now += 1
+        cache.put(f"k{i}", f"결과{i}", 1.0)
+    # k0 을 다시 쓰면 가장 오래 안 쓴 항목은 k1, k2
+    clock.now += 1
+    assert cache.get("k0") == "결과0"
+
+    clock.now += 1
+    cache.put("k10", "결과10", 1.0)
+    rows = {key for (key,) in cache._conn.execute("SELECT key FROM llm_cache")}
+    assert len(rows) == 9
+    assert "k0" in rows and "k10" in rows
+    assert "k1" not in rows and "k2" not in rows
+    assert cache.get("k1") is None
+
+
+def test_variants_rotate_after_k_results():
+    cache = ResponseCache(max_entries=16, variants=2)
+    cache.put("a", "첫째", 1.0)
+    # K개가 모이기 전에는 miss 로 보고 새로 생성하게 한다
+    assert cache.get("a") is None
+
+    cache.put("a", "둘째", 1.0)
+    assert [cache.get("a") for _ in range(4)] == ["첫째", "둘째", "첫째", "둘째"]
+
+    # K개가 이미 있으면 가장 오래된 결과문을 교체
+    cache.put("a", "셋째", 1.0)
+    assert {cache.get("a") for _ in range(2)} == {"둘째", "셋째"}
@@ -0,0 +1,155 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+import llm_gateway
+from llm_gateway import CircuitBreaker, LlmGateway
+from metrics import metrics
+from psychology_grok_v2_ver3 import create_chat_session
+
+ANALYSIS_TEXT = "집이 크다. 문이 있다."
+
+
+def _build_chat(client, model):
+    return create_chat_session(ANALYSIS_TEXT, client, model)
+
+
+def _gateway(api_host: str, **options) -> LlmGateway:
+    return LlmGateway(api_key="local", api_host=api_host, insecure=True, **options)
+
+
+def _counter(name: str) -> float:
+    return metrics.snapshot()["counters"].get(name, 0)
+
+
+def _broken(standin) -> str:
+    # UNAVAILABLE 은 xai_sdk 채널이 자체적으로 재시도하므로 게이트웨이 재시도만 보도록 다른 일시적 오류를 쓴다
+    return standin(latency=0, error_rate=1.0, error_code="RESOURCE_EXHAUSTED")
+
+
+def test_transient_errors_are_retried(standin):
+    gateway = _gateway(_broken(standin), retries=2, backoff_seconds=0.01)
+    retries = _counter("llm_gateway_retries{code=RESOURCE_EXHAUSTED}")
+    with pytest.raises(HTTPException) as exc_info:
+        gateway.sample(_build_chat, "grok-4")
+    assert exc_info.value.status_code == 503
+    assert _counter("llm_gateway_retries{code=RESOURCE_EXHAUSTED}") - retries == 2
+    assert gateway.in_flight == 0
+
+
+def test_other_errors_are_not_retried(standin):
+    gateway = _gateway(standin(latency=0, error_rate=1.0, error_code="INVALID_ARGUMENT"), retries=2)
+    retries = _counter("llm_gateway_retries{code=INVALID_ARGUMENT}")
+    with pytest.raises(HTTPException) as exc_info:
+        gateway.sample(_build_chat, "grok-4")
+    assert exc_info.value.status_code == 502
+    assert _counter("llm_gateway_retries{code=INVALID_ARGUMENT}") == retries
+
+
+def test_breaker_opens_then_half_opens(standin):
+    # 같은 차단기를 쓰는 두 게이트웨이로 upstream 이 고장 났다가 회복되는 상황을 만든다
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=2, window_seconds=30, cooldown_seconds=0.3)
+    broken = _gateway(_broken(standin), retries=0, breaker=breaker)
+    healthy = _gateway(standin(latency=0.2), retries=0, breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            broken.sample(_build_chat, "grok-4")
+    assert breaker.state == "open"
+    # 열려 있으면 upstream 을 부르지 않고 바로 503
+    started = time.perf_counter()
+    with pytest.raises(HTTPException) as exc_info:
+        healthy.sample(_build_chat, "grok-4")
+    assert exc_info.value.status_code == 503
+    assert time.perf_counter() - started < 0.1
+
+    # cooldown 뒤 시험 호출이 실패하면 다시 열린다
+    time.sleep(0.3)
+    assert breaker.state == "half_open"
+    with pytest.raises(HTTPException):
+        broken.sample(_build_chat, "grok-4")
+    assert breaker.state == "open"
+
+    # 시험 호출 하나만 통과시키고 (그동안 다른 호출은 503), 성공하면 닫힌다
+    time.sleep(0.3)
+    with ThreadPoolExecutor(1) as executor:
+        probe = executor.submit(healthy.sample, _build_chat, "grok-4")
+        time.sleep(0.05)
+        with pytest.raises(HTTPException) as exc_info:
+            healthy.sample(_build_chat, "grok-4")
+        assert exc_info.value.status_code == 503
+        assert probe.result()[0].content
+    assert breaker.state == "closed"
+
+
+def test_call_timeout_is_504(standin):
+    gateway = _gateway(standin(latency=2), call_timeout=0.3, deadline=5, retries=0)
+    with pytest.raises(HTTPException) as exc_info:
+        gateway.sample(_build_chat, "grok-4")
+    assert exc_info.value.status_code == 504
+
+
+def test_deadline_stops_retries(standin):
+    # 시도마다 0.3초에 시간 초과되고 재시도는 많지만, 전체 deadline 1초가 지나면 더 시도하지 않는다
+    gateway = _gateway(standin(latency=2), call_timeout=0.3, deadline=1, retries=10, backoff_seconds=0.01)
+    started = time.perf_counter()
+    with pytest.raises(HTTPException) as exc_info:
+        gateway.sample(_build_chat, "grok-4")
+    assert exc_info.value.status_code == 504
+    assert time.perf_counter() - started < 1.5
+
+
+def test_unhedged_call_uses_public_sample(standin, monkeypatch):
+    def private_start_sample(chat):
+        raise AssertionError("헤지하지 않는 호출은 xai_sdk 내부를 쓰지 않는다")
+
+    monkeypatch.setattr(llm_gateway, "_start_sample", private_start_sample)
+    host = standin(latency=0)
+    # 헤지를 끈 경우와, 켰지만 그 모델의 호출 시간 기록이 아직 없어 헤지하지 않는 경우
+    cases = ((_gateway(host, retries=0), "unhedged-off"), (_gateway(host, retries=0, hedge_quantile=0.95), "unhedged-new"))
+    for gateway, model_name in cases:
+        response, model = gateway.sample(_build_chat, model_name)
+        assert response.content
+        assert model == model_name
+
+
+def test_hedge_wins_and_cancels_primary(standin, monkeypatch):
+    futures = []
+    start_sample = llm_gateway._start_sample
+
+    def recording_start_sample(chat):
+        future = start_sample(chat)
+        futures.append(future)
+        return future
+
+    monkeypatch.setattr(llm_gateway, "_start_sample", recording_start_sample)
+    host = standin(latency=0, model_latency={"hedge-slow": 3, "hedge-fast": 0.05})
+    gateway = _gateway(host, retries=0, hedge_quantile=0.95, hedge_min_delay=0.2)
+    # 지금까지의 p95 가 0.2초인 것으로 두어 0.2초 뒤 헤지 요청을 보내게 한다
+    metrics.observe("llm_call_seconds", 0.2, model="hedge-slow")
+    wins = _counter("llm_hedge_wins{winner=hedge}")
+
+    started = time.perf_counter()
+    response, model = gateway.sample(_build_chat, "hedge-slow", "hedge-fast")
+    assert time.perf_counter() - started < 1
+    assert response.content
+    assert model == "hedge-fast"
+    assert _counter("llm_hedge_wins{winner=hedge}") - wins == 1
+    assert len(futures) == 2
+    assert futures[0].cancelled()
+    assert gateway.in_flight == 0
+    # 헤지에 쓴 자리도 돌려받았다
+    assert gateway._slots._value == gateway.max_concurrency
+
+
+def test_route_uses_request_deadline(standin):
+    gateway = _gateway(standin(latency=0), deadline=90, retries=0)
+    # 기본 모델의 p95 가 5초인데 요청 마감까지 1초 남았으면 처음부터 빠른 모델로 보내고, 답한 모델을 돌려준다
+    metrics.observe("llm_call_seconds", 5, model="route-slow")
+    _, model = gateway.sample(_build_chat, "route-slow", "route-fast", deadline=time.monotonic() + 1)
+    assert model == "route-fast"
+    # 게이트웨이 자체 시간 제한(90초)만 보면 기본 모델
+    _, model = gateway.sample(_build_chat, "route-slow", "route-fast")
+    assert model == "route-slow"
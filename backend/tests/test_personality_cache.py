@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+import main
+import psychology_grok_v2_ver3
+from llm_gateway import LlmGateway
+from metrics import metrics
+
+ANALYSIS_TEXT = "집이 크다. 문이 있다. 창문이 많다."
+
+
+@pytest.fixture
+def routed(standin, monkeypatch):
+    """기본 모델(cache-slow)의 p95 가 5초라 요청 마감이 가까우면 빠른 모델(cache-fast)로 보내는 환경"""
+    monkeypatch.setattr(psychology_grok_v2_ver3, "MODEL", "cache-slow")
+    monkeypatch.setattr(psychology_grok_v2_ver3, "FAST_MODEL", "cache-fast")
+    metrics.observe("llm_call_seconds", 5, model="cache-slow")
+    gateway = LlmGateway(api_key="local", api_host=standin(latency=0), insecure=True, retries=0)
+    monkeypatch.setattr(main, "llm_gateway", gateway)
+    monkeypatch.setattr(main, "llm_cache", main.ResponseCache(16))
+    monkeypatch.setattr(main, "narrative_index", main.NarrativeIndex(16, 2))
+    return main._personality_cache_key(ANALYSIS_TEXT)
+
+
+def _skipped() -> float:
+    return metrics.snapshot()["counters"].get("llm_cache_skipped{model=cache-fast}", 0)
+
+
+def test_fast_model_answer_is_not_cached(routed):
+    skipped = _skipped()
+    assert main._personality_text(ANALYSIS_TEXT, deadline=time.monotonic() + 1)
+    assert _skipped() - skipped == 1
+    assert main.llm_cache.get(routed) is None
+
+    # 시간이 충분하면 기본 모델이 답하고 기본 모델 키로 캐시된다
+    result_text = main._personality_text(ANALYSIS_TEXT)
+    assert main.llm_cache.get(routed) == result_text
+
+
+def test_fast_model_stream_is_not_cached_or_indexed(routed):
+    async def events():
+        return [message async for message in main._stream_events(0, [], ANALYSIS_TEXT, time.monotonic() + 1)]
+
+    skipped = _skipped()
+    messages = asyncio.run(events())
+    assert messages[-1].startswith("event: result")
+    assert _skipped() - skipped == 1
+    assert main.llm_cache.get(routed) is None
+    assert not main.narrative_index.nearest(0, main.feature_vector(0, []))
+    assert not main.personality_flight._calls
@@ -0,0 +1,79 @@
+import json
+
+from metrics import metrics
+from psychology_grok_v2_ver3 import PERSONALITY_TYPES_BY_KEY, parse_personality_result, parse_structured_result
+
+OPENNESS = PERSONALITY_TYPES_BY_KEY["Openness"]
+VALID = {
+    "type": "Openness",
+    "summary": "새로운 것을 좋아합니다.",
+    "details": "상세 해석입니다.",
+    "advices": ["🎨 하나", "🎨 둘", "🎨 셋"],
+    "warning": "",
+}
+
+
+def _count(output_format: str) -> float:
+    return metrics.snapshot()["counters"].get(f"llm_output{{format={output_format}}}", 0)
+
+
+def test_valid_json():
+    before = _count("json")
+    assert parse_personality_result(json.dumps(VALID, ensure_ascii=False)) == {**VALID, "type": OPENNESS}
+    assert _count("json") - before == 1
+
+
+def test_fenced_json_block():
+    fenced = "```json\n" + json.dumps(VALID, ensure_ascii=False) + "\n```"
+    assert parse_structured_result(fenced) == {**VALID, "type": OPENNESS}
+    assert parse_personality_result(fenced) == {**VALID, "type": OPENNESS}
+
+
+def test_invalid_schema_keeps_readable_fields():
+    # key 대신 유형 이름, 조언 개수 초과, 스키마에 없는 필드, warning 누락
+    data = {
+        "type": "개방성",
+        "summary": "요약",
+        "details": "상세",
+        "advices": ["하나", "둘", "셋", "넷"],
+        "score": 3,
+    }
+    before = _count("json_invalid")
+    result = parse_personality_result(json.dumps(data, ensure_ascii=False))
+    assert result == {
+        "type": OPENNESS, "summary": "요약", "details": "상세", "advices": ["하나", "둘", "셋"], "warning": "",
+    }
+    assert _count("json_invalid") - before == 1
+
+    # 알 수 없는 유형, 리스트가 아닌 조언, 없는 필드는 빈 값
+    assert parse_structured_result('{"type": "unknown", "advices": "하나"}') == {
+        "type": {}, "summary": "", "details": "", "advices": [], "warning": "",
+    }
+
+
+def test_non_dict_json_falls_back_to_text():
+    assert parse_structured_result('["개방성", "요약"]') is None
+    assert parse_structured_result('"개방성"') is None
+    assert parse_structured_result("{ 깨진 JSON") is None
+
+    before = _count("text")
+    result = parse_personality_result('```\n["개방성"]\n```')
+    assert _count("text") - before == 1
+    assert result["type"] == OPENNESS
+    assert result["summary"] == '```\n["개방성"]'
+
+
+def test_text_result_is_split_by_lines():
+    lines = [f"줄{i}" for i in range(12)]
+    lines[0] = "당신은 개방성 유형입니다."
+    lines[11] = "필요하면 전문 상담사와 이야기해 보세요."
+    result = parse_personality_result("\n\n".join(lines))
+    assert result == {
+        "type": OPENNESS,
+        "summary": "\n".join(lines[:2]),
+        "details": "\n".join(lines[2:9]),
+        "advices": lines[9:12],
+        "warning": lines[11],
+    }
+    # 유형을 찾지 못하면 빈 dict
+    assert parse_personality_result("알 수 없는 결과")["type"] == {}
@@ -0,0 +1,71 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from analysis_module import get_analysis_result
+from image_prep import decode_image
+from phash_index import PerceptualHashIndex, dhash, fingerprint
+
+WIDTH, HEIGHT, STROKE = 3000, 4000, 10
+HOUSE = 0
+# (cls_id, cx, cy, w, h, conf) 정규화 좌표
+HOUSE_DETECTIONS = [(0, 0.5, 0.53, 0.6, 0.6, 0.95), (1, 0.5, 0.34, 0.6, 0.23, 0.93), (2, 0.5, 0.64, 0.53, 0.38, 0.92)]
+WINDOW_DETECTIONS = [(4, 0.33, 0.54, 0.1, 0.075, 0.9), (4, 0.6, 0.54, 0.1, 0.075, 0.9), (4, 0.33, 0.69, 0.1, 0.075, 0.9)]
+
+
+def _house(windows: bool = False) -> Image.Image:
+    image = Image.new("RGB", (WIDTH, HEIGHT), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((700, 1800, 2300, 3300), outline="black", width=STROKE)
+    draw.polygon([(600, 1800), (1500, 900), (2400, 1800)], outline="black", width=STROKE)
+    draw.line((100, 3300, 2900, 3300), fill="black", width=STROKE)
+    if windows:
+        for x, y in ((850, 2000), (1650, 2000), (850, 2600)):
+            draw.rectangle((x, y, x + 300, y + 300), outline="black", width=STROKE)
+    return image
+
+
+def _upload(image: Image.Image, quality: int = 90) -> Image.Image:
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return decode_image(io.BytesIO(buffer.getvalue()), 640)
+
+
+def _indexed(image: Image.Image, detections) -> PerceptualHashIndex:
+    index = PerceptualHashIndex(capacity=100, max_distance=4)
+    value, thumb = fingerprint(image)
+    payload = {"detections": detections, "analysis_text": get_analysis_result(HOUSE, detections=detections)}
+    index.add(HOUSE, value, thumb, payload, "v1")
+    return index
+
+
+def test_drawing_with_extra_windows_is_not_merged():
+    plain, with_windows = _upload(_house()), _upload(_house(windows=True))
+    plain_text = get_analysis_result(HOUSE, detections=HOUSE_DETECTIONS)
+    windows_text = get_analysis_result(HOUSE, detections=HOUSE_DETECTIONS + WINDOW_DETECTIONS)
+    assert plain_text != windows_text
+    # dHash 만으로는 근접 중복으로 보이는 경우
+    assert (dhash(plain) ^ dhash(with_windows)).bit_count() <= 4
+
+    index = _indexed(plain, HOUSE_DETECTIONS)
+    value, thumb = fingerprint(with_windows)
+    assert index.lookup(HOUSE, value, thumb, "v1") is None
+
+
+def test_reencoded_upload_reuses_entry():
+    index = _indexed(_upload(_house()), HOUSE_DETECTIONS)
+    for reencoded in (_upload(_house(), quality=30), _upload(_house().resize((1500, 2000)), quality=60)):
+        value, thumb = fingerprint(reencoded)
+        near = index.lookup(HOUSE, value, thumb, "v1")
+        assert near is not None and near["detections"] == HOUSE_DETECTIONS
+        # 모델 버전이 다르면 재사용하지 않음
+        assert index.lookup(HOUSE, value, thumb, "v2") is None
+
+
+def test_dhash_bit_order():
+    # 왼쪽 픽셀이 더 밝으면 1, 행 우선으로 첫 비트가 최상위 비트
+    row = np.array([[200, 100, 150, 50]], dtype=np.uint8)
+    assert dhash(Image.fromarray(np.repeat(row, 3, axis=0)), hash_size=3) == 0b101_101_101
+    gradient = Image.fromarray(np.tile(np.arange(0, 225, 25, dtype=np.uint8)[::-1], (8, 1)))
+    assert dhash(gradient) == (1 << 64) - 1
@@ -0,0 +1,18 @@
+from analysis_module import HOUSE_CLASS_NAMES, PERSON_CLASS_NAMES, TREE_CLASS_NAMES
+from rule_deps import CLASS_NAMES, relevant_classes
+
+# rules.py / analysis_module.py 를 읽고 손으로 정한 '영향 있는' 클래스.
+# 제외되는 클래스는 문장이 모두 None 이거나(지붕, 기둥, 머리 ...), 없는 규칙 키로 읽히거나(새/다람쥐 -> 동물,
+# 운동화/여자구두 -> 신발), 개수 대신 다른 클래스로 판단되는(얼굴 <- 눈/코/입) 클래스다.
+# 규칙을 바꾸면 이 목록도 함께 고쳐야 하며, 무작위 조합 탐색이 놓친 클래스가 있으면 여기서 실패한다.
+EXPECTED = {
+    0: {"집전체", "문", "창문", "굴뚝", "울타리", "연못", "나무", "꽃", "잔디", "태양"},
+    1: {"나무전체", "뿌리", "꽃", "열매"},
+    2: {"사람전체", "눈", "코", "입", "귀", "머리카락", "목", "팔", "단추"},
+}
+
+
+def test_relevant_classes_match_rules():
+    assert CLASS_NAMES == {0: HOUSE_CLASS_NAMES, 1: TREE_CLASS_NAMES, 2: PERSON_CLASS_NAMES}
+    for category, names in CLASS_NAMES.items():
+        assert {names[cls_id] for cls_id in relevant_classes(category)} == EXPECTED[category]
@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+
+import main
+
+NEAR_LIMIT = main.MAX_UPLOAD_BYTES - 1024
+
+
+def _files() -> dict:
+    return {name: (f"{name}.jpg", b"\xff" * NEAR_LIMIT, "image/jpeg") for name in ("house", "tree", "person")}
+
+
+def test_session_accepts_three_near_limit_files(monkeypatch):
+    sizes = {}
+
+    async def analysis_text(upload, category):
+        sizes[category] = upload.size
+        return f"{main.CATEGORY_NAMES[category]} 문장"
+
+    # 검출/LLM 은 건너뛰고 세 파일이 모두 핸들러까지 도착했는지만 본다
+    monkeypatch.setattr(main, "read_image_info", lambda *args: None)
+    monkeypatch.setattr(main, "_analysis_text", analysis_text)
+    monkeypatch.setattr(main, "analyze_personality", lambda *args: {})
+
+    response = TestClient(main.app).post("/session", files=_files())
+    assert response.status_code == 200
+    assert sizes == {0: NEAR_LIMIT, 1: NEAR_LIMIT, 2: NEAR_LIMIT}
+
+
+def test_single_upload_path_keeps_single_file_limit():
+    # 같은 본문도 그림 한 장을 받는 경로에서는 핸들러 전에 413
+    response = TestClient(main.app).post("/", files=_files(), data={"category": "0"})
+    assert response.status_code == 413
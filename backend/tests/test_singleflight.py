@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import main
+from llm_gateway import LlmGateway
+from singleflight import SingleFlight
+
+ANALYSIS_TEXT = "집이 크다. 문이 있다."
+
+
+def test_waiter_times_out_when_leader_hangs():
+    flight = SingleFlight("test_flight")
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("k", lambda: release.wait(5) and "결과"))
+    leader.start()
+    while "k" not in flight._calls:
+        time.sleep(0.01)
+
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        flight.do("k", lambda: "직접 실행하면 안 됨", timeout=0.2)
+    assert time.perf_counter() - started < 2
+
+    release.set()
+    leader.join()
+    # 첫 호출이 끝나면 같은 키로 다시 실행할 수 있다
+    assert flight.do("k", lambda: "다음 결과", timeout=0.2) == "다음 결과"
+
+
+def test_unshareable_result_makes_waiters_rerun():
+    flight = SingleFlight("test_flight")
+    release = threading.Event()
+    results = {}
+
+    def lead():
+        results["leader"] = flight.do("k", lambda: release.wait(5) and "빠른 모델 결과", shareable=lambda r: False)
+
+    def wait():
+        results["waiter"] = flight.do("k", lambda: "직접 실행한 결과", timeout=5)
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    while "k" not in flight._calls:
+        time.sleep(0.01)
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    while flight._calls["k"].waiters == 0:
+        time.sleep(0.01)
+
+    release.set()
+    leader.join()
+    waiter.join()
+    # 첫 호출자는 자기 결과를 쓰고, 기다리던 호출자는 그 결과를 받지 않고 다시 합류해 직접 실행한다
+    assert results == {"leader": "빠른 모델 결과", "waiter": "직접 실행한 결과"}
+
+
+def _event(message: str) -> tuple:
+    lines = message.strip().splitlines()
+    return lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))
+
+
+def test_cancelled_stream_leader_releases_waiters(standin, monkeypatch):
+    # 첫 조각까지 5초 걸리는 대역 서버: 리더는 첫 조각을 받기 전에 연결이 끊긴다
+    # (리더가 쓰던 스레드는 시도별 시간 제한 2초 뒤에 끝난다)
+    gateway = LlmGateway(api_key="local", api_host=standin(latency=5), insecure=True,
+                         call_timeout=2, deadline=2, retries=0)
+    monkeypatch.setattr(main, "llm_gateway", gateway)
+    monkeypatch.setattr(main, "llm_cache", main.ResponseCache(0))
+    monkeypatch.setattr(main, "narrative_index", main.NarrativeIndex(0, 0))
+
+    async def scenario():
+        leader = main._stream_events(0, [], ANALYSIS_TEXT)
+        waiter = main._stream_events(0, [], ANALYSIS_TEXT)
+        assert _event(await leader.__anext__())[0] == "analysis"
+        leader_next = asyncio.create_task(leader.__anext__())
+        while not main.personality_flight._calls:
+            await asyncio.sleep(0.01)
+
+        assert _event(await waiter.__anext__())[0] == "analysis"
+        waiter_next = asyncio.create_task(waiter.__anext__())
+        await asyncio.sleep(0.2)
+        assert not waiter_next.done()
+
+        # 클라이언트 연결이 끊기면 리더의 스트림 태스크가 취소된다
+        started = time.perf_counter()
+        leader_next.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader_next
+        name, data = _event(await asyncio.wait_for(waiter_next, 5))
+        return name, data, time.perf_counter() - started
+
+    name, data, elapsed = asyncio.run(scenario())
+    assert name == "error"
+    assert "중단" in data["detail"]
+    assert elapsed < 5
+    assert not main.personality_flight._calls
+    # 대역 서버를 멈추기 전에 리더의 upstream 호출이 시간 제한으로 끝나기를 기다린다
+    for _ in range(50):
+        if not gateway.in_flight:
+            break
+        time.sleep(0.1)
+    assert not gateway.in_flight
@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from upload_ingest import UploadLimitMiddleware, ingest_upload
+
+
+def _app(**limits) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    options = {"max_body_bytes": 1000, "idle_timeout": 5, "body_timeout": 5}
+    options.update(limits)
+    app.add_middleware(UploadLimitMiddleware, **options)
+    return app
+
+
+def _post(app, messages, delay: float = 0) -> tuple:
+    """본문 조각(http.request 메시지)을 delay 초 간격으로 보내고 (상태 코드, 본문) 을 돌려준다"""
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [], "query_string": b""}
+    queue = list(messages)
+    sent = []
+
+    async def receive():
+        if not queue:
+            # 클라이언트가 본문을 더 보내지 않고 멈춤
+            await asyncio.sleep(3600)
+        await asyncio.sleep(delay)
+        return queue.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asyncio.wait_for(app(scope, receive, send), 5))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return status, body
+
+
+def _chunks(count: int, size: int = 100) -> list:
+    return [{"type": "http.request", "body": b"x" * size, "more_body": i < count - 1} for i in range(count)]
+
+
+def test_body_within_limit_passes():
+    assert TestClient(_app()).post("/", content=b"x" * 1000).json() == {"size": 1000}
+
+
+def test_oversized_body_is_413():
+    client = TestClient(_app())
+    # Content-Length 로 바로 거절
+    assert client.post("/", content=b"x" * 1001).status_code == 413
+    # Content-Length 없이 조각으로 오는 본문은 받는 도중 넘는 순간 거절
+    status, _ = _post(_app(), _chunks(20))
+    assert status == 413
+
+
+def test_path_limits_override_default():
+    app = _app(path_limits={"/": (5000, 5)})
+    assert TestClient(app).post("/", content=b"x" * 2000).json() == {"size": 2000}
+
+
+def test_stalled_body_is_408():
+    # 첫 조각 뒤로 본문이 오지 않으면 idle_timeout 뒤 408
+    status, _ = _post(_app(idle_timeout=0.1), _chunks(5)[:1])
+    assert status == 408
+
+
+def test_slow_body_is_408():
+    # 조각마다는 idle_timeout 안에 오지만 전체 수신이 body_timeout 을 넘으면 408
+    status, _ = _post(_app(idle_timeout=0.2, body_timeout=0.3), _chunks(10), delay=0.1)
+    assert status == 408
+
+
+def _upload(data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename="drawing.png")
+
+
+def test_large_upload_spills_to_disk(tmp_path):
+    data = bytes(range(256)) * 4096  # 1MB, 청크 여러 개
+    upload = asyncio.run(ingest_upload(_upload(data), len(data), 300 * 1024, tmp_path))
+    try:
+        assert upload.data is None
+        assert upload.path.parent == tmp_path
+        assert upload.path.read_bytes() == data
+        assert upload.sha256 == hashlib.sha256(data).hexdigest()
+        assert (upload.size, upload.suffix) == (len(data), ".png")
+    finally:
+        upload.cleanup()
+    assert not list(tmp_path.iterdir())
+
+
+def test_small_upload_stays_in_memory(tmp_path):
+    data = b"drawing" * 100
+    upload = asyncio.run(ingest_upload(_upload(data), len(data), 300 * 1024, tmp_path))
+    assert upload.path is None
+    assert upload.source == data
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+    assert not list(tmp_path.iterdir())
+
+
+def test_upload_over_max_bytes_removes_spill_file(tmp_path):
+    data = b"x" * (1024 * 1024)
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(ingest_upload(_upload(data), len(data) - 1, 300 * 1024, tmp_path))
+    assert exc_info.value.status_code == 413
+    # 디스크로 내리던 임시 파일도 지운다
+    assert not list(tmp_path.iterdir())